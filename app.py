@@ -1,29 +1,38 @@
+from collections import deque
+import hashlib
+import pandas as pd
 import streamlit as st
-from src.config_loader import load_config
-from src.orchestrator.inference_pipeline import InferenceOrchestrator
+from src.config_loader import config_version, load_config
+from src.orchestrator.sharding import build_inference
+from src.orchestrator.bulk import iter_bulk, read_messages
 
 st.set_page_config(page_title="AI Safety Monitor", layout="centered")
 
 @st.cache_resource
-def get_orchestrator():
-    cfg = {
+def get_configs():
+    return {
         "preprocessing": load_config(["configs/preprocessing.yaml"]),
         "models": load_config(["configs/models.yaml"]),
         "policy": load_config(["configs/policy.yaml"]),
         "ui": load_config(["configs/ui.yaml"]),
+        "runtime": load_config(["configs/runtime.yaml"]),
     }
-    return InferenceOrchestrator(cfg)
 
-# UI setup
-st.title("🛡️ AI Safety Monitor")
-orch = get_orchestrator()
+@st.cache_resource
+def get_orchestrator():
+    # Sharded worker processes when runtime.yaml -> sharding.enabled
+    return build_inference(get_configs())
 
-age = st.selectbox("Select user age", options=["7+", "13+", "16+", "18+"], index=1)
-msg = st.text_area("Enter a message", height=120, placeholder="Type a chat message...")
+cfg = get_configs()
+ui_cfg = cfg["ui"].get("ui", {})
+CFG_VERSION = config_version(cfg)
 
-if st.button("Analyze") and msg.strip():
-    result = orch.infer(msg, age)
+@st.cache_data(max_entries=int(ui_cfg.get("cache_entries", 1000)), show_spinner=False)
+def analyze(text: str, age: str, cfg_version: str):
+    # Keyed by (text, age, config version): Streamlit reruns reuse the result instead of re-scoring
+    return get_orchestrator().infer(text, age)
 
+def render_result(result):
     st.subheader("🧠 Decision")
     st.json(result["decision"])
 
@@ -52,4 +61,74 @@ if st.button("Analyze") and msg.strip():
     else:
         st.markdown("✅ No redaction applied for this message.")
 
-    st.caption("Real-time AI safety system 💡 Made with ❤️ by [Jagadish](https://jcm-ai.github.io)")
+# UI setup
+st.title(f"🛡️ {ui_cfg.get('title', 'AI Safety Monitor')}")
+orch = get_orchestrator()
+ages = ["7+", "13+", "16+", "18+"]
+default_age = ui_cfg.get("default_age", "13+")
+
+if "history" not in st.session_state:
+    st.session_state["history"] = deque(maxlen=int(ui_cfg.get("max_history", 20)))
+
+single_tab, bulk_tab = st.tabs(["💬 Single message", "📁 Bulk moderation"])
+
+with single_tab:
+    age = st.selectbox("Select user age", options=ages, index=ages.index(default_age) if default_age in ages else 1)
+    msg = st.text_area("Enter a message", height=120, placeholder="Type a chat message...")
+
+    if st.button("Analyze") and msg.strip():
+        result = analyze(msg, age, CFG_VERSION)
+        st.session_state["history"].appendleft({
+            "text": msg[:80], "age": age, "action": result["decision"]["action"],
+            "max_risk": round(result["decision"]["max_risk"], 3),
+        })
+        render_result(result)
+
+    if st.session_state["history"]:
+        with st.expander(f"🕘 Recent messages (last {st.session_state['history'].maxlen})"):
+            st.dataframe(pd.DataFrame(list(st.session_state["history"])), use_container_width=True)
+
+with bulk_tab:
+    upload = st.file_uploader("Upload messages (CSV or JSONL with a `text` column)", type=["csv", "jsonl", "ndjson"])
+    bulk_age = st.selectbox("Age for rows without an `age` column", options=ages, index=ages.index(default_age) if default_age in ages else 1)
+
+    if upload is not None:
+        data = upload.getvalue()
+        bulk_key = (hashlib.sha1(data).hexdigest(), bulk_age, CFG_VERSION)
+        try:
+            messages = read_messages(data, upload.name, bulk_age)
+        except ValueError as e:
+            st.error(str(e))
+            messages = None
+
+        if messages is not None:
+            st.markdown(f"**{len(messages)}** messages loaded.")
+            if st.button("Run bulk moderation") and st.session_state.get("bulk_key") != bulk_key:
+                bar = st.progress(0.0, text="Scoring...")
+                rows = []
+                for chunk_rows in iter_bulk(
+                    orch, messages, int(ui_cfg.get("bulk_chunk_size", 256)),
+                    progress=lambda done, total: bar.progress(done / max(total, 1), text=f"Scored {done}/{total}"),
+                ):
+                    rows.extend(chunk_rows)
+                st.session_state["bulk_results"] = pd.DataFrame(rows)
+                st.session_state["bulk_key"] = bulk_key
+
+        if st.session_state.get("bulk_key") == bulk_key:
+            results = st.session_state["bulk_results"]
+            actions = st.multiselect("Show actions", ["block", "warn", "allow"], default=["block", "warn"])
+            view = results[results["action"].isin(actions)].sort_values("max_risk", ascending=False)
+            # Render one page at a time so large uploads stay responsive
+            page_size = int(ui_cfg.get("bulk_page_size", 100))
+            n_pages = max(1, -(-len(view) // page_size))
+            page = st.number_input("Page", min_value=1, max_value=n_pages, value=1)
+            st.caption(f"{len(view)} of {len(results)} messages · page {page}/{n_pages}")
+            st.dataframe(view.iloc[(page - 1) * page_size:page * page_size], use_container_width=True)
+            st.download_button(
+                "⬇️ Download results (CSV)",
+                results.to_csv(index=False).encode("utf-8"),
+                file_name="moderation_results.csv",
+                mime="text/csv",
+            )
+
+st.caption("Real-time AI safety system 💡 Made with ❤️ by [Jagadish](https://jcm-ai.github.io)")
@@ -0,0 +1,98 @@
+import time
+import random
+import argparse
+import numpy as np
+from scripts.run_inference import build_configs
+from src.orchestrator.inference_pipeline import InferenceOrchestrator
+
+RAID_TEMPLATES = [
+    "everyone report this streamer he is a worthless idiot",
+    "go back to where you came from nobody wants you here",
+    "kill yourself loser nobody will miss you",
+    "FREE NITRO claim now at the link in my bio before it expires",
+    "this channel is trash and so are all of you",
+]
+NORMAL = [
+    "hey are we still on for tonight",
+    "that last round was insane gg",
+    "can someone explain the rules of this mode",
+    "lmao that was hilarious, see you tomorrow",
+    "i need help with my homework, anyone good at maths",
+    "what time does the stream start",
+    "i feel really down today and i dont know why",
+    "nice clip, how did you pull that off",
+]
+VOCAB = sorted({w for t in NORMAL + RAID_TEMPLATES for w in t.lower().split()})
+NOISE = ["!!", "!!!", "...", " 😂", " 🔥🔥", " 💀", " lol", " ??", "", ""]
+
+def mutate(text: str, rng: random.Random) -> str:
+    """A raid copy: random case, emoji/punctuation noise and an occasional junk suffix."""
+    if rng.random() < 0.3:
+        text = text.upper()
+    out = text + rng.choice(NOISE)
+    if rng.random() < 0.3:
+        out += f" {rng.randrange(10000)}"
+    return out
+
+def build_corpus(n: int, raid_share: float, seed: int = 42) -> tuple[list[str], list[str]]:
+    rng = random.Random(seed)
+    texts, sessions = [], []
+    for _ in range(n):
+        if rng.random() < raid_share:
+            texts.append(mutate(rng.choice(RAID_TEMPLATES), rng))
+        else:
+            # Ordinary chat: one template with a few words reshuffled, so it rarely repeats
+            words = rng.choice(NORMAL).split()
+            words += rng.sample(VOCAB, 4)
+            rng.shuffle(words)
+            texts.append(" ".join(words))
+        sessions.append(f"user-{rng.randrange(n // 4 + 1)}")
+    return texts, sessions
+
+def run(orch: InferenceOrchestrator, texts: list[str], sessions: list[str], batch_size: int) -> tuple[list, float]:
+    results = []
+    t0 = time.perf_counter()
+    for a in range(0, len(texts), batch_size):
+        b = a + batch_size
+        results += orch.infer_batch(texts[a:b], ["13+"] * len(texts[a:b]), sessions[a:b])
+    return results, time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=20000)
+    ap.add_argument("--raid_share", type=float, default=0.6, help="Fraction of messages copied from raid templates")
+    ap.add_argument("--batch_size", type=int, default=64)
+    ap.add_argument("--threshold", type=float, default=None, help="Override near_duplicate.threshold")
+    args = ap.parse_args()
+
+    texts, sessions = build_corpus(args.n, args.raid_share)
+    cfgs = build_configs()
+    base = dict(cfgs["models"].get("near_duplicate", {}))
+    if args.threshold is not None:
+        base["threshold"] = args.threshold
+
+    runs = {}
+    for name, enabled in (("full scoring", False), ("near-duplicate", True)):
+        cfgs["models"]["near_duplicate"] = {**base, "enabled": enabled}
+        orch = InferenceOrchestrator(cfgs)
+        orch.load_models_from_disk()
+        results, seconds = run(orch, texts, sessions, args.batch_size)
+        runs[name] = (results, seconds, orch.metrics_snapshot().get("near_duplicate"))
+        orch.close()
+
+    print(f"🧪 {args.n} messages, {args.raid_share:.0%} raid copies, batches of {args.batch_size}")
+    for name, (_, seconds, stats) in runs.items():
+        hits = f"  hit rate {stats['hit_rate']:.1%}" if stats else ""
+        print(f"  {name:>15}: {args.n / seconds:>8.0f} msgs/s{hits}")
+
+    full, dedup = runs["full scoring"][0], runs["near-duplicate"][0]
+    actions = np.array([[f["decision"]["action"], d["decision"]["action"]] for f, d in zip(full, dedup)])
+    disagree = actions[:, 0] != actions[:, 1]
+    reused = np.array(["near_duplicate" in d for d in dedup])
+    speedup = runs["full scoring"][1] / runs["near-duplicate"][1]
+    print(f"⚡ Speedup: {speedup:.2f}x")
+    print(f"📊 Decision disagreement: {disagree.mean():.2%} overall, "
+          f"{disagree[reused].mean() if reused.any() else 0.0:.2%} of reused messages")
+
+if __name__ == "__main__":
+    main()
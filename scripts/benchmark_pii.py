@@ -0,0 +1,64 @@
+import time
+import random
+import argparse
+import numpy as np
+from src.preprocessing.pii_masking import EMAIL_RE, PHONE_RE, mask_pii, mask_pii_batch
+
+def legacy_mask(text: str) -> str:
+    """The previous two-pass masking (EMAIL_RE.sub then PHONE_RE.sub)."""
+    return PHONE_RE.sub("<PHONE>", EMAIL_RE.sub("<EMAIL>", text))
+
+def build_corpus(n: int, adversarial_len: int, adversarial_share: float, seed: int = 42) -> list[str]:
+    rng = random.Random(seed)
+    normal = [
+        "hey are we still on for tonight",
+        "mail me at someone.else@example.org when you land",
+        "call +91-9876543210 or (555) 123-4567 after 6",
+        "my card 4111 1111 1111 1111 got declined lol",
+        "the server at 10.0.0.12 is down again",
+        "lmao that was hilarious, see you tomorrow",
+    ]
+    adversarial = [
+        "12-" * (adversarial_len // 3),
+        "1 " * (adversarial_len // 2),
+        "a." * (adversarial_len // 2),
+        "x@" * (adversarial_len // 2),
+    ]
+    return [rng.choice(adversarial) if rng.random() < adversarial_share else rng.choice(normal) for _ in range(n)]
+
+def run(fn, corpus: list[str]) -> dict:
+    lat = np.empty(len(corpus))
+    t0 = time.perf_counter()
+    for i, text in enumerate(corpus):
+        s = time.perf_counter()
+        fn(text)
+        lat[i] = time.perf_counter() - s
+    total = time.perf_counter() - t0
+    return {
+        "msgs_per_sec": len(corpus) / total,
+        "p50_ms": float(np.percentile(lat, 50) * 1e3),
+        "p99_ms": float(np.percentile(lat, 99) * 1e3),
+        "max_ms": float(lat.max() * 1e3),
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=20000)
+    ap.add_argument("--adversarial_len", type=int, default=5000, help="Length of adversarial messages in chars")
+    ap.add_argument("--adversarial_share", type=float, default=0.01)
+    args = ap.parse_args()
+
+    corpus = build_corpus(args.n, args.adversarial_len, args.adversarial_share)
+    print(f"🧪 {args.n} messages, {args.adversarial_share:.1%} adversarial ({args.adversarial_len} chars)")
+    for name, fn in (("legacy regexes", legacy_mask), ("single-pass scanner", mask_pii)):
+        r = run(fn, corpus)
+        print(
+            f"  {name:>20}: {r['msgs_per_sec']:>9.0f} msgs/s  p50 {r['p50_ms']:.3f}ms  "
+            f"p99 {r['p99_ms']:.3f}ms  max {r['max_ms']:.2f}ms"
+        )
+    t0 = time.perf_counter()
+    mask_pii_batch(corpus)
+    print(f"  {'batch API':>20}: {len(corpus) / (time.perf_counter() - t0):>9.0f} msgs/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import time
+import random
+import argparse
+import joblib
+import numpy as np
+from src.models.fast_tfidf import FastTfidf
+
+def build_corpus(vocabulary: dict, n: int, max_tokens: int, oov_share: float, seed: int = 42) -> list[str]:
+    """Messages drawn from the vocabulary's words, with some out-of-vocabulary tokens and casing noise."""
+    rng = random.Random(seed)
+    words = sorted({w for term in vocabulary for w in term.split(" ")})
+    oov = ["lmao", "gg", "brb", "fr", "ngl", "tbh", "😂", "!!"]
+    texts = []
+    for _ in range(n):
+        toks = [rng.choice(oov) if rng.random() < oov_share else rng.choice(words) for _ in range(rng.randint(1, max_tokens))]
+        text = " ".join(toks)
+        texts.append(text.upper() if rng.random() < 0.1 else text)
+    return texts
+
+def run(fn, texts: list[str], batch_size: int, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for i in range(0, len(texts), batch_size):
+            fn(texts[i:i + batch_size])
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", type=str, default="models/abuse_detector.joblib", help="Saved detector whose vectorizer is benchmarked")
+    ap.add_argument("--n", type=int, default=20000)
+    ap.add_argument("--max_tokens", type=int, default=30, help="Maximum tokens per message")
+    ap.add_argument("--oov_share", type=float, default=0.2, help="Fraction of out-of-vocabulary tokens")
+    ap.add_argument("--batch_size", type=int, default=64)
+    ap.add_argument("--repeats", type=int, default=3, help="Best of this many runs is reported")
+    args = ap.parse_args()
+
+    vec = joblib.load(args.model).pipeline.named_steps["tfidf"]
+    texts = build_corpus(vec.vocabulary_, args.n, args.max_tokens, args.oov_share)
+    t0 = time.perf_counter()
+    fast = FastTfidf(vec)
+    print(f"🧪 {args.n} messages, batches of {args.batch_size}, {len(vec.vocabulary_)} features "
+          f"(featurizer built in {(time.perf_counter() - t0) * 1e3:.0f}ms)")
+
+    expected, got = vec.transform(texts), fast.transform(texts)
+    identical = (
+        np.array_equal(expected.indptr, got.indptr)
+        and np.array_equal(expected.indices, got.indices)
+        and np.array_equal(expected.data, got.data)
+    )
+    print(f"🔍 Identical rows: {identical}")
+
+    runs = {}
+    for name, fn in (("sklearn analyzer", vec.transform), ("fast featurizer", fast.transform)):
+        runs[name] = run(fn, texts, args.batch_size, args.repeats)
+        print(f"  {name:>17}: {args.n / runs[name]:>9.0f} msgs/s  {runs[name] / args.n * 1e6:6.1f} µs/msg")
+    print(f"⚡ Speedup: {runs['sklearn analyzer'] / runs['fast featurizer']:.2f}x")
+
+if __name__ == "__main__":
+    main()
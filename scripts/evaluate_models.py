@@ -1,45 +1,150 @@
+import os
+import time
 import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+import joblib
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import MultiLabelBinarizer
+import yaml
 from src.config_loader import load_config
 from src.models.abuse_detector import AbuseDetector
-from src.utils.metrics import multilabel_metrics
-import numpy as np
+from src.utils.metrics import MetricAccumulator
+
+# Models loaded once per worker process by `_init_worker`
+_MODELS: Dict[str, object] = {}
+
+def labels_to_lists(Y: np.ndarray, label_cols: List[str]) -> List[List[str]]:
+    """
+    Convert a binary label matrix into label lists (vectorized over columns).
+    """
+    names = np.asarray(label_cols, dtype=object)
+    return [names[row].tolist() for row in Y.astype(bool)]
+
+def iter_test_chunks(test_path: str, labels_path: str, labels: List[str], chunk_size: int) -> Iterator[Tuple[List[str], np.ndarray]]:
+    """
+    Stream the test texts with their labels joined on `id`, dropping rows whose
+    labels are unknown (-1) or missing from the label file.
+    """
+    # The label file is small (ids and a few int8 columns); index it once and look chunks up by id
+    by_id = pd.read_csv(labels_path, usecols=["id", *labels], index_col="id", dtype={"id": str, **{c: np.int8 for c in labels}})
+    if not by_id.index.is_unique:
+        raise ValueError("Test labels contain duplicate ids")
+    for t in pd.read_csv(test_path, usecols=["id", "comment_text"], dtype={"id": str}, chunksize=chunk_size):
+        Y = by_id[labels].reindex(t["id"].values).values  # float, NaN where the id has no labels
+        valid = ~np.isnan(Y).any(axis=1) & (Y != -1).all(axis=1)
+        if valid.any():
+            yield t["comment_text"].values[valid].astype(str).tolist(), Y[valid].astype(np.int8)
+
+def _init_worker(model_dir: str):
+    _MODELS["abuse"] = joblib.load(os.path.join(model_dir, "abuse_detector.joblib"))
+    crisis_path = os.path.join(model_dir, "crisis_detector.joblib")
+    if os.path.exists(crisis_path):
+        _MODELS["crisis"] = joblib.load(crisis_path)
+
+def _score_chunk(texts: List[str], Y: np.ndarray, labels: List[str], n_bins: int) -> Dict[str, MetricAccumulator]:
+    """
+    Score one chunk and return its (small, mergeable) accumulators.
+    """
+    accs = {"abuse": MetricAccumulator(len(labels), labels=labels, n_bins=n_bins).update(Y, _MODELS["abuse"].predict_proba(texts))}
+    if "crisis" in _MODELS:
+        # Crisis uses 'toxic' as a proxy label, as in train_and_save_models
+        accs["crisis"] = MetricAccumulator(1, labels=["crisis"], n_bins=n_bins).update(
+            Y[:, labels.index("toxic")], _MODELS["crisis"].predict_proba(texts)
+        )
+    return accs
+
+def _merge(total: Dict[str, MetricAccumulator], part: Dict[str, MetricAccumulator]):
+    for name, acc in part.items():
+        if name in total:
+            total[name].merge(acc)
+        else:
+            total[name] = acc
+
+def evaluate(
+    test_path: str,
+    labels_path: str,
+    labels: List[str],
+    model_dir: str,
+    chunk_size: int,
+    workers: int,
+    n_bins: int,
+) -> Tuple[Dict[str, MetricAccumulator], int]:
+    """
+    Score the test set chunk by chunk on `workers` processes.
+
+    Returns:
+        Merged accumulators per model and the number of scored rows
+    """
+    totals: Dict[str, MetricAccumulator] = {}
+    chunks = iter_test_chunks(test_path, labels_path, labels, chunk_size)
+    n_rows = 0
+    if workers <= 1:
+        _init_worker(model_dir)
+        for texts, Y in chunks:
+            _merge(totals, _score_chunk(texts, Y, labels, n_bins))
+            n_rows += len(texts)
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(model_dir,)) as pool:
+            # Keep at most 2 chunks per worker in flight so memory stays bounded
+            pending = []
+            for texts, Y in chunks:
+                pending.append(pool.submit(_score_chunk, texts, Y, labels, n_bins))
+                n_rows += len(texts)
+                if len(pending) >= 2 * workers:
+                    _merge(totals, pending.pop(0).result())
+            for fut in pending:
+                _merge(totals, fut.result())
+    return totals, n_rows
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--train", type=str, default="data/raw/train.csv")
+    ap.add_argument("--train", type=str, default="data/raw/train.csv", help="Used only with --retrain")
     ap.add_argument("--test", type=str, default="data/raw/test.csv")
     ap.add_argument("--test_labels", type=str, default="data/raw/test_labels.csv")
+    ap.add_argument("--model_dir", type=str, default="models/")
+    ap.add_argument("--retrain", action="store_true", help="Fit a fresh abuse model on --train instead of loading saved models")
+    ap.add_argument("--chunk_size", type=int, default=10000, help="Rows per scoring task")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--n_bins", type=int, default=1000, help="Score histogram bins for ROC/PR-AUC")
+    ap.add_argument("--report", type=str, default=None, help="Optional YAML path for the metrics")
     args = ap.parse_args()
 
     mcfg = load_config(["configs/models.yaml"])
     labels = mcfg["abuse"]["labels"]
 
-    # Load training data
-    df = pd.read_csv(args.train)
-    df["abuse_labels"] = df[labels].apply(lambda row: [lbl for lbl in labels if row[lbl] == 1], axis=1)
-
-    # Train model
-    abuse = AbuseDetector(mcfg["abuse"]).fit(df["comment_text"].tolist(), df["abuse_labels"].tolist())
-
-    # Load test data
-    test_df = pd.read_csv(args.test)
-    test_labels_df = pd.read_csv(args.test_labels)
-    test_df = test_df.merge(test_labels_df, on="id")
+    model_dir = args.model_dir
+    if args.retrain:
+        df = pd.read_csv(args.train, usecols=["comment_text", *labels])
+        abuse = AbuseDetector(mcfg["abuse"]).fit(df["comment_text"].tolist(), labels_to_lists(df[labels].values, labels))
+        model_dir = tempfile.mkdtemp(prefix="eval_models_")
+        joblib.dump(abuse, os.path.join(model_dir, "abuse_detector.joblib"))
+        del df
 
-    # Filter out rows with missing labels (-1)
-    valid_mask = (test_df[labels] != -1).all(axis=1)
-    test_df = test_df[valid_mask]
+    start = time.perf_counter()
+    totals, n_rows = evaluate(args.test, args.test_labels, labels, model_dir, args.chunk_size, args.workers, args.n_bins)
+    elapsed = time.perf_counter() - start
 
-    # Prepare ground truth and predictions
-    Y_true = test_df[labels].values
-    Y_prob = abuse.predict_proba(test_df["comment_text"].tolist())
+    if "abuse" not in totals:
+        print("⚠️ No labelled test rows found")
+        return
+    metrics = {"abuse": totals["abuse"].multilabel_metrics()}
+    if "crisis" in totals:
+        metrics["crisis"] = totals["crisis"].binary_metrics()
+    metrics["throughput"] = {"rows": n_rows, "seconds": round(elapsed, 3), "rows_per_s": round(n_rows / max(elapsed, 1e-9), 1)}
 
-    # Evaluate
-    metrics = multilabel_metrics(Y_true, Y_prob)
     print("📊 Abuse Model Metrics:")
-    print(metrics)
+    print(metrics["abuse"])
+    if "crisis" in metrics:
+        print("📊 Crisis Model Metrics:")
+        print(metrics["crisis"])
+    print(f"⚡ {n_rows} rows in {elapsed:.1f}s ({metrics['throughput']['rows_per_s']} rows/s, {args.workers} workers)")
+    if args.report:
+        os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+        with open(args.report, "w", encoding="utf-8") as f:
+            yaml.safe_dump(metrics, f)
+        print("📝 Metrics saved to:", args.report)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,92 @@
+import os
+import time
+import copy
+import argparse
+import joblib
+import numpy as np
+import pandas as pd
+import yaml
+from sklearn.preprocessing import MultiLabelBinarizer
+from src.config_loader import load_config
+from src.models.compact_head import compact_pipeline, l1_select, pipeline_summary
+from src.utils.metrics import multilabel_metrics, binary_metrics, metric_deltas
+
+def extract_multilabel(df: pd.DataFrame, label_cols: list[str]) -> list[list[str]]:
+    return [[label_cols[j] for j in np.flatnonzero(row)] for row in (df[label_cols].values == 1)]
+
+def scoring_speed(model, texts: list[str], repeats: int = 3) -> float:
+    """Best-of-N messages per second for predict_proba."""
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        model.predict_proba(texts)
+        best = min(best, time.perf_counter() - t0)
+    return len(texts) / best if best > 0 else float("inf")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model_dir", type=str, default="models/")
+    ap.add_argument("--out_dir", type=str, default="models/compact/")
+    ap.add_argument("--train", type=str, default="data/raw/train.csv", help="Data for metrics, benchmarks and L1 refit")
+    ap.add_argument("--tol", type=float, default=1e-3, help="Prune features whose |weight| is below this for every head")
+    ap.add_argument("--dtype", type=str, choices=["float32", "int8"], default="float32")
+    ap.add_argument("--l1_refit", action="store_true", help="Refit heads with an L1 penalty before pruning")
+    ap.add_argument("--l1_c", type=float, default=1.0)
+    ap.add_argument("--bench_n", type=int, default=5000)
+    ap.add_argument("--metrics", type=str, default="reports/evaluation/metrics.yaml")
+    ap.add_argument("--report", type=str, default="reports/evaluation/compact_export.yaml")
+    args = ap.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    mcfg = load_config(["configs/models.yaml"])
+    labels = mcfg["abuse"]["labels"]
+    df = pd.read_csv(args.train)
+    texts = df["comment_text"].tolist()
+    bench = texts[: args.bench_n]
+    Y_abuse = MultiLabelBinarizer(classes=labels).fit_transform(extract_multilabel(df, labels))
+    y_crisis = df["toxic"].values  # same proxy target as train_and_save_models
+
+    report = {"settings": {"tol": args.tol, "dtype": args.dtype, "l1_refit": args.l1_refit}}
+    compact_metrics = {}
+    for name, targets in (("abuse", Y_abuse), ("crisis", y_crisis)):
+        src_path = os.path.join(args.model_dir, f"{name}_detector.joblib")
+        out_path = os.path.join(args.out_dir, f"{name}_detector.joblib")
+        model = joblib.load(src_path)
+
+        coef = intercept = None
+        if args.l1_refit:
+            coef, intercept = l1_select(model.pipeline, texts, targets, c=args.l1_c)
+        compact = copy.copy(model)
+        compact.pipeline = compact_pipeline(model.pipeline, tol=args.tol, dtype=args.dtype, coef=coef, intercept=intercept)
+        joblib.dump(compact, out_path)
+
+        probs = compact.predict_proba(texts)
+        if name == "abuse":
+            compact_metrics[name] = multilabel_metrics(Y_abuse, probs, labels=labels)
+        else:
+            compact_metrics[name] = binary_metrics(y_crisis, probs)
+
+        report[name] = {
+            "file_bytes": {"before": os.path.getsize(src_path), "after": os.path.getsize(out_path)},
+            "before": pipeline_summary(model.pipeline),
+            "after": pipeline_summary(compact.pipeline),
+            "msgs_per_sec": {"before": scoring_speed(model, bench), "after": scoring_speed(compact, bench)},
+        }
+
+    report["metric_deltas"] = metric_deltas(compact_metrics, load_config([args.metrics]))
+    os.makedirs(os.path.dirname(args.report), exist_ok=True)
+    with open(args.report, "w", encoding="utf-8") as f:
+        yaml.safe_dump(report, f)
+
+    print("✅ Compact models saved to:", args.out_dir)
+    for name in ("abuse", "crisis"):
+        r = report[name]
+        print(
+            f"  {name}: vocab {r['before']['vocabulary']} → {r['after']['vocabulary']}, "
+            f"file {r['file_bytes']['before'] / 1e6:.2f}MB → {r['file_bytes']['after'] / 1e6:.2f}MB, "
+            f"{r['msgs_per_sec']['before']:.0f} → {r['msgs_per_sec']['after']:.0f} msgs/s"
+        )
+    print("📊 Report saved to:", args.report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import yaml
+from src.config_loader import load_config
+from src.policy_engine.replay import compare_policies, load_decision_records
+from src.utils.audit_log import ACTIONS
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--records", type=str, default="reports/audit", help="Audit log directory or .npy record dump")
+    ap.add_argument("--current", type=str, default="configs/policy.yaml")
+    ap.add_argument("--candidate", type=str, required=True, help="Candidate policy.yaml")
+    ap.add_argument("--candidate_models", type=str, default=None,
+                    help="Optional candidate models.yaml; its escalation settings are replayed per session")
+    ap.add_argument("--max_changed", type=int, default=100, help="Changed messages listed in the report")
+    ap.add_argument("--changed_out", type=str, default=None, help="Optional CSV with every changed message")
+    ap.add_argument("--report", type=str, default="reports/evaluation/policy_replay.yaml")
+    args = ap.parse_args()
+
+    start = time.perf_counter()
+    meta, records = load_decision_records(args.records)
+    if len(records) == 0:
+        print("⚠️ No decision records found at:", args.records)
+        return
+    current, candidate = load_config([args.current]), load_config([args.candidate])
+    cand_esc = load_config([args.candidate_models]).get("escalation") if args.candidate_models else None
+    cur_esc = load_config(["configs/models.yaml"]).get("escalation") if cand_esc else None
+
+    report, changed = compare_policies(
+        records, meta, current, candidate,
+        current_escalation=cur_esc, candidate_escalation=cand_esc, max_changed=args.max_changed,
+    )
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    report["config_version"] = meta.get("config_version")
+    report["model_version"] = meta.get("model_version")
+
+    os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+    with open(args.report, "w", encoding="utf-8") as f:
+        yaml.safe_dump(report, f, sort_keys=False)
+    if args.changed_out:
+        pd.DataFrame({
+            "seq": records["seq"][changed],
+            "ts": records["ts"][changed],
+            "session_id": np.char.decode(records["session_id"][changed], "utf-8"),
+            "logged_action": np.asarray(ACTIONS)[records["action"][changed]],
+        }).to_csv(args.changed_out, index=False)
+
+    acts = report["actions"]
+    print(f"🔁 Replayed {report['records']} decisions in {report['seconds']}s")
+    for a in ACTIONS:
+        print(f"   {a:>5}: {acts['current'][a]} -> {acts['candidate'][a]} ({acts['delta'][a]:+d})")
+    rth = report["route_to_human"]
+    print(f"🧑‍⚖️ Routed to human: {rth['current']} -> {rth['candidate']} ({rth['delta']:+d})")
+    print(f"✏️ Changed messages: {report['changed']}")
+    print("📝 Report saved to:", args.report)
+
+if __name__ == "__main__":
+    main()
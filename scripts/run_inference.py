@@ -1,6 +1,6 @@
 import argparse
 from src.config_loader import load_config
-from src.orchestrator.inference_pipeline import InferenceOrchestrator
+from src.orchestrator.sharding import build_inference
 from pprint import pprint
 
 def build_configs():
@@ -9,17 +9,23 @@ def build_configs():
         "models": load_config(["configs/models.yaml"]),
         "policy": load_config(["configs/policy.yaml"]),
         "ui": load_config(["configs/ui.yaml"]),
+        "runtime": load_config(["configs/runtime.yaml"]),
     }
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--text", type=str, required=True, help="Input message to analyze")
     ap.add_argument("--age", type=str, default="13+", help="User age group")
+    ap.add_argument("--dump_metrics", action="store_true", help="Print the online monitor metrics")
+    ap.add_argument("--memory_report", action="store_true", help="Print the estimated memory of each loaded component")
+    ap.add_argument("--shards", type=int, default=None, help="Score on this many sharded worker processes (0 = in-process; default: runtime.yaml sharding)")
     args = ap.parse_args()
 
     cfgs = build_configs()
-    orch = InferenceOrchestrator(cfgs)
+    orch = build_inference(cfgs, args.shards)
     result = orch.infer(args.text, args.age)
+    metrics = orch.metrics_snapshot() if args.dump_metrics else None
+    orch.close()
 
     print("\n🧠 Decision:")
     pprint(result["decision"])
@@ -30,6 +36,20 @@ def main():
         "escalation": result["escalation"],
         "content": result["content"]
     })
+    if args.dump_metrics:
+        print("\n📈 Monitor Metrics:")
+        pprint(metrics)
+    if args.memory_report and not hasattr(orch, "memory_report"):
+        print("\n💾 Memory report is per process; run with --shards 0 to print it.")
+    elif args.memory_report:
+        report = orch.memory_report()
+        print("\n💾 Memory (MiB):")
+        for name, entry in sorted(report["components"].items(), key=lambda kv: -kv[1]["bytes"]):
+            parts = ", ".join(f"{k}={v / 2**20:.2f}" for k, v in entry.get("parts", {}).items())
+            print(f"  {name:<16} {entry['bytes'] / 2**20:8.2f}" + (f"  ({parts})" if parts else ""))
+        print(f"  {'accounted':<16} {report['accounted_bytes'] / 2**20:8.2f}")
+        if report["process_rss_bytes"] is not None:
+            print(f"  {'process rss':<16} {report['process_rss_bytes'] / 2**20:8.2f}")
 
 if __name__ == "__main__":
     main()
@@ -8,6 +8,9 @@ from src.config_loader import load_config
 from src.models.abuse_detector import AbuseDetector
 from src.models.crisis_detector import CrisisDetector
 from src.utils.metrics import multilabel_metrics, binary_metrics
+from src.utils.drift_monitor import build_reference
+from src.orchestrator.inference_pipeline import InferenceOrchestrator
+from scripts.run_inference import build_configs
 
 def extract_multilabel(df: pd.DataFrame, label_cols: list[str]) -> list[list[str]]:
     return df.apply(lambda row: [label for label in label_cols if row[label] == 1], axis=1).tolist()
@@ -22,6 +25,7 @@ def main():
     ap.add_argument("--train", type=str, default="data/raw/train.csv")
     ap.add_argument("--out_dir", type=str, default="models/")
     ap.add_argument("--report", type=str, default="reports/evaluation/metrics.yaml")
+    ap.add_argument("--drift_bins", type=int, default=20, help="Histogram bins of the exported score reference")
     args = ap.parse_args()
 
     os.makedirs(args.out_dir, exist_ok=True)
@@ -47,7 +51,19 @@ def main():
     joblib.dump(crisis_model, os.path.join(args.out_dir, "crisis_detector.joblib"))
 
     # Evaluate CrisisDetector
-    crisis_metrics = binary_metrics(df["toxic"].tolist(), crisis_model.predict_proba(df["comment_text"].tolist()))
+    crisis_prob = crisis_model.predict_proba(df["comment_text"].tolist())
+    crisis_metrics = binary_metrics(df["toxic"].tolist(), crisis_prob)
+
+    # Score distributions for online drift monitoring, scored on the serving path
+    # (masking, normalization, windowing and pooling) that live scores go through
+    cfgs = build_configs()
+    orch = InferenceOrchestrator(cfgs)
+    orch.load_models_from_disk(args.out_dir)
+    reference = build_reference(
+        [*labels, "crisis"], orch.head_scores(df["comment_text"].tolist()), cfgs["policy"]["actions"], args.drift_bins
+    )
+    orch.close()
+    save_yaml(reference, os.path.join(args.out_dir, "score_reference.yaml"))
 
     # Save metrics
     save_yaml({
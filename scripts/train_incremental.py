@@ -0,0 +1,115 @@
+import os
+import time
+import shutil
+import argparse
+import joblib
+import pandas as pd
+import yaml
+from src.config_loader import load_config
+from src.utils.metrics import binary_metrics, metric_deltas, multilabel_metrics
+from src.utils.drift_monitor import build_reference
+from src.orchestrator.inference_pipeline import InferenceOrchestrator
+from scripts.run_inference import build_configs
+
+def evaluate(abuse, crisis, df: pd.DataFrame, labels: list[str]) -> dict:
+    texts = df["comment_text"].astype(str).tolist()
+    return {
+        "abuse": multilabel_metrics(df[labels].values, abuse.predict_proba(texts), labels=labels),
+        # Crisis uses 'toxic' as a proxy label, as in train_and_save_models
+        "crisis": binary_metrics(df["toxic"].values, crisis.predict_proba(texts)),
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model_dir", type=str, default="models/", help="Current artifacts to start from")
+    ap.add_argument("--delta", type=str, required=True, help="Newly labelled rows (train.csv layout)")
+    ap.add_argument("--old", type=str, default="data/raw/train.csv", help="Previous training data ('' to skip)")
+    ap.add_argument("--old_sample", type=float, default=1.0, help="Fraction of the old data replayed with the delta")
+    ap.add_argument("--eval", type=str, default=None, help="Evaluation CSV (default: a holdout of the delta)")
+    ap.add_argument("--holdout", type=float, default=0.2)
+    ap.add_argument("--refresh_idf", action="store_true", help="Re-estimate IDF weights on old + delta data")
+    ap.add_argument("--max_iter", type=int, default=100, help="Iteration cap per warm-started head")
+    ap.add_argument("--out_root", type=str, default="models/versions/")
+    ap.add_argument("--drift_bins", type=int, default=20, help="Histogram bins of the exported score reference")
+    ap.add_argument("--promote", action="store_true", help="Also copy the new artifacts into --model_dir")
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    mcfg = load_config(["configs/models.yaml"])
+    labels = mcfg["abuse"]["labels"]
+    cols = ["comment_text", *labels]
+
+    abuse = joblib.load(os.path.join(args.model_dir, "abuse_detector.joblib"))
+    crisis = joblib.load(os.path.join(args.model_dir, "crisis_detector.joblib"))
+
+    delta = pd.read_csv(args.delta, usecols=cols)
+    if args.eval:
+        eval_df = pd.read_csv(args.eval, usecols=cols)
+    else:
+        eval_df = delta.sample(frac=args.holdout, random_state=args.seed)
+        delta = delta.drop(eval_df.index)
+    parts = [delta]
+    if args.old:
+        old = pd.read_csv(args.old, usecols=cols)
+        parts.insert(0, old.sample(frac=args.old_sample, random_state=args.seed) if args.old_sample < 1 else old)
+    train = pd.concat(parts, ignore_index=True)
+    texts = train["comment_text"].astype(str).tolist()
+
+    base_metrics = evaluate(abuse, crisis, eval_df, labels)
+
+    start = time.perf_counter()
+    summary = {
+        "abuse": abuse.warm_start(
+            texts, abuse.mlb.inverse_transform(train[abuse.labels].values), args.refresh_idf, args.max_iter
+        ),
+        "crisis": crisis.warm_start(texts, train["toxic"].values, args.refresh_idf, args.max_iter),
+    }
+    train_seconds = time.perf_counter() - start
+    new_metrics = evaluate(abuse, crisis, eval_df, labels)
+
+    version = time.strftime("%Y%m%d-%H%M%S")
+    out_dir = os.path.join(args.out_root, version)
+    os.makedirs(out_dir, exist_ok=True)
+    joblib.dump(abuse, os.path.join(out_dir, "abuse_detector.joblib"))
+    joblib.dump(crisis, os.path.join(out_dir, "crisis_detector.joblib"))
+    # Score distributions for online drift monitoring, scored on the serving path
+    # (masking, normalization, windowing and pooling) that live scores go through
+    cfgs = build_configs()
+    orch = InferenceOrchestrator(cfgs)
+    orch.load_models_from_disk(out_dir)
+    reference = build_reference(
+        [*abuse.labels, "crisis"],
+        orch.head_scores(eval_df["comment_text"].astype(str).tolist()),
+        cfgs["policy"]["actions"],
+        args.drift_bins,
+    )
+    orch.close()
+    with open(os.path.join(out_dir, "score_reference.yaml"), "w", encoding="utf-8") as f:
+        yaml.safe_dump(reference, f, sort_keys=False)
+    manifest = {
+        "version": version,
+        "parent": os.path.abspath(args.model_dir),
+        "delta_rows": int(len(delta)),
+        "old_rows": int(len(train) - len(delta)),
+        "eval_rows": int(len(eval_df)),
+        "refresh_idf": bool(args.refresh_idf),
+        "max_iter": args.max_iter,
+        "train_seconds": round(train_seconds, 3),
+        "heads": summary,
+        "metrics": {"base": base_metrics, "new": new_metrics, "delta": metric_deltas(new_metrics, base_metrics)},
+    }
+    with open(os.path.join(out_dir, "manifest.yaml"), "w", encoding="utf-8") as f:
+        yaml.safe_dump(manifest, f, sort_keys=False)
+
+    if args.promote:
+        for name in ("abuse_detector.joblib", "crisis_detector.joblib", "score_reference.yaml"):
+            shutil.copy2(os.path.join(out_dir, name), os.path.join(args.model_dir, name))
+
+    d = manifest["metrics"]["delta"]
+    print(f"✅ Warm-started models saved to: {out_dir} ({train_seconds:.1f}s on {len(train)} rows)")
+    print(f"📊 f1_macro Δ {d['abuse'].get('f1_macro', 0.0):+.4f} | crisis f1 Δ {d['crisis'].get('f1', 0.0):+.4f}")
+    if args.promote:
+        print("🚀 Promoted to:", args.model_dir)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from __future__ import annotations
 import os
 import json
+import hashlib
 import yaml
 from typing import Any, Dict
 from src.utils.logger import get_logger
@@ -50,3 +51,10 @@ def load_config(paths: list[str]) -> Dict[str, Any]:
         config = deep_merge(config, part)
     logger.info("Config loaded", extra={"context": {"files": paths}})
     return config
+
+def config_version(configs: Dict[str, Any]) -> str:
+    """
+    Short stable hash of the merged configs, used to key cached results and audit records.
+    """
+    blob = json.dumps(configs, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(blob).hexdigest()[:12]
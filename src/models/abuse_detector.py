@@ -6,6 +6,8 @@ from sklearn.linear_model import LogisticRegression
 from sklearn.multiclass import OneVsRestClassifier
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import MultiLabelBinarizer
+from src.models.fast_tfidf import pipeline_predict_proba
+from src.models.incremental import warm_start_pipeline
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -13,17 +15,29 @@ logger = get_logger(__name__)
 class AbuseDetector:
     """
     Multi-label abuse classifier.
-    Backend: sklearn (TF-IDF + OneVsRest LogisticRegression).
+    Backends: sklearn (TF-IDF + OneVsRest LogisticRegression, trained here) or
+    transformers (a fine-tuned local checkpoint, loaded at construction; see
+    TransformerClassifier).
     Config keys: models.yaml -> abuse
     """
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], model_dir: str = ""):
         self.labels: List[str] = config.get("labels", ["toxic", "threat", "insult", "hate", "sexual"])
         self.vectorizer_max_features = config.get("sklearn", {}).get("vectorizer_max_features", 30000)
         self.c = float(config.get("sklearn", {}).get("c", 2.0))
         self.pipeline: Pipeline | None = None
         self.mlb = MultiLabelBinarizer(classes=self.labels)
+        self.backend = config.get("backend", "sklearn")
+        self.transformer = None
+        if self.backend == "transformers":
+            from src.models.transformer_backend import TransformerClassifier
+            self.transformer = TransformerClassifier(
+                {"checkpoint": "abuse_transformer", **config.get("transformers", {})}, model_dir
+            )
+            self._columns = self.transformer.columns(self.labels)
 
     def fit(self, texts: List[str], y_labels: List[List[str]]):
+        if self.transformer is not None:
+            raise RuntimeError("transformers checkpoints are fine-tuned outside this pipeline")
         Y = self.mlb.fit_transform(y_labels)
         self.pipeline = Pipeline([
             ("tfidf", TfidfVectorizer(max_features=self.vectorizer_max_features, ngram_range=(1, 2))),
@@ -33,13 +47,31 @@ class AbuseDetector:
         logger.info("AbuseDetector trained", extra={"context": {"labels": self.labels}})
         return self
 
+    def warm_start(
+        self, texts: List[str], y_labels: List[List[str]], refresh_idf: bool = False, max_iter: int = 100
+    ) -> Dict[str, Any]:
+        """
+        Continue training from the current vocabulary and coefficients (see `warm_start_pipeline`).
+        """
+        if not self.pipeline:
+            raise RuntimeError("AbuseDetector not fitted")
+        Y = self.mlb.transform(y_labels)
+        return warm_start_pipeline(self.pipeline, texts, Y, refresh_idf_weights=refresh_idf, max_iter=max_iter)
+
     def predict_proba(self, texts: List[str]) -> np.ndarray:
+        if getattr(self, "transformer", None) is not None:  # absent from pickles of older versions
+            return self.transformer.predict_proba(texts)[:, self._columns]
         if not self.pipeline:
             raise RuntimeError("AbuseDetector not fitted")
-        return np.array(self.pipeline.predict_proba(texts))
+        return np.array(pipeline_predict_proba(self.pipeline, texts))
 
     def predict(self, texts: List[str], thresholds: Dict[str, float]) -> List[Dict[str, Any]]:
-        probs = self.predict_proba(texts)
+        return self.predict_from_proba(self.predict_proba(texts), thresholds)
+
+    def predict_from_proba(self, probs: np.ndarray, thresholds: Dict[str, float]) -> List[Dict[str, Any]]:
+        """
+        Build per-message results from precomputed (e.g. pooled) probabilities.
+        """
         results = []
         for row in probs:
             label_scores = {lbl: float(score) for lbl, score in zip(self.labels, row)}
@@ -49,3 +81,11 @@ class AbuseDetector:
                 "labels": [lbl for lbl, flag in label_flags.items() if flag]
             })
         return results
+
+    def label_masks(self, probs: np.ndarray, thresholds: Dict[str, float]) -> np.ndarray:
+        """
+        Thresholded labels per row as bitmasks (bit j = self.labels[j]).
+        """
+        thr = np.array([thresholds.get(lbl, 0.5) for lbl in self.labels])
+        bits = np.left_shift(np.uint64(1), np.arange(len(self.labels), dtype=np.uint64))
+        return ((np.asarray(probs) >= thr) * bits).sum(axis=1, dtype=np.uint64)
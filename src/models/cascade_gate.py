@@ -0,0 +1,98 @@
+from __future__ import annotations
+from typing import Dict, Any, Iterable, List, Tuple
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import LogisticRegression
+from src.models.crisis_detector import CRISIS_KEYWORDS
+from src.preprocessing.text_normalization import normalize_text
+from src.utils.keyword_matcher import KeywordMatcher
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+def cascade_keywords(models_cfg: Dict[str, Any]) -> List[str]:
+    """
+    Collect every keyword the full pipeline flags on; any hit blocks an early exit.
+    Config keys: models.yaml -> cascade.keywords, content_filter.rules
+    """
+    rules = models_cfg.get("content_filter", {}).get("rules", {})
+    keywords = list(models_cfg.get("cascade", {}).get("keywords", []))
+    keywords += [k for kws in rules.values() for k in kws]
+    keywords += [k for kws in CRISIS_KEYWORDS.values() for k in kws]
+    return keywords
+
+class CascadeGate:
+    """
+    Cheap first-stage screen that lets clearly benign messages skip the full pipeline.
+    Backend: sklearn (small HashingVectorizer + LogisticRegression) plus a keyword matcher.
+    Config keys: models.yaml -> cascade
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.n_features = int(config.get("n_features", 4096))
+        self.c = float(config.get("c", 1.0))
+        self.exit_threshold = float(config.get("exit_threshold") or 0.0)
+        self.vectorizer = HashingVectorizer(
+            n_features=self.n_features, ngram_range=(1, 1), alternate_sign=False, norm="l2"
+        )
+        self.clf: LogisticRegression | None = None
+        self.matcher = KeywordMatcher({"keywords": config.get("keywords", [])})
+
+    def set_keywords(self, keywords: Iterable[str]):
+        """
+        Replace the keyword list; any hit forces the message through the full pipeline.
+        """
+        self.matcher = KeywordMatcher({"keywords": keywords})
+        return self
+
+    def fit(self, texts: List[str], y_unsafe: List[int]):
+        """
+        Train the screen on binary targets (1 = message needs full scoring).
+        """
+        self.clf = LogisticRegression(C=self.c, max_iter=200, class_weight="balanced")
+        self.clf.fit(self.vectorizer.transform(texts), y_unsafe)
+        logger.info("CascadeGate trained", extra={"context": {"samples": len(texts), "n_features": self.n_features}})
+        return self
+
+    def score(self, texts: List[str]) -> np.ndarray:
+        """
+        Probability that each message needs full scoring.
+        """
+        if self.clf is None:
+            raise RuntimeError("CascadeGate not fitted")
+        return self.clf.predict_proba(self.vectorizer.transform(texts))[:, 1]
+
+    def calibrate(self, texts: List[str], exit_rate: float) -> float:
+        """
+        Choose the exit threshold so that roughly `exit_rate` of the given
+        (representative, unlabeled) traffic exits early.
+
+        Returns:
+            The calibrated threshold, also stored on the gate.
+        """
+        scores = self.score(texts)
+        eligible = scores[~self._keyword_hits(texts)]
+        if eligible.size == 0 or exit_rate <= 0:
+            self.exit_threshold = 0.0
+        else:
+            q = min(1.0, exit_rate * len(texts) / eligible.size)
+            self.exit_threshold = float(np.quantile(eligible, q))
+        logger.info("CascadeGate calibrated", extra={"context": {"exit_rate": exit_rate, "threshold": self.exit_threshold}})
+        return self.exit_threshold
+
+    def exit_mask(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Decide which messages are clearly safe.
+
+        Returns:
+            (mask, scores): mask is True where the message may exit early;
+            scores are the gate probabilities, used as the risk bound for exits.
+        """
+        scores = self.score(texts)
+        mask = (scores <= self.exit_threshold) & ~self._keyword_hits(texts)
+        return mask, scores
+
+    def _keyword_hits(self, texts: List[str]) -> np.ndarray:
+        # Match on normalized text (NFKC, lowercase, punctuation stripped) as the full
+        # pipeline's keyword rules do, so fullwidth or styled keywords cannot slip past
+        return np.fromiter((self.matcher.any(normalize_text(t)) for t in texts), dtype=bool, count=len(texts))
@@ -0,0 +1,188 @@
+from __future__ import annotations
+import copy
+from typing import Dict, Any, List, Tuple
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SUPPORTED_DTYPES = ("float32", "int8")
+# Logit standing in for a constant head (sigmoid saturates to 0 or 1 in float32)
+_CONSTANT_LOGIT = 30.0
+
+def linear_head_params(pipeline: Pipeline) -> Tuple[TfidfVectorizer, np.ndarray, np.ndarray]:
+    """
+    Extract (vectorizer, coef, intercept) from a fitted TF-IDF + linear pipeline.
+
+    Handles OneVsRest LogisticRegression (abuse), binary LogisticRegression (crisis)
+    and CompactLinearClassifier heads. OneVsRest heads trained without positive
+    (or negative) examples hold a constant predictor; they become a zero
+    coefficient row with a saturated intercept.
+
+    Returns:
+        coef of shape (n_heads, n_features) and intercept of shape (n_heads,)
+    """
+    vec = pipeline.named_steps["tfidf"]
+    clf = pipeline.named_steps["clf"]
+    if hasattr(clf, "estimators_"):
+        n_features = len(vec.vocabulary_)
+        coef = np.vstack([
+            est.coef_ if hasattr(est, "coef_") else np.zeros((1, n_features)) for est in clf.estimators_
+        ])
+        intercept = np.concatenate([
+            est.intercept_ if hasattr(est, "coef_") else [_CONSTANT_LOGIT if est.y_[0] else -_CONSTANT_LOGIT]
+            for est in clf.estimators_
+        ])
+    else:
+        coef = np.atleast_2d(clf.coef_)
+        intercept = np.atleast_1d(clf.intercept_)
+    return vec, np.asarray(coef), np.asarray(intercept)
+
+class CompactLinearClassifier:
+    """
+    Inference-only logistic head with pruned, reduced-precision coefficients.
+
+    Coefficients are stored feature-major (n_features, n_heads) as float32, or as
+    int8 with one float32 scale per head. `binary=True` mimics a binary
+    LogisticRegression (predict_proba returns two columns); otherwise it mimics
+    OneVsRest (one probability column per head).
+    """
+
+    def __init__(self, coef: np.ndarray, intercept: np.ndarray, *, dtype: str = "float32", binary: bool = False):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported dtype: {dtype}")
+        coef = np.asarray(coef, dtype=np.float64)
+        self.dtype = dtype
+        self.binary = binary
+        self.intercept = np.asarray(intercept, dtype=np.float32)
+        if dtype == "int8":
+            max_abs = np.abs(coef).max(axis=1)
+            self.scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+            self.coef = np.round(coef.T / self.scales).astype(np.int8)
+        else:
+            self.scales = np.ones(coef.shape[0], dtype=np.float32)
+            self.coef = np.ascontiguousarray(coef.T, dtype=np.float32)
+        self.classes_ = np.array([0, 1])
+
+    @property
+    def coef_(self) -> np.ndarray:
+        """Dequantized coefficients of shape (n_heads, n_features)."""
+        return (self.coef.T.astype(np.float32) * self.scales[:, None])
+
+    @property
+    def intercept_(self) -> np.ndarray:
+        return self.intercept
+
+    def __repr__(self) -> str:
+        return f"CompactLinearClassifier(features={self.coef.shape[0]}, heads={self.coef.shape[1]}, dtype={self.dtype})"
+
+    def _scores(self, X) -> np.ndarray:
+        return np.asarray(X @ self.coef, dtype=np.float32) * self.scales + self.intercept
+
+    def decision_function(self, X) -> np.ndarray:
+        scores = self._scores(X)
+        return scores[:, 0] if self.binary else scores
+
+    def predict_proba(self, X) -> np.ndarray:
+        p = 1.0 / (1.0 + np.exp(-self._scores(X)))
+        if self.binary:
+            return np.column_stack([1.0 - p[:, 0], p[:, 0]])
+        return p
+
+    def predict(self, X) -> np.ndarray:
+        p = self.predict_proba(X)
+        return (p[:, 1] >= 0.5).astype(int) if self.binary else (p >= 0.5).astype(int)
+
+def prune_vectorizer(vec: TfidfVectorizer, keep: np.ndarray, *, dtype=np.float32) -> TfidfVectorizer:
+    """
+    Copy a fitted TfidfVectorizer keeping only the given feature indices.
+    Kept features are renumbered in their original order.
+    """
+    keep = np.sort(np.asarray(keep))
+    new_index = np.full(len(vec.vocabulary_), -1, dtype=np.int64)
+    new_index[keep] = np.arange(keep.size)
+    pruned = copy.deepcopy(vec)
+    pruned.vocabulary_ = {t: int(new_index[i]) for t, i in vec.vocabulary_.items() if new_index[i] >= 0}
+    del pruned._tfidf  # rebuilt by the idf_ setter for the new feature count
+    pruned.idf_ = vec.idf_[keep]
+    pruned.dtype = dtype
+    if hasattr(pruned, "stop_words_"):
+        del pruned.stop_words_  # only needed for introspection; can dominate pickle size
+    return pruned
+
+def l1_select(
+    pipeline: Pipeline, texts: List[str], Y: np.ndarray, *, c: float = 1.0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Refit every head with an L1 penalty on the existing vocabulary.
+
+    Args:
+        Y: Binary targets of shape (n_samples, n_heads)
+
+    Returns:
+        (coef, intercept) of the L1 heads; zeroed features can be pruned.
+        Heads whose targets hold a single class keep their original weights.
+    """
+    vec, base_coef, base_intercept = linear_head_params(pipeline)
+    X = vec.transform(texts)
+    Y = np.asarray(Y).reshape(len(texts), -1)
+    coefs, intercepts = [], []
+    for j in range(Y.shape[1]):
+        if np.unique(Y[:, j]).size < 2:
+            coefs.append(base_coef[j])
+            intercepts.append(base_intercept[j])
+            continue
+        clf = LogisticRegression(penalty="l1", solver="liblinear", C=c, max_iter=200).fit(X, Y[:, j])
+        coefs.append(clf.coef_[0])
+        intercepts.append(clf.intercept_[0])
+    return np.vstack(coefs), np.asarray(intercepts)
+
+def compact_pipeline(
+    pipeline: Pipeline,
+    *,
+    tol: float = 1e-3,
+    dtype: str = "float32",
+    coef: np.ndarray | None = None,
+    intercept: np.ndarray | None = None
+) -> Pipeline:
+    """
+    Build a pruned, reduced-precision copy of a TF-IDF + logistic pipeline.
+
+    A feature is dropped when its absolute weight is below `tol` for every head.
+
+    Args:
+        tol: Pruning tolerance on absolute coefficient values
+        dtype: "float32" or "int8" coefficient storage
+        coef/intercept: Optional replacement weights (e.g. from `l1_select`)
+
+    Returns:
+        sklearn Pipeline with a pruned vectorizer and a CompactLinearClassifier
+    """
+    vec, base_coef, base_intercept = linear_head_params(pipeline)
+    coef = base_coef if coef is None else coef
+    intercept = base_intercept if intercept is None else intercept
+    keep = np.flatnonzero(np.abs(coef).max(axis=0) >= tol)
+    binary = not hasattr(pipeline.named_steps["clf"], "estimators_")
+    head = CompactLinearClassifier(coef[:, keep], intercept, dtype=dtype, binary=binary)
+    logger.info(
+        "Pipeline compacted",
+        extra={"context": {"features_before": int(coef.shape[1]), "features_after": int(keep.size), "dtype": dtype}},
+    )
+    return Pipeline([("tfidf", prune_vectorizer(vec, keep)), ("clf", head)])
+
+def pipeline_summary(pipeline: Pipeline) -> Dict[str, Any]:
+    """
+    Report vocabulary size and coefficient storage for a pipeline.
+    """
+    vec, coef, _ = linear_head_params(pipeline)
+    clf = pipeline.named_steps["clf"]
+    stored = clf.coef if isinstance(clf, CompactLinearClassifier) else coef
+    return {
+        "vocabulary": len(vec.vocabulary_),
+        "heads": int(coef.shape[0]),
+        "coef_dtype": str(stored.dtype),
+        "coef_bytes": int(stored.nbytes),
+    }
@@ -3,6 +3,8 @@ from typing import Dict, Any, List
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 from sklearn.pipeline import Pipeline
+from src.models.fast_tfidf import pipeline_features
+from src.utils.keyword_matcher import KeywordMatcher
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -16,6 +18,11 @@ class ContentFilter:
 
     def __init__(self, config: Dict[str, Any]):
         self.rules = config.get("rules", {})
+        self.matcher = KeywordMatcher({
+            "sexual": self.rules.get("sexual_keywords", []),
+            "violence": self.rules.get("violence_keywords", []),
+            "substances": self.rules.get("substances_keywords", []),
+        })
         clf_cfg = config.get("classifier", {})
         self.vectorizer_max_features = clf_cfg.get("vectorizer_max_features", 15000)
         self.c = float(clf_cfg.get("c", 1.0))
@@ -28,14 +35,7 @@ class ContentFilter:
         Returns:
             Dict of flags: sexual, violence, substances
         """
-        def has_any(key: str) -> bool:
-            return any(k.lower() in text.lower() for k in self.rules.get(key, []))
-
-        return {
-            "sexual": has_any("sexual_keywords"),
-            "violence": has_any("violence_keywords"),
-            "substances": has_any("substances_keywords"),
-        }
+        return self.matcher.group_flags(text)
 
     def fit(self, texts: List[str], y_age_class: List[str]):
         """
@@ -58,7 +58,7 @@ class ContentFilter:
         """
         preds = ["13+" for _ in texts]  # default fallback
         if self.pipeline:
-            preds = list(self.pipeline.predict(texts))
+            preds = list(self.pipeline.steps[-1][1].predict(pipeline_features(self.pipeline, texts)))
 
         results = []
         for text, age in zip(texts, preds):
@@ -4,22 +4,48 @@ import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 from sklearn.pipeline import Pipeline
+from src.models.fast_tfidf import pipeline_predict_proba
+from src.models.incremental import warm_start_pipeline
+from src.utils.keyword_matcher import KeywordMatcher
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Keyword flags reported alongside the classifier score
+CRISIS_KEYWORDS = {
+    "self_harm": ["hurt myself", "cut myself", "self harm"],
+    "suicide": ["suicide", "end my life", "kill myself"],
+    "harm": ["harm", "hurt", "damage", "injure"],
+}
+_CRISIS_MATCHER = KeywordMatcher(CRISIS_KEYWORDS)
+# Order of the "flags" of a result; bit i of `flag_masks` is CRISIS_FLAGS[i]
+CRISIS_FLAGS = ["crisis", *CRISIS_KEYWORDS]
+
 class CrisisDetector:
     """
     Binary crisis classifier.
-    Backend: sklearn (TF-IDF + LogisticRegression).
+    Backends: sklearn (TF-IDF + LogisticRegression, trained here) or transformers
+    (a fine-tuned local checkpoint whose "crisis" label, or last label, is the
+    crisis probability; see TransformerClassifier).
     Config keys: models.yaml -> crisis
     """
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], model_dir: str = ""):
         self.vectorizer_max_features = config.get("sklearn", {}).get("vectorizer_max_features", 20000)
         self.c = float(config.get("sklearn", {}).get("c", 1.0))
         self.pipeline: Pipeline | None = None
+        self.backend = config.get("backend", "sklearn")
+        self.transformer = None
+        if self.backend == "transformers":
+            from src.models.transformer_backend import TransformerClassifier
+            self.transformer = TransformerClassifier(
+                {"checkpoint": "crisis_transformer", **config.get("transformers", {})}, model_dir
+            )
+            names = self.transformer.id2label
+            self._column = next((k for k, v in names.items() if v.lower() == "crisis"), len(names) - 1)
 
     def fit(self, texts: List[str], y: List[int]):
+        if self.transformer is not None:
+            raise RuntimeError("transformers checkpoints are fine-tuned outside this pipeline")
         self.pipeline = Pipeline([
             ("tfidf", TfidfVectorizer(max_features=self.vectorizer_max_features, ngram_range=(1, 2))),
             ("clf", LogisticRegression(C=self.c, max_iter=200)),
@@ -28,22 +54,32 @@ class CrisisDetector:
         logger.info("CrisisDetector trained", extra={"context": {"samples": len(texts)}})
         return self
 
+    def warm_start(self, texts: List[str], y: List[int], refresh_idf: bool = False, max_iter: int = 100) -> Dict[str, Any]:
+        """
+        Continue training from the current vocabulary and coefficients (see `warm_start_pipeline`).
+        """
+        if not self.pipeline:
+            raise RuntimeError("CrisisDetector not fitted")
+        return warm_start_pipeline(self.pipeline, texts, np.asarray(y), refresh_idf_weights=refresh_idf, max_iter=max_iter)
+
     def predict_proba(self, texts: List[str]) -> np.ndarray:
+        if getattr(self, "transformer", None) is not None:  # absent from pickles of older versions
+            return self.transformer.predict_proba(texts)[:, self._column]
         if not self.pipeline:
             raise RuntimeError("CrisisDetector not fitted")
-        return self.pipeline.predict_proba(texts)[:, 1]  # Probability of crisis class
+        return pipeline_predict_proba(self.pipeline, texts)[:, 1]  # Probability of crisis class
 
     def predict(self, texts: list[str], threshold: float = 0.5) -> list[dict[str, any]]:
-        probs = self.predict_proba(texts)
+        return self.predict_from_proba(self.predict_proba(texts), texts, threshold)
+
+    def predict_from_proba(self, probs: np.ndarray, texts: list[str], threshold: float = 0.5) -> list[dict[str, any]]:
+        """
+        Build per-message results from precomputed (e.g. pooled) probabilities.
+        Keyword flags are still taken from the texts.
+        """
         results = []
         for i, score in enumerate(probs):
-            text = texts[i].lower()
-            label_flags = {
-                "crisis": score >= threshold,
-                "self_harm": any(kw in text for kw in ["hurt myself", "cut myself", "self harm"]),
-                "suicide": any(kw in text for kw in ["suicide", "end my life", "kill myself"]),
-                "harm": any(kw in text for kw in ["harm", "hurt", "damage", "injure"])
-            }
+            label_flags = {"crisis": score >= threshold, **_CRISIS_MATCHER.group_flags(texts[i])}
             results.append({
                 "score": float(score),
                 "label": "crisis" if score >= threshold else "non-crisis",
@@ -51,3 +87,10 @@ class CrisisDetector:
                 "labels": [lbl for lbl, flag in label_flags.items() if flag]
             })
         return results
+
+    def flag_masks(self, probs: np.ndarray, texts: List[str], threshold: float = 0.5) -> np.ndarray:
+        """
+        Same flags as `predict_from_proba` as bitmasks over CRISIS_FLAGS.
+        """
+        masks = np.fromiter((_CRISIS_MATCHER.group_mask(t) << 1 for t in texts), dtype=np.uint64, count=len(texts))
+        return masks | (np.asarray(probs) >= threshold).astype(np.uint64)
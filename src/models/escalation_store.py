@@ -0,0 +1,338 @@
+from __future__ import annotations
+import os
+import time
+import sqlite3
+import threading
+from array import array
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from src.models.escalation_tracker import EscalationTracker
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class EscalationStore:
+    """
+    Persistence interface for per-session escalation state.
+    State dicts are those produced by `EscalationTracker.to_state`.
+    """
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def save_many(self, states: Iterable[Tuple[str, Dict[str, Any], float]]) -> int:
+        """
+        Upsert (session_id, state, updated_at) rows in one batch.
+
+        Returns:
+            Number of rows written
+        """
+        raise NotImplementedError
+
+    def delete_expired(self, before: float) -> int:
+        """
+        Delete sessions last updated before the given epoch time.
+
+        Returns:
+            Number of sessions removed
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class SQLiteEscalationStore(EscalationStore):
+    """
+    Local SQLite backend (WAL mode).
+    Uses separate reader and writer connections so lazy loads on the request
+    path do not wait behind a batch flush.
+    """
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._writer = self._connect()
+        self._writer.execute(
+            "CREATE TABLE IF NOT EXISTS escalation_sessions ("
+            "session_id TEXT PRIMARY KEY, ewma REAL NOT NULL, history BLOB NOT NULL, times BLOB NOT NULL, "
+            "updated_at REAL NOT NULL)"
+        )
+        self._writer.execute("CREATE INDEX IF NOT EXISTS idx_escalation_updated ON escalation_sessions(updated_at)")
+        self._writer.commit()
+        self._reader = self._connect()
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._read_lock:
+            row = self._reader.execute(
+                "SELECT ewma, history, times FROM escalation_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"ewma": row[0], "history": array("d", row[1]).tolist(), "times": array("d", row[2]).tolist()}
+
+    def save_many(self, states: Iterable[Tuple[str, Dict[str, Any], float]]) -> int:
+        rows = [
+            (sid, float(st["ewma"]), array("d", st["history"]).tobytes(), array("d", st.get("times", [])).tobytes(), ts)
+            for sid, st, ts in states
+        ]
+        if not rows:
+            return 0
+        with self._write_lock:
+            with self._writer:
+                self._writer.executemany(
+                    "INSERT OR REPLACE INTO escalation_sessions (session_id, ewma, history, times, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+        return len(rows)
+
+    def delete_expired(self, before: float) -> int:
+        with self._write_lock:
+            with self._writer:
+                cur = self._writer.execute("DELETE FROM escalation_sessions WHERE updated_at < ?", (before,))
+        return cur.rowcount
+
+    def close(self):
+        with self._write_lock, self._read_lock:
+            self._writer.close()
+            self._reader.close()
+
+def build_escalation_store(config: Dict[str, Any]) -> Optional[EscalationStore]:
+    """
+    Create the configured store.
+    Config keys: models.yaml -> escalation.persistence
+    """
+    backend = (config.get("backend") or "none").lower()
+    if backend == "none":
+        return None
+    if backend == "sqlite":
+        return SQLiteEscalationStore(config.get("path", "state/escalation.sqlite"))
+    raise ValueError(f"Unknown escalation persistence backend: {backend}")
+
+class SessionEscalationRegistry:
+    """
+    Per-session escalation trackers with lazy loading and write-behind persistence.
+
+    Updates only touch memory and mark the session dirty; a background thread
+    flushes dirty sessions in batches every `flush_interval_s` and periodically
+    compacts sessions idle for longer than `session_ttl_s` (with or without a
+    store). Persisted state is loaded outside the registry lock, so a slow read
+    only delays its own session. At most `max_sessions` stay resident: past
+    that, the least recently seen tenth is evicted on insertion (without a
+    store their state is dropped; with one, only sessions already written are).
+    """
+
+    def __init__(
+        self,
+        tracker_kwargs: Dict[str, Any],
+        store: Optional[EscalationStore] = None,
+        *,
+        flush_interval_s: float = 1.0,
+        session_ttl_s: float = 86400.0,
+        compact_every: int = 60,
+        max_sessions: Optional[int] = 200000
+    ):
+        self.tracker_kwargs = tracker_kwargs
+        self.store = store
+        self.flush_interval_s = float(flush_interval_s)
+        self.session_ttl_s = float(session_ttl_s)
+        self.compact_every = int(compact_every)
+        self.max_sessions = None if max_sessions is None else int(max_sessions)
+        self._trackers: Dict[str, EscalationTracker] = {}
+        self._last_seen: Dict[str, float] = {}
+        self._dirty: set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if self.flush_interval_s > 0:
+            self._thread = threading.Thread(target=self._run, name="escalation-flush", daemon=True)
+            self._thread.start()
+
+    def __len__(self) -> int:
+        return len(self._trackers)
+
+    def get(self, session_id: str) -> EscalationTracker:
+        """
+        Return the tracker for a session, loading persisted state on first access.
+        """
+        state = self._load_unlocked(session_id)
+        with self._lock:
+            return self._get_locked(session_id, state)
+
+    def _load_unlocked(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Persisted state of a session that is not resident (read without the lock).
+        """
+        if self.store is None or session_id in self._trackers:
+            return None
+        return self.store.load(session_id)
+
+    def _get_locked(self, session_id: str, state: Optional[Dict[str, Any]] = None) -> EscalationTracker:
+        tracker = self._trackers.get(session_id)
+        if tracker is None:  # still absent after the unlocked load
+            tracker = EscalationTracker(**self.tracker_kwargs)
+            if state is not None:
+                tracker.load_state(state)
+            if self.max_sessions is not None and len(self._trackers) >= self.max_sessions:
+                self._evict_locked(len(self._trackers) - self.max_sessions + max(1, self.max_sessions // 10))
+            self._trackers[session_id] = tracker
+            self._last_seen[session_id] = time.time()
+        return tracker
+
+    def _evict_locked(self, count: int) -> int:
+        """
+        Drop up to `count` least recently seen sessions (only persisted ones with a store).
+        """
+        candidates = (
+            self._last_seen.items() if self.store is None
+            else ((sid, ts) for sid, ts in self._last_seen.items() if sid not in self._dirty)
+        )
+        victims = sorted(candidates, key=lambda kv: kv[1])[:max(0, count)]
+        for sid, _ in victims:
+            self._trackers.pop(sid, None)
+            self._last_seen.pop(sid, None)
+        return len(victims)
+
+    def _mark_locked(self, session_id: str):
+        self._last_seen[session_id] = time.time()
+        if self.store is not None:
+            self._dirty.add(session_id)
+
+    def update(self, session_id: str, risk_score: float, timestamp: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Update a session's tracker and mark it for the next flush.
+        """
+        state = self._load_unlocked(session_id)
+        with self._lock:
+            out = self._get_locked(session_id, state).update(risk_score, timestamp)
+            self._mark_locked(session_id)
+        return out
+
+    def step(self, session_id: str, risk_score: float, timestamp: Optional[float] = None) -> Tuple[float, float, Tuple[float, ...]]:
+        """
+        Same as `update`, returning the tracker's (ewma, slope, history) tuple.
+        """
+        state = self._load_unlocked(session_id)
+        with self._lock:
+            out = self._get_locked(session_id, state).step(risk_score, timestamp)
+            self._mark_locked(session_id)
+        return out
+
+    def export_state(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Snapshot one resident session (e.g. for hand-over to another worker).
+        """
+        with self._lock:
+            tracker = self._trackers.get(session_id)
+            return tracker.to_state() if tracker is not None else None
+
+    def session_ids(self) -> List[str]:
+        """
+        Ids of the sessions resident in memory.
+        """
+        with self._lock:
+            return list(self._trackers)
+
+    def pop_state(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Snapshot one resident session and drop it from memory (hand-over to another
+        worker, which takes over persisting it).
+        """
+        with self._lock:
+            tracker = self._trackers.pop(session_id, None)
+            self._last_seen.pop(session_id, None)
+            self._dirty.discard(session_id)
+            return tracker.to_state() if tracker is not None else None
+
+    def import_state(self, session_id: str, state: Dict[str, Any]):
+        """
+        Install state for a session, replacing any resident tracker.
+        """
+        with self._lock:
+            self._trackers[session_id] = EscalationTracker(**self.tracker_kwargs).load_state(state)
+            self._mark_locked(session_id)
+
+    def flush(self) -> int:
+        """
+        Persist all dirty sessions in one batch.
+
+        Returns:
+            Number of sessions written
+        """
+        with self._lock:
+            if self.store is None:
+                self._dirty.clear()
+                return 0
+            dirty, self._dirty = self._dirty, set()
+            batch = [
+                (sid, self._trackers[sid].to_state(), self._last_seen[sid])
+                for sid in dirty if sid in self._trackers
+            ]
+        try:
+            return self.store.save_many(batch)
+        except Exception as e:
+            with self._lock:
+                self._dirty.update(sid for sid, _, _ in batch)
+            logger.warning("Escalation flush failed; will retry", extra={"context": {"error": str(e)}})
+            return 0
+
+    def compact(self, now: Optional[float] = None) -> int:
+        """
+        Drop sessions idle longer than the TTL from memory and from the store.
+
+        Returns:
+            Number of sessions evicted from memory
+        """
+        cutoff = (now if now is not None else time.time()) - self.session_ttl_s
+        with self._lock:
+            expired = [sid for sid, ts in self._last_seen.items() if ts < cutoff and sid not in self._dirty]
+            for sid in expired:
+                self._trackers.pop(sid, None)
+                self._last_seen.pop(sid, None)
+        if self.store is not None:
+            self.store.delete_expired(cutoff)
+        return len(expired)
+
+    def shrink(self, keep: int) -> int:
+        """
+        Drop the least recently seen sessions from memory until at most `keep` remain.
+
+        With a store, dirty sessions are written first and dropped sessions are
+        reloaded on next access; without one, their escalation state is lost.
+
+        Returns:
+            Number of sessions dropped
+        """
+        self.flush()
+        with self._lock:
+            return self._evict_locked(len(self._trackers) - max(0, int(keep)))
+
+    def _run(self):
+        ticks = 0
+        while not self._stop.wait(self.flush_interval_s):
+            self.flush()
+            ticks += 1
+            if ticks % self.compact_every == 0:
+                try:
+                    self.compact()
+                except Exception as e:
+                    logger.warning("Escalation compaction failed", extra={"context": {"error": str(e)}})
+
+    def close(self):
+        """
+        Stop the flusher, write remaining dirty sessions and close the store.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        if self.store is not None:
+            self.store.close()
@@ -1,46 +1,97 @@
 from __future__ import annotations
 from collections import deque
-from typing import Deque, Dict, Any, List
+from typing import Deque, Dict, Any, List, Optional, Sequence, Tuple
 
 class EscalationTracker:
     """
     Tracks rolling risk trend using EWMA and slope over recent scores.
     Scores can be max risk from model outputs or policy-computed risk.
+
+    With `half_life_s` set, updates that carry timestamps switch to time-decayed
+    mode: the EWMA decays toward zero with elapsed time between messages, and the
+    slope is measured per `slope_unit_s` of wall-clock time instead of per message.
     """
 
-    def __init__(self, ewma_alpha: float = 0.3, slope_window: int = 5, risk_floor: float = 0.05):
+    def __init__(
+        self,
+        ewma_alpha: float = 0.3,
+        slope_window: int = 5,
+        risk_floor: float = 0.05,
+        half_life_s: Optional[float] = None,
+        slope_unit_s: float = 60.0,
+    ):
         self.alpha = ewma_alpha
         self.window = slope_window
         self.risk_floor = risk_floor
+        self.half_life_s = half_life_s
+        self.slope_unit_s = slope_unit_s
         self.history: Deque[float] = deque(maxlen=self.window)
+        self.times: Deque[float] = deque(maxlen=self.window)
         self.ewma = 0.0
 
-    def update(self, risk_score: float) -> Dict[str, Any]:
+    def update(self, risk_score: float, timestamp: Optional[float] = None) -> Dict[str, Any]:
         """
         Update tracker with new risk score and return current trend metrics.
 
         Args:
             risk_score: Float between 0 and 1
+            timestamp: Optional epoch seconds of the message (time-decayed mode only)
 
         Returns:
             Dict with ewma, slope, and history
         """
-        r = max(risk_score, self.risk_floor)
-        self.ewma = self.alpha * r + (1 - self.alpha) * self.ewma
-        self.history.append(r)
-        slope = self._slope(list(self.history))
+        ewma, slope, history = self.step(risk_score, timestamp)
         return {
-            "ewma": self.ewma,
+            "ewma": ewma,
             "slope": slope,
-            "history": list(self.history)
+            "history": list(history)
         }
 
-    def _slope(self, arr: List[float]) -> float:
+    def step(self, risk_score: float, timestamp: Optional[float] = None) -> Tuple[float, float, Tuple[float, ...]]:
+        """
+        Same as `update`, returning (ewma, slope, history) without building a dict.
+        """
+        r = max(risk_score, self.risk_floor)
+        timed = self.half_life_s is not None and timestamp is not None
+        if timed and self.times and len(self.times) == len(self.history):
+            elapsed = max(0.0, timestamp - self.times[-1])
+            self.ewma *= 0.5 ** (elapsed / self.half_life_s)
+        self.ewma = self.alpha * r + (1 - self.alpha) * self.ewma
+        self.history.append(r)
+        if timed:
+            self.times.append(timestamp)
+        else:
+            self.times.clear()  # mixing modes falls back to per-message slope
+
+        xs = None
+        if timed and len(self.times) == len(self.history):
+            t0 = self.times[0]
+            xs = [(t - t0) / self.slope_unit_s for t in self.times]
+        history = tuple(self.history)
+        return self.ewma, self._slope(history, xs), history
+
+    def to_state(self) -> Dict[str, Any]:
+        """
+        Snapshot the tracker state for persistence.
+        """
+        return {"ewma": self.ewma, "history": list(self.history), "times": list(self.times)}
+
+    def load_state(self, state: Dict[str, Any]) -> "EscalationTracker":
+        """
+        Restore tracker state produced by `to_state`.
+        """
+        self.ewma = float(state.get("ewma", 0.0))
+        self.history = deque(state.get("history", []), maxlen=self.window)
+        self.times = deque(state.get("times", []), maxlen=self.window)
+        return self
+
+    def _slope(self, arr: Sequence[float], xs: Optional[List[float]] = None) -> float:
         """
         Compute linear slope of recent scores.
 
         Args:
-            arr: List of floats
+            arr: Sequence of floats
+            xs: Optional x positions (defaults to message index)
 
         Returns:
             Slope value
@@ -48,8 +99,10 @@ class EscalationTracker:
         n = len(arr)
         if n < 2:
             return 0.0
-        x_mean = (n - 1) / 2
+        if xs is None:
+            xs = list(range(n))
+        x_mean = sum(xs) / n
         y_mean = sum(arr) / n
-        num = sum((i - x_mean) * (arr[i] - y_mean) for i in range(n))
-        den = sum((i - x_mean) ** 2 for i in range(n)) or 1.0
+        num = sum((xs[i] - x_mean) * (arr[i] - y_mean) for i in range(n))
+        den = sum((xs[i] - x_mean) ** 2 for i in range(n)) or 1.0
         return num / den
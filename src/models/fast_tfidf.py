@@ -0,0 +1,164 @@
+from __future__ import annotations
+import re
+import weakref
+from itertools import chain, repeat
+from typing import Any, Dict, List, Optional
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import normalize
+from sklearn.utils.sparsefuncs_fast import inplace_csr_row_normalize_l1, inplace_csr_row_normalize_l2
+
+class FastTfidf:
+    """
+    Batch featurizer producing the same rows as a fitted word-level TfidfVectorizer.
+
+    Every token that occurs in the vocabulary (alone or inside a bigram) is
+    interned to an integer id once; unigram features are an id -> column array
+    and bigram features are looked up by the packed id pair (first * n_tokens +
+    second) in a sorted key array, so no n-gram strings are built per message.
+    A batch is tokenized with the vectorizer's own pattern, mapped to ids, and
+    its columns are found with vectorized lookups and written straight into one
+    CSR matrix; TF-IDF weighting and normalization are applied as sklearn does.
+    Only vectorizers with the default word analyzer (no custom preprocessor,
+    tokenizer, stop words or accent stripping) and n-grams up to bigrams are
+    supported; see `supports`.
+    """
+
+    def __init__(self, vectorizer: TfidfVectorizer):
+        if not self.supports(vectorizer):
+            raise ValueError("FastTfidf needs a default word-level TfidfVectorizer with ngram_range within (1, 2)")
+        self.vectorizer = vectorizer
+        self.vocabulary = vectorizer.vocabulary_
+        self.min_n, self.max_n = vectorizer.ngram_range
+        self.lowercase = vectorizer.lowercase
+        self._findall = re.compile(vectorizer.token_pattern).findall
+        self.token_ids: Dict[str, int] = {}
+        unigrams: List[tuple] = []
+        bigrams: List[tuple] = []
+        for term, col in self.vocabulary.items():
+            ids = [self.token_ids.setdefault(p, len(self.token_ids)) for p in term.split(" ")]
+            (unigrams if len(ids) == 1 else bigrams).append((*ids, col))
+        n_tokens = len(self.token_ids)
+        self.unigram_cols = np.full(n_tokens, -1, dtype=np.int64)
+        for tid, col in unigrams:
+            self.unigram_cols[tid] = col
+        keys = np.array([a * n_tokens + b for a, b, _ in bigrams], dtype=np.int64)
+        order = np.argsort(keys)
+        self.bigram_keys = keys[order]
+        self.bigram_cols = np.array([col for _, _, col in bigrams], dtype=np.int64)[order]
+
+    @staticmethod
+    def supports(vectorizer: Any) -> bool:
+        return (
+            isinstance(vectorizer, TfidfVectorizer)
+            and hasattr(vectorizer, "vocabulary_")
+            and vectorizer.analyzer == "word"
+            and vectorizer.input == "content"
+            and vectorizer.preprocessor is None
+            and vectorizer.tokenizer is None
+            and vectorizer.stop_words is None
+            and vectorizer.strip_accents is None
+            and re.compile(vectorizer.token_pattern).groups <= 1
+            and 1 <= vectorizer.ngram_range[0] <= vectorizer.ngram_range[1] <= 2
+        )
+
+    def token_counts(self, texts: List[str]) -> sparse.csr_matrix:
+        """
+        Raw term counts, identical to CountVectorizer.transform.
+        """
+        findall, get = self._findall, self.token_ids.get
+        docs = [findall(t.lower() if self.lowercase else t) for t in texts]
+        lengths = np.fromiter(map(len, docs), dtype=np.int64, count=len(docs))
+        total = int(lengths.sum())
+        ids = np.fromiter(map(get, chain.from_iterable(docs), repeat(-1)), dtype=np.int64, count=total)
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+        row_parts, col_parts = [], []
+        if self.min_n == 1:
+            known = ids >= 0
+            cols = self.unigram_cols[ids[known]]
+            hit = cols >= 0
+            row_parts.append(rows[known][hit])
+            col_parts.append(cols[hit])
+        if self.max_n == 2 and total > 1 and self.bigram_keys.size:
+            first, second = ids[:-1], ids[1:]
+            pair = (first >= 0) & (second >= 0) & (rows[:-1] == rows[1:])
+            keys = first[pair] * len(self.token_ids) + second[pair]
+            pos = np.minimum(np.searchsorted(self.bigram_keys, keys), self.bigram_keys.size - 1)
+            hit = self.bigram_keys[pos] == keys
+            row_parts.append(rows[:-1][pair][hit])
+            col_parts.append(self.bigram_cols[pos[hit]])
+        r = np.concatenate(row_parts) if row_parts else np.empty(0, dtype=np.int64)
+        c = np.concatenate(col_parts) if col_parts else np.empty(0, dtype=np.int64)
+        # Sorting packed (row, col) keys yields sorted indices; runs of equal keys are the counts
+        n_features = len(self.vocabulary)
+        keys = np.sort(r * n_features + c)
+        first_of_run = np.ones(keys.size, dtype=bool)
+        first_of_run[1:] = keys[1:] != keys[:-1]
+        starts = np.flatnonzero(first_of_run)
+        counts = np.diff(np.append(starts, keys.size))
+        rows, cols = np.divmod(keys[starts], n_features)
+        indptr = np.zeros(len(texts) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(rows, minlength=len(texts)), out=indptr[1:])
+        return sparse.csr_matrix(
+            (counts.astype(self.vectorizer.dtype), cols.astype(np.int32), indptr),
+            shape=(len(texts), n_features),
+        )
+
+    def transform(self, texts: List[str]) -> sparse.csr_matrix:
+        """
+        TF-IDF rows, identical to TfidfVectorizer.transform.
+        """
+        vec = self.vectorizer
+        X = self.token_counts(texts)
+        if vec.binary:
+            X.data.fill(1)
+        if X.dtype not in (np.float64, np.float32):
+            X = X.astype(np.float64)
+        if vec.sublinear_tf:
+            np.log(X.data, X.data)
+            X.data += 1.0
+        if vec.use_idf:
+            X.data *= vec.idf_[X.indices]  # read live: warm starts may refresh the IDF
+        # The in-place kernels `normalize` dispatches to, without its per-call validation
+        if vec.norm == "l2":
+            inplace_csr_row_normalize_l2(X)
+        elif vec.norm == "l1":
+            inplace_csr_row_normalize_l1(X)
+        elif vec.norm is not None:
+            X = normalize(X, norm=vec.norm, copy=False)
+        return X
+
+# Featurizers of the vectorizers in use, rebuilt when a vocabulary is replaced
+_FEATURIZERS: "weakref.WeakKeyDictionary[TfidfVectorizer, FastTfidf]" = weakref.WeakKeyDictionary()
+
+def fast_featurizer(vectorizer: Any) -> Optional[FastTfidf]:
+    """
+    Cached FastTfidf for a fitted vectorizer, or None if it is not supported.
+    """
+    fast = _FEATURIZERS.get(vectorizer)
+    if fast is not None and fast.vocabulary is vectorizer.vocabulary_:
+        return fast
+    if not FastTfidf.supports(vectorizer):
+        return None
+    fast = FastTfidf(vectorizer)
+    _FEATURIZERS[vectorizer] = fast
+    return fast
+
+def pipeline_features(pipeline: Pipeline, texts: List[str]):
+    """
+    Input of the final step of a TF-IDF pipeline, using the fast featurizer when possible.
+    """
+    steps = pipeline.steps[:-1]
+    fast = fast_featurizer(steps[0][1]) if steps else None
+    X = fast.transform(texts) if fast is not None else texts
+    for _, step in (steps[1:] if fast is not None else steps):
+        X = step.transform(X)
+    return X
+
+def pipeline_predict_proba(pipeline: Pipeline, texts: List[str]) -> np.ndarray:
+    """
+    Same as pipeline.predict_proba(texts), with fast TF-IDF features.
+    """
+    return pipeline.steps[-1][1].predict_proba(pipeline_features(pipeline, texts))
@@ -0,0 +1,163 @@
+from __future__ import annotations
+import os
+import time
+import threading
+from contextlib import nullcontext
+from typing import Dict, Any, List, Optional, Tuple
+import joblib
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class LanguageModelRouter:
+    """
+    Language-keyed abuse/crisis model sets with lazy loading and idle eviction.
+
+    A language resolves through its fallback chain (`fallback` maps a language
+    to the next one to try) to the first model set that is configured and
+    loadable; the chain always ends at the default language, which uses the
+    primary models. Non-default sets are loaded from `model_sets[lang]` on
+    first use, and are dropped after `idle_evict_s` without traffic or when
+    more than `max_loaded` are resident (least recently used first). Sets
+    that fail to load, or whose abuse labels differ from the primary models,
+    are skipped for `retry_s`.
+    Config keys: models.yaml -> languages
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.default = config.get("default", "en")
+        self.model_sets: Dict[str, str] = dict(config.get("model_sets", {}) or {})
+        self.fallback: Dict[str, str] = dict(config.get("fallback", {}) or {})
+        self.idle_evict_s = float(config.get("idle_evict_s", 1800))
+        self.max_loaded = int(config.get("max_loaded", 4))
+        self.retry_s = float(config.get("retry_s", 300))
+        self._loaded: Dict[str, Dict[str, Any]] = {}
+        self._failed: Dict[str, float] = {}
+        self._routed: Dict[str, int] = {}
+        self._loads = 0
+        self._evictions = 0
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()  # serializes disk loads, taken without _lock held
+        self.memory = None  # optional MemoryAccountant: admits and traces loads
+
+    def chain(self, lang: str) -> List[str]:
+        """
+        Languages tried for `lang`, ending with the default.
+        """
+        out = []
+        while lang and lang not in out:
+            out.append(lang)
+            lang = self.fallback.get(lang)
+        if self.default not in out:
+            out.append(self.default)
+        return out
+
+    def _load(self, lang: str, labels: List[str]) -> Optional[Dict[str, Any]]:
+        path = self.model_sets[lang]
+        paths = [os.path.join(path, f) for f in ("abuse_detector.joblib", "crisis_detector.joblib")]
+        start = time.perf_counter()
+        try:
+            if self.memory is not None:
+                self.memory.admit(f"language_models:{lang}", paths)
+            with self.memory.traced(f"language_models:{lang}") if self.memory is not None else nullcontext():
+                abuse, crisis = joblib.load(paths[0]), joblib.load(paths[1])
+            if list(abuse.labels) != list(labels):
+                raise ValueError(f"abuse labels {abuse.labels} differ from the primary models {labels}")
+        except Exception as e:
+            logger.warning(f"⚠️ Models for language '{lang}' unavailable, using fallback: {e}")
+            return None
+        logger.info(
+            "Language models loaded",
+            extra={"context": {"lang": lang, "path": path, "seconds": round(time.perf_counter() - start, 3)}},
+        )
+        return {"abuse": abuse, "crisis": crisis, "last_used": time.monotonic()}
+
+    def _resident(self, lang: str, now: float) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        # (settled, entry): settled once the set is loaded or is still in its retry backoff
+        entry = self._loaded.get(lang)
+        if entry is not None:
+            return True, entry
+        return now - self._failed.get(lang, -self.retry_s) < self.retry_s, None
+
+    def _get(self, lang: str, labels: List[str], now: float) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            settled, entry = self._resident(lang, now)
+        if settled:
+            return entry
+        # Read from disk outside the routing lock, so batches routed to resident sets
+        # are not held up; re-check once the load lock is held, as another thread
+        # may have installed (or failed to load) the set meanwhile
+        with self._load_lock:
+            with self._lock:
+                settled, entry = self._resident(lang, now)
+            if settled:
+                return entry
+            entry = self._load(lang, labels)
+            with self._lock:
+                if entry is None:
+                    self._failed[lang] = time.monotonic()
+                    return None
+                self._loads += 1
+                self._loaded[lang] = entry
+                self._evict(now)
+        return entry
+
+    def _evict(self, now: float):
+        for lang in [l for l, s in self._loaded.items() if now - s["last_used"] > self.idle_evict_s]:
+            del self._loaded[lang]
+            self._evictions += 1
+        while len(self._loaded) > self.max_loaded:
+            lru = min(self._loaded, key=lambda l: self._loaded[l]["last_used"])
+            del self._loaded[lru]
+            self._evictions += 1
+
+    def resolve(self, lang: str, primary: Tuple[Any, Any]) -> Tuple[str, Any, Any]:
+        """
+        Pick the model set for a language, loading it if needed.
+
+        Args:
+            lang: Detected language code
+            primary: (abuse, crisis) models of the default language
+
+        Returns:
+            (language of the chosen set, abuse model, crisis model)
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+        for candidate in self.chain(lang):
+            if candidate == self.default:
+                break
+            if candidate not in self.model_sets:
+                continue
+            entry = self._get(candidate, primary[0].labels, now)
+            if entry is None:
+                continue
+            with self._lock:
+                entry["last_used"] = now
+                self._routed[candidate] = self._routed.get(candidate, 0) + 1
+            return candidate, entry["abuse"], entry["crisis"]
+        with self._lock:
+            self._routed[self.default] = self._routed.get(self.default, 0) + 1
+        return self.default, primary[0], primary[1]
+
+    def shrink(self) -> int:
+        """
+        Unload every resident non-default model set (they reload on next use).
+
+        Returns:
+            Number of sets unloaded
+        """
+        with self._lock:
+            n = len(self._loaded)
+            self._loaded.clear()
+            self._evictions += n
+            return n
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": sorted(self._loaded),
+            "routed_batches": dict(self._routed),
+            "loads": self._loads,
+            "evictions": self._evictions,
+        }
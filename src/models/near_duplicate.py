@@ -0,0 +1,176 @@
+from __future__ import annotations
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, NamedTuple, Optional
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+class NearDuplicateMatch(NamedTuple):
+    entry_id: int
+    similarity: float
+    payload: Dict[str, Any]
+    hits: int
+
+class _Entry:
+    __slots__ = ("signature", "ts", "payload", "keys", "hits")
+
+    def __init__(self, signature: np.ndarray, ts: float, payload: Dict[str, Any], keys: List[bytes]):
+        self.signature = signature
+        self.ts = ts
+        self.payload = payload
+        self.keys = keys
+        self.hits = 0
+
+class NearDuplicateIndex:
+    """
+    Near-duplicate lookup over recently scored messages (MinHash + banded LSH).
+
+    Texts are reduced to their word characters (so inserted punctuation, emoji
+    and spacing do not matter), shingled into overlapping byte n-grams and
+    summarized by a MinHash signature. Signatures are split into bands; any
+    band collision makes a candidate, and the candidate with the highest
+    estimated Jaccard similarity at or above `threshold` is returned.
+
+    Entries expire after `window_s` seconds and at most `max_entries` are kept,
+    so memory is bounded. Thread-safe.
+    Config keys: models.yaml -> near_duplicate
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.shingle = int(config.get("shingle_chars", 5))
+        self.bands = int(config.get("bands", 16))
+        self.rows = int(config.get("rows_per_band", 4))
+        self.num_perm = self.bands * self.rows
+        self.threshold = float(config.get("threshold", 0.7))
+        self.window_s = float(config.get("window_s", 300))
+        self.max_entries = int(config.get("max_entries", 50000))
+        self.max_chars = int(config.get("max_chars", 2000))
+        self.max_candidates = int(config.get("max_candidates", 32))
+        rng = np.random.default_rng(int(config.get("seed", 1)))
+        self._a = rng.integers(1, 1 << 61, self.num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 1 << 61, self.num_perm, dtype=np.uint64)
+        self._powers = np.uint64(1099511628211) ** np.arange(self.shingle, dtype=np.uint64)
+
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._buckets: Dict[bytes, set] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._queries = 0
+        self._hits = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """
+        MinHash signature of a text, or None if it has no word characters.
+        """
+        key = _NON_WORD_RE.sub("", text.lower())[:self.max_chars]
+        if not key:
+            return None
+        data = np.frombuffer(key.encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+        if data.size < self.shingle:
+            data = np.pad(data, (0, self.shingle - data.size))
+        with np.errstate(over="ignore"):
+            shingles = (sliding_window_view(data, self.shingle) * self._powers).sum(axis=1, dtype=np.uint64)
+            hashed = (self._a[:, None] * shingles[None, :] + self._b[:, None]) >> np.uint64(32)
+        return hashed.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, sig: np.ndarray) -> List[bytes]:
+        return [bytes([b]) + sig[b * self.rows:(b + 1) * self.rows].tobytes() for b in range(self.bands)]
+
+    def _evict(self, now: float):
+        cutoff = now - self.window_s
+        while self._entries:
+            entry_id, entry = next(iter(self._entries.items()))
+            if entry.ts >= cutoff and len(self._entries) <= self.max_entries:
+                break
+            self._entries.popitem(last=False)
+            for key in entry.keys:
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(entry_id)
+                    if not bucket:
+                        del self._buckets[key]
+
+    def query(self, sig: Optional[np.ndarray], now: Optional[float] = None) -> Optional[NearDuplicateMatch]:
+        """
+        Find the most similar live entry at or above the threshold and count the hit.
+        """
+        if sig is None:
+            return None
+        now = time.time() if now is None else now
+        with self._lock:
+            self._queries += 1
+            self._evict(now)
+            candidates = set()
+            for key in self._band_keys(sig):
+                bucket = self._buckets.get(key)
+                if bucket:
+                    candidates.update(bucket)
+                    if len(candidates) >= self.max_candidates:
+                        break
+            if not candidates:
+                return None
+            ids = list(candidates)
+            sims = (np.stack([self._entries[i].signature for i in ids]) == sig).mean(axis=1)
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                return None
+            entry = self._entries[ids[best]]
+            entry.hits += 1
+            self._hits += 1
+            return NearDuplicateMatch(ids[best], float(sims[best]), entry.payload, entry.hits)
+
+    def add(self, sig: Optional[np.ndarray], payload: Dict[str, Any], now: Optional[float] = None) -> Optional[int]:
+        """
+        Index a scored message. The payload dict is stored by reference, so it may be filled in later.
+
+        Returns:
+            Entry id, or None if the text had no signature
+        """
+        if sig is None:
+            return None
+        now = time.time() if now is None else now
+        keys = self._band_keys(sig)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(sig, now, payload, keys)
+            for key in keys:
+                self._buckets.setdefault(key, set()).add(entry_id)
+            self._evict(now)
+        return entry_id
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "queries": self._queries,
+            "hits": self._hits,
+            "hit_rate": self._hits / self._queries if self._queries else 0.0,
+        }
+
+    def shrink(self, keep: int) -> int:
+        """
+        Evict the oldest entries until at most `keep` remain (memory pressure).
+
+        Returns:
+            Number of entries evicted
+        """
+        with self._lock:
+            before = len(self._entries)
+            limit, self.max_entries = self.max_entries, max(0, int(keep))
+            try:
+                self._evict(time.time())
+            finally:
+                self.max_entries = limit
+            return before - len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
@@ -0,0 +1,101 @@
+from __future__ import annotations
+import os
+from typing import Any, Dict, List
+import numpy as np
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class TransformerClassifier:
+    """
+    CPU sequence classifier loaded from a local checkpoint directory.
+
+    Inputs are tokenized once without padding, ordered by token length and cut
+    into batches of at most `batch_size` texts and `max_batch_tokens` padded
+    tokens, so each batch is padded only to its own longest text; results are
+    returned in input order. Inference runs under `torch.inference_mode` with
+    `num_threads` intra-op threads (size it to the cores of one worker), and
+    `quantize` applies dynamic int8 quantization to the Linear layers at load.
+    Config keys: models.yaml -> abuse/crisis -> transformers
+    """
+
+    def __init__(self, config: Dict[str, Any], model_dir: str = ""):
+        """
+        Args:
+            config: Backend settings; `checkpoint` is resolved against `model_dir`
+            model_dir: Model directory of the deployment
+        """
+        if not config.get("checkpoint"):
+            raise ValueError("transformers backend needs a `checkpoint` directory")
+        checkpoint = os.path.join(model_dir or "", config["checkpoint"])
+        self.checkpoint = checkpoint
+        self.max_length = int(config.get("max_length", 256))
+        self.batch_size = int(config.get("batch_size", 32))
+        self.max_batch_tokens = int(config.get("max_batch_tokens", 8192))
+        self.num_threads = config.get("num_threads", 1)
+        self.quantize = bool(config.get("quantize", False))
+        if self.num_threads:
+            torch.set_num_threads(int(self.num_threads))
+        self.tokenizer = AutoTokenizer.from_pretrained(checkpoint)
+        model = AutoModelForSequenceClassification.from_pretrained(checkpoint)
+        model.eval()
+        if self.quantize:
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+        self.id2label: Dict[int, str] = {int(k): v for k, v in model.config.id2label.items()}
+        self.multi_label = model.config.problem_type == "multi_label_classification"
+        logger.info(
+            "Transformer checkpoint loaded",
+            extra={"context": {"checkpoint": checkpoint, "quantized": self.quantize, "threads": torch.get_num_threads()}},
+        )
+
+    def _batches(self, lengths: List[int]) -> List[List[int]]:
+        order = sorted(range(len(lengths)), key=lengths.__getitem__)
+        batches: List[List[int]] = []
+        for i in order:
+            # sorted ascending, so the current text is the longest of its batch
+            if batches and len(batches[-1]) < self.batch_size and (len(batches[-1]) + 1) * lengths[i] <= self.max_batch_tokens:
+                batches[-1].append(i)
+            else:
+                batches.append([i])
+        return batches
+
+    def logits(self, texts: List[str]) -> np.ndarray:
+        """
+        Raw logits of shape (n, num_labels), in input order.
+        """
+        out = np.zeros((len(texts), self.model.config.num_labels), dtype=np.float32)
+        if not texts:
+            return out
+        enc = self.tokenizer(list(texts), truncation=True, max_length=self.max_length)
+        ids = enc["input_ids"]
+        with torch.inference_mode():
+            for idx in self._batches([len(x) for x in ids]):
+                features = [{k: enc[k][i] for k in enc.keys()} for i in idx]
+                batch = self.tokenizer.pad(features, return_tensors="pt")
+                out[idx] = self.model(**batch).logits.float().numpy()
+        return out
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        """
+        Label probabilities (sigmoid for multi-label checkpoints, softmax otherwise).
+        """
+        logits = self.logits(texts).astype(np.float64)
+        if self.multi_label or logits.shape[1] == 1:
+            return 1.0 / (1.0 + np.exp(-logits))
+        e = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return e / e.sum(axis=1, keepdims=True)
+
+    def columns(self, labels: List[str]) -> List[int]:
+        """
+        Output columns of `labels`, matched by the checkpoint's id2label names
+        (positional when the checkpoint uses generic LABEL_i names).
+        """
+        by_name = {v: k for k, v in self.id2label.items()}
+        if all(lbl in by_name for lbl in labels):
+            return [by_name[lbl] for lbl in labels]
+        if len(labels) != len(self.id2label):
+            raise ValueError(f"checkpoint labels {list(self.id2label.values())} do not match {labels}")
+        return list(range(len(labels)))
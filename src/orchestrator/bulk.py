@@ -0,0 +1,89 @@
+from __future__ import annotations
+import io
+import json
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import pandas as pd
+
+TEXT_COLUMNS = ("text", "message", "comment_text")
+
+def read_messages(data: bytes, filename: str, default_age: str = "13+") -> pd.DataFrame:
+    """
+    Parse an uploaded CSV or JSONL file of messages.
+
+    The text is taken from the first of `text`, `message` or `comment_text`;
+    optional `age` and `session_id` columns are used when present.
+
+    Returns:
+        DataFrame with columns text, age, session_id
+    """
+    if filename.lower().endswith((".jsonl", ".ndjson")):
+        # Parsed record by record and kept as objects: pandas would turn integer ids
+        # into floats ("5.0") in a column with gaps
+        lines = data.decode("utf-8-sig").splitlines()
+        df = pd.DataFrame([json.loads(line) for line in lines if line.strip()], dtype=object)
+    else:
+        df = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False)
+    text_col = next((c for c in TEXT_COLUMNS if c in df.columns), None)
+    if text_col is None:
+        raise ValueError(f"No text column found; expected one of {list(TEXT_COLUMNS)}")
+    out = pd.DataFrame({"text": df[text_col].fillna("").astype(str)})
+    if "age" in df.columns:
+        out["age"] = df["age"].replace("", None).fillna(default_age).astype(str)
+    else:
+        out["age"] = default_age
+    if "session_id" in df.columns:
+        sids = [str(s) if pd.notna(s) and str(s) != "" else None for s in df["session_id"]]
+        out["session_id"] = pd.Series(sids, index=out.index, dtype=object)
+    else:
+        out["session_id"] = None
+    return out
+
+def flatten_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    One flat row per result for tables and CSV export.
+    """
+    decision = result["decision"]
+    row = {
+        "action": decision["action"],
+        "max_risk": round(float(decision["max_risk"]), 4),
+        "route_to_human": decision["route_to_human"],
+        "redact": ",".join(decision["redact"]),
+        "abuse_labels": ",".join(result["abuse"]["labels"]),
+        "crisis_score": round(float(result["crisis"]["score"]), 4),
+        "crisis_labels": ",".join(result["crisis"]["labels"]),
+        "escalation_ewma": round(float(result["escalation"]["ewma"]), 4),
+    }
+    for label, score in result["abuse"]["scores"].items():
+        row[f"abuse_{label}"] = round(float(score), 4)
+    return row
+
+def iter_bulk(
+    orch: Any,
+    messages: pd.DataFrame,
+    chunk_size: int = 256,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Run messages through `InferenceOrchestrator.infer_batch` chunk by chunk.
+
+    Args:
+        orch: Inference orchestrator
+        messages: Frame as returned by `read_messages`
+        chunk_size: Messages per batch
+        progress: Optional callback(done, total) called after each chunk
+
+    Yields:
+        Flat result rows (input columns first) for each chunk, in input order
+    """
+    total = len(messages)
+    for start in range(0, total, chunk_size):
+        chunk = messages.iloc[start:start + chunk_size]
+        sids = [s if isinstance(s, str) else None for s in chunk["session_id"]]
+        results = orch.infer_batch(chunk["text"].tolist(), chunk["age"].tolist(), sids if any(sids) else None)
+        rows = [
+            {"text": t, "age": a, **flatten_result(r)}
+            for t, a, r in zip(chunk["text"], chunk["age"], results)
+        ]
+        if progress is not None:
+            progress(min(start + chunk_size, total), total)
+        yield rows
@@ -1,15 +1,35 @@
 from __future__ import annotations
 import os
+import time
+import hashlib
+import logging
 import joblib
-from typing import Dict, Any
+import yaml
+import numpy as np
+from typing import Dict, Any, List, Tuple
 from src.preprocessing.language_detection import detect_language
 from src.preprocessing.text_normalization import normalize_text
-from src.preprocessing.pii_masking import mask_pii
+from src.preprocessing.pii_masking import mask_pii, mask_pii_windows
+from src.preprocessing.long_input import language_sample, long_input_settings, pool_scores, window_spans
 from src.models.abuse_detector import AbuseDetector
-from src.models.crisis_detector import CrisisDetector
+from src.models.crisis_detector import CRISIS_FLAGS, CRISIS_KEYWORDS, CrisisDetector
+from src.models.cascade_gate import CascadeGate, cascade_keywords
+from src.models.explain import TopFeatureExplainer
 from src.models.escalation_tracker import EscalationTracker
+from src.models.escalation_store import SessionEscalationRegistry, build_escalation_store
 from src.models.content_filter import ContentFilter
+from src.models.language_router import LanguageModelRouter
+from src.models.near_duplicate import NearDuplicateIndex, NearDuplicateMatch
+from src.orchestrator.results import ResultBatch
+from src.orchestrator.shadow import ShadowEvaluator
 from src.policy_engine.policy_decision import PolicyEngine
+from src.policy_engine.fairness_monitor import FairnessMonitor
+from src.config_loader import config_version
+from src.utils.audit_log import AuditLog
+from src.utils.drift_monitor import DriftMonitor
+from src.utils.profiler import RequestProfiler
+from src.utils.latency_budget import LatencyBudget, StageCosts, budget_settings
+from src.utils.memory_accounting import MemoryAccountant, MemoryBudgetExceeded, deep_sizeof, process_rss_bytes
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -25,13 +45,64 @@ class InferenceOrchestrator:
         self.models_cfg = configs.get("models", {})
         self.policy_cfg = configs.get("policy", {})
         self.ui_cfg = configs.get("ui", {})
+        self.runtime_cfg = configs.get("runtime", {})
+        self.config_version = config_version(configs)
+        self.model_version = ""
+        self.long_input = long_input_settings(self.pre_cfg.get("long_input", {}))
+        pii_cfg = dict(self.pre_cfg.get("pii_masking", {}))
+        self._pii_enabled = bool(pii_cfg.pop("enabled", True))
+        self._pii_kwargs = pii_cfg
 
         # Initialize models
         self.abuse = None
         self.crisis = None
-        self.escalation = EscalationTracker(**self.models_cfg.get("escalation", {}))
+        esc_cfg = dict(self.models_cfg.get("escalation", {}))
+        persist_cfg = esc_cfg.pop("persistence", {}) or {}
+        self.escalation = EscalationTracker(**esc_cfg)
+        self.sessions = SessionEscalationRegistry(
+            esc_cfg,
+            build_escalation_store(persist_cfg),
+            flush_interval_s=persist_cfg.get("flush_interval_s", 1.0),
+            session_ttl_s=persist_cfg.get("session_ttl_s", 86400),
+            max_sessions=persist_cfg.get("max_sessions", 200000),
+        )
         self.content_filter = ContentFilter(self.models_cfg.get("content_filter", {}))
         self.policy = PolicyEngine(self.policy_cfg)
+        fairness_cfg = self.policy_cfg.get("fairness", {})
+        self.fairness = (
+            FairnessMonitor(fairness_cfg)
+            if fairness_cfg.get("identity_terms") and fairness_cfg.get("monitor", True) else None
+        )
+        self.cascade_cfg = self.models_cfg.get("cascade", {})
+        self.cascade: CascadeGate | None = None
+        self.near_dup_cfg = self.models_cfg.get("near_duplicate", {})
+        self.near_duplicates = (
+            NearDuplicateIndex(self.near_dup_cfg) if self.near_dup_cfg.get("enabled", False) else None
+        )
+        lang_cfg = self.models_cfg.get("languages", {})
+        self.router = LanguageModelRouter(lang_cfg) if lang_cfg.get("model_sets") else None
+        self.explain_cfg = self.policy_cfg.get("explainability", {})
+        self._explainers: Dict[str, Tuple[Any, TopFeatureExplainer]] = {}
+
+        self.audit: AuditLog | None = None
+        self.drift: DriftMonitor | None = None
+        prof_cfg = self.runtime_cfg.get("profiling", {})
+        self.profiler = RequestProfiler(prof_cfg) if prof_cfg.get("enabled", False) else None
+        self.budget_cfg = budget_settings(self.runtime_cfg.get("latency_budget", {}))
+        self.stage_costs = StageCosts(self.budget_cfg["initial_cost_ms"], self.budget_cfg["cost_alpha"])
+        self._budget_stats: Dict[str, Any] = {"requests": 0, "overruns": 0, "degraded": {}}
+        shadow_cfg = self.runtime_cfg.get("shadow", {})
+        self.shadow = (
+            ShadowEvaluator(shadow_cfg, self.policy_cfg, self.long_input) if shadow_cfg.get("enabled", False) else None
+        )
+        mem_cfg = self.runtime_cfg.get("memory", {})
+        self._memory_measured: Dict[str, Any] | None = None
+        self.memory = (
+            MemoryAccountant(mem_cfg, self._accounted_bytes, self._shrink_caches) if mem_cfg.get("enabled", False) else None
+        )
+        self._shrink_order = list(mem_cfg.get("shrink_order", ["explainers", "language_models", "near_duplicate", "sessions"]))
+        if self.router is not None:
+            self.router.memory = self.memory
 
         self._trained = False
 
@@ -40,13 +111,50 @@ class InferenceOrchestrator:
         Load trained models from disk.
         """
         try:
-            self.abuse = joblib.load(os.path.join(model_dir, "abuse_detector.joblib"))
-            self.crisis = joblib.load(os.path.join(model_dir, "crisis_detector.joblib"))
+            artifacts = []
+            for name in ("abuse", "crisis"):
+                paths = self._model_paths(name, model_dir)
+                artifacts.extend(paths)
+                if self.memory is None:
+                    setattr(self, name, self._load_model(name, model_dir))
+                    continue
+                self.memory.admit(f"{name}_model", paths)
+                with self.memory.traced(f"{name}_model"):
+                    setattr(self, name, self._load_model(name, model_dir))
+            self.model_version = self._files_version(artifacts)
             self._trained = True
+            if self.near_duplicates is not None:
+                self.near_duplicates.clear()  # cached scores belong to the previous models
             logger.info("✅ Models loaded from disk")
+        except MemoryBudgetExceeded:
+            raise
         except Exception as e:
             logger.warning(f"⚠️ Failed to load models from disk: {e}")
             self.load_or_fit_minimal()
+            return
+        self._load_drift_reference(model_dir)
+        if self.cascade_cfg.get("enabled", False):
+            try:
+                self.set_cascade_gate(joblib.load(os.path.join(model_dir, "cascade_gate.joblib")))
+            except Exception as e:
+                logger.warning(f"⚠️ Cascade gate unavailable, using full pipeline only: {e}")
+
+    def _model_paths(self, name: str, model_dir: str) -> List[str]:
+        """
+        Artifact files of a head: its joblib pipeline, or its checkpoint directory
+        with the transformers backend.
+        """
+        cfg = self.models_cfg.get(name, {})
+        if cfg.get("backend", "sklearn") != "transformers":
+            return [os.path.join(model_dir, f"{name}_detector.joblib")]
+        checkpoint = os.path.join(model_dir, cfg.get("transformers", {}).get("checkpoint", f"{name}_transformer"))
+        return [p for p in (os.path.join(checkpoint, f) for f in sorted(os.listdir(checkpoint))) if os.path.isfile(p)]
+
+    def _load_model(self, name: str, model_dir: str) -> Any:
+        cfg = self.models_cfg.get(name, {})
+        if cfg.get("backend", "sklearn") == "transformers":
+            return (AbuseDetector if name == "abuse" else CrisisDetector)(cfg, model_dir=model_dir)
+        return joblib.load(os.path.join(model_dir, f"{name}_detector.joblib"))
 
     def load_or_fit_minimal(self):
         """
@@ -59,65 +167,818 @@ class InferenceOrchestrator:
         abuse_labels = [["toxic"], ["threat"], ["toxic"], []]
         crisis_labels = [0, 0, 1, 0]
         age_labels = ["7+", "16+", "13+", "7+"]
-        self.abuse = AbuseDetector(self.models_cfg.get("abuse", {})).fit(texts, abuse_labels)
-        self.crisis = CrisisDetector(self.models_cfg.get("crisis", {})).fit(texts, crisis_labels)
+        # Always the sklearn backend: checkpoints cannot be fitted from a handful of examples
+        self.abuse = AbuseDetector({**self.models_cfg.get("abuse", {}), "backend": "sklearn"}).fit(texts, abuse_labels)
+        self.crisis = CrisisDetector({**self.models_cfg.get("crisis", {}), "backend": "sklearn"}).fit(texts, crisis_labels)
         self.content_filter.fit(texts, age_labels)
+        self.model_version = "minimal"
         self._trained = True
         logger.info("🧪 Orchestrator models fitted with minimal data")
 
-    def preprocess(self, text: str) -> Dict[str, Any]:
-        lang_code, lang_conf = ("en", 1.0)
-        if self.pre_cfg.get("language_detection", {}).get("enabled", True):
-            lang_code, lang_conf = detect_language(text)
-
-        s = normalize_text(
-            mask_pii(
-                text,
-                mask_email=self.pre_cfg.get("pii_masking", {}).get("mask_email", True),
-                mask_phone=self.pre_cfg.get("pii_masking", {}).get("mask_phone", True),
-                email_token=self.pre_cfg.get("pii_masking", {}).get("email_token", "<EMAIL>"),
-                phone_token=self.pre_cfg.get("pii_masking", {}).get("phone_token", "<PHONE>"),
-            ),
+    @staticmethod
+    def _files_version(paths: List[str]) -> str:
+        """
+        Cheap model version: hash of artifact names, sizes and modification times.
+        """
+        parts = [f"{os.path.basename(p)}:{os.path.getsize(p)}:{int(os.path.getmtime(p))}" for p in paths]
+        return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:12]
+
+    def _audit_sink(self) -> AuditLog | None:
+        """
+        Start the audit log on first use (after models are loaded, so the model version is known).
+        """
+        audit_cfg = self.runtime_cfg.get("audit", {})
+        if self.audit is None and audit_cfg.get("enabled", False):
+            self.audit = AuditLog(
+                audit_cfg,
+                abuse_labels=self.abuse.labels,
+                content_flags=list(self.content_filter.matcher.groups),
+                crisis_flags=["crisis", *CRISIS_KEYWORDS],
+                config_version=self.config_version,
+                model_version=self.model_version,
+            )
+        return self.audit
+
+    def _load_drift_reference(self, model_dir: str):
+        """
+        Start drift monitoring against the score reference exported with the models, if any.
+        """
+        drift_cfg = self.runtime_cfg.get("drift", {})
+        if not drift_cfg.get("enabled", False):
+            return
+        path = drift_cfg.get("reference") or os.path.join(model_dir, "score_reference.yaml")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.drift = DriftMonitor(drift_cfg, yaml.safe_load(f))
+        except Exception as e:
+            logger.warning(f"⚠️ Drift monitoring disabled, no usable score reference: {e}")
+
+    def set_cascade_gate(self, gate: CascadeGate):
+        """
+        Install a trained cascade gate, wiring in every keyword the full pipeline flags on.
+        The minimal fallback never fits a gate: an early exit needs a calibrated artifact.
+        """
+        if self.cascade_cfg.get("exit_threshold") is not None:
+            gate.exit_threshold = float(self.cascade_cfg["exit_threshold"])
+        self.cascade = gate.set_keywords(cascade_keywords(self.models_cfg))
+
+    def _update_escalation(
+        self, session_id: str | None, risk: float, timestamp: float | None = None
+    ) -> Tuple[float, float, Tuple[float, ...]]:
+        """
+        Update escalation for a session; messages without a session share one tracker.
+
+        Returns:
+            (ewma, slope, history)
+        """
+        if session_id is None:
+            return self.escalation.step(risk, timestamp)
+        return self.sessions.step(session_id, risk, timestamp)
+
+    def _cascade_exits(self, texts: List[str], session_ids: List[str | None]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Decide which messages may exit early.
+        Exits need a gate bound below allow_max_risk, and sessions already trending
+        risky (as of the start of the batch) never exit early.
+
+        Returns:
+            (mask, bounds) as returned by the cascade gate
+        """
+        # Long inputs always take the windowed full path
+        short = np.array([len(t) <= self.long_input["max_chars"] for t in texts], dtype=bool)
+        mask = np.zeros(len(texts), dtype=bool)
+        bounds = np.ones(len(texts))
+        if short.any():
+            idx = np.flatnonzero(short)
+            mask[idx], bounds[idx] = self.cascade.exit_mask([texts[i] for i in idx])
+        ewma_thr = self.policy_cfg.get("thresholds", {}).get("escalation", {}).get("ewma_threshold", 0.5)
+        allow_max = self.policy_cfg["actions"]["allow_max_risk"]
+        for i in np.flatnonzero(mask):
+            sid = session_ids[i]
+            tracker = self.escalation if sid is None else self.sessions.get(sid)
+            if bounds[i] >= allow_max or tracker.ewma >= ewma_thr:
+                mask[i] = False
+        return mask, bounds
+
+    def _early_exit_result(
+        self, text: str, age: str, session_id: str | None, timestamp: float | None, bound: float
+    ) -> Tuple[Tuple[float, float, Tuple[float, ...]], Dict[str, Any], Dict[str, Any]]:
+        """
+        Escalation, content output and decision of a message exited by the cascade.
+        """
+        esc = self._update_escalation(session_id, bound, timestamp)
+        flags = self.content_filter.rule_flags(text)
+        decision = self.policy.decide(
+            age=age,
+            abuse={},
+            crisis=bound,
+            escalation={"ewma": esc[0], "slope": esc[1]},
+            content_flags=flags,
+            fairness_flags=self._fairness_flags(text),
+        )
+        return esc, {"suggested_min_age": None, "rule_flags": flags}, decision
+
+    def _fairness_flags(self, text: str) -> List[str]:
+        return self.fairness.flagged_terms(text) if self.fairness is not None else []
+
+    def _explainer(self, name: str, model: Any, heads: List[str]) -> TopFeatureExplainer:
+        """
+        Build (once per loaded model) the explainer for a head.
+        """
+        cached = self._explainers.get(name)
+        if cached is None or cached[0] is not model:
+            cached = (model, TopFeatureExplainer(model.pipeline, heads))
+            self._explainers[name] = cached
+        return cached[1]
+
+    def _attach_explanations(self, batch: ResultBatch, rows: List[int]):
+        """
+        Add top contributing n-grams for each abuse label and the crisis score,
+        using the model set each message was scored with. Messages scored by
+        transformers checkpoints (no TF-IDF features) get no explanations.
+        """
+        k = int(self.explain_cfg.get("top_k", 5))
+        groups: Dict[str | None, List[int]] = {}
+        for i in rows:
+            groups.setdefault((batch.input_extras[i] or {}).get("model_lang"), []).append(i)
+        for lang, group in groups.items():
+            abuse, crisis = (self.abuse, self.crisis) if lang is None else self._models_for(lang)[1:]
+            if getattr(abuse, "pipeline", None) is None or getattr(crisis, "pipeline", None) is None:
+                continue
+            texts = [batch.preprocessed[i] for i in group]
+            abuse_ex = self._explainer(f"abuse:{lang}", abuse, abuse.labels).explain(texts, k)
+            crisis_ex = self._explainer(f"crisis:{lang}", crisis, ["crisis"]).explain(texts, k)
+            for i, a, c in zip(group, abuse_ex, crisis_ex):
+                batch.set_extra(i, "explanations", {
+                    "abuse": {lbl: [list(t) for t in feats] for lbl, feats in a.items()},
+                    "crisis": [list(t) for t in c["crisis"]],
+                })
+
+    def _models_for(self, lang: str) -> Tuple[str | None, Any, Any]:
+        """
+        (model language, abuse, crisis) for a detected language; the primary models without a router.
+        """
+        if self.router is None:
+            return None, self.abuse, self.crisis
+        return self.router.resolve(lang, (self.abuse, self.crisis))
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        """
+        Snapshot of the online monitors (YAML/JSON serializable).
+        """
+        metrics: Dict[str, Any] = {}
+        if self.fairness is not None:
+            metrics["fairness"] = self.fairness.snapshot()
+        if self.audit is not None:
+            metrics["audit"] = self.audit.stats()
+        if self.profiler is not None:
+            metrics["profiler"] = self.profiler.stats()
+        if self.near_duplicates is not None:
+            metrics["near_duplicate"] = self.near_duplicates.stats()
+        if self.router is not None:
+            metrics["languages"] = self.router.stats()
+        if self.memory is not None:
+            metrics["memory"] = self.memory_report()
+        if self.drift is not None:
+            metrics["drift"] = self.drift.snapshot()
+        if self.shadow is not None:
+            metrics["shadow"] = self.shadow.stats()
+        if self._budget_stats["requests"]:
+            metrics["latency_budget"] = {**self._budget_stats, "stage_cost_ms": self.stage_costs.snapshot()}
+        return metrics
+
+    def _memory_components(self) -> Dict[str, Any]:
+        return {
+            "abuse_model": self.abuse,
+            "crisis_model": self.crisis,
+            "content_filter": self.content_filter,
+            "cascade_gate": self.cascade,
+            "language_models": self.router,
+            "explainers": self._explainers,
+            "sessions": self.sessions,
+            "escalation": self.escalation,
+            "near_duplicate": self.near_duplicates,
+            "drift": self.drift,
+            "fairness": self.fairness,
+            "audit": self.audit,
+            "profiler": self.profiler,
+            "loggers": logging.Logger.manager.loggerDict,
+        }
+
+    def memory_report(self) -> Dict[str, Any]:
+        """
+        Estimated memory per loaded component.
+
+        Sizes are structural estimates (see `deep_sizeof`); each object is counted
+        once, under the first component listed that references it, and sklearn
+        pipelines are broken down by step (e.g. TF-IDF vocabulary vs coefficients).
+        Bytes allocated while loading each model (tracemalloc) are reported as
+        "loaded_bytes" when the memory accountant is enabled.
+
+        Returns:
+            Dict with components, accounted_bytes, process_rss_bytes and budget stats
+        """
+        seen = {id(self)}
+        components: Dict[str, Any] = {}
+        for name, obj in self._memory_components().items():
+            if obj is None:
+                continue
+            entry: Dict[str, Any] = {}
+            steps = getattr(getattr(obj, "pipeline", None), "named_steps", None)
+            if steps:
+                entry["parts"] = {step: deep_sizeof(est, seen) for step, est in steps.items()}
+            entry["bytes"] = deep_sizeof(obj, seen) + sum(entry.get("parts", {}).values())
+            if hasattr(obj, "__len__"):
+                entry["entries"] = len(obj)
+            if self.memory is not None and name in self.memory.load_bytes:
+                entry["loaded_bytes"] = self.memory.load_bytes[name]
+            components[name] = entry
+        if self.router is not None:
+            components["language_models"]["entries"] = len(self.router.stats()["loaded"])
+        report = {
+            "components": components,
+            "accounted_bytes": sum(c["bytes"] for c in components.values()),
+            "process_rss_bytes": process_rss_bytes(),
+        }
+        if self.memory is not None:
+            report.update(self.memory.stats())
+            report["loaded_bytes"] = dict(self.memory.load_bytes)
+        return report
+
+    def _accounted_bytes(self) -> int:
+        # Kept for the shrink that may follow in the same enforcement: one traversal per check
+        self._memory_measured = self.memory_report()
+        return self._memory_measured["accounted_bytes"]
+
+    def _shrink_caches(self, excess: int) -> int:
+        """
+        Release cached state, in `memory.shrink_order`, until about `excess` bytes are freed.
+        Models, monitors and the shared unsessioned tracker are never dropped.
+
+        Sizes come from the report of the measurement that found the excess; the
+        bytes freed are estimated from the entries each cache drops, so the
+        components are not traversed again.
+
+        Returns:
+            Estimated bytes freed
+        """
+        report, self._memory_measured = self._memory_measured or self.memory_report(), None
+        freed = 0
+        for name in self._shrink_order:
+            if freed >= excess:
+                break
+            entry = report["components"].get(name)
+            if not entry or not entry.get("entries"):
+                continue
+            per_entry = entry["bytes"] / entry["entries"]
+            keep = max(0, entry["entries"] - int(np.ceil((excess - freed) / per_entry)))
+            if name == "explainers":
+                dropped = len(self._explainers)
+                self._explainers.clear()
+            elif name == "language_models":
+                dropped = self.router.shrink()
+            elif name == "near_duplicate":
+                dropped = self.near_duplicates.shrink(keep)
+            elif name == "sessions":
+                dropped = self.sessions.shrink(keep)
+            else:
+                continue
+            freed += int(min(entry["bytes"], dropped * per_entry))
+        return freed
+
+    def close(self):
+        """
+        Flush persisted session state and audit records and stop background workers.
+        """
+        self.sessions.close()
+        if self.shadow is not None:
+            self.shadow.close()
+        if self.audit is not None:
+            self.audit.close()
+        if self.profiler is not None:
+            self.profiler.close()
+
+    def _clean(self, text: str) -> str:
+        return self._normalize(mask_pii(text, **self._pii_kwargs) if self._pii_enabled else text)
+
+    def _normalize(self, text: str) -> str:
+        return normalize_text(
+            text,
             lower=self.pre_cfg.get("normalization", {}).get("lower", True),
             strip_urls=self.pre_cfg.get("normalization", {}).get("strip_urls", True),
             strip_punctuation=self.pre_cfg.get("normalization", {}).get("strip_punctuation", True),
             collapse_whitespace=self.pre_cfg.get("normalization", {}).get("collapse_whitespace", True),
             unicode_nfkc=self.pre_cfg.get("normalization", {}).get("unicode_nfkc", True),
         )
-        return {"text": s, "lang": lang_code, "lang_conf": lang_conf}
 
-    def infer(self, text: str, age: str) -> Dict[str, Any]:
+    def _long_mode(self, text: str) -> bool:
+        return self.long_input["enabled"] and len(text) > self.long_input["max_chars"]
+
+    def _window_spans(self, text: str) -> List[Tuple[int, int]]:
+        return window_spans(
+            len(text),
+            window_chars=self.long_input["window_chars"],
+            overlap_chars=self.long_input["overlap_chars"],
+            max_windows=self.long_input["max_windows"],
+        )
+
+    def _bounded_text(self, text: str) -> str:
+        """
+        The text itself, or for long inputs the raw windows that are scored, so
+        per-message scans stay within the long-input work budget.
+        """
+        if not self._long_mode(text):
+            return text
+        return " ".join(text[a:b] for a, b in self._window_spans(text))
+
+    def preprocess(self, text: str, cleaned: str | None = None, detect_lang: bool = True) -> Dict[str, Any]:
+        """
+        Detect language, mask PII and normalize.
+
+        Texts longer than `long_input.max_chars` are split into bounded
+        overlapping windows that are PII-masked (scanning each window with a
+        margin, so entities cut by a window edge are still recognized),
+        normalized and later scored independently;
+        language is detected on a sample. "text" joins the cleaned windows. `cleaned` may pass
+        an already cleaned short text; `detect_lang=False` skips detection
+        (language "en" with confidence 0).
+        """
+        long_mode = self._long_mode(text)
+        lang_code, lang_conf = ("en", 1.0)
+        if not detect_lang:
+            lang_code, lang_conf = ("en", 0.0)
+        elif self.pre_cfg.get("language_detection", {}).get("enabled", True):
+            sample = language_sample(text, self.long_input["language_sample_chars"]) if long_mode else text
+            lang_code, lang_conf = detect_language(sample, keep_unsupported=self.router is not None)
+
+        if long_mode:
+            spans = self._window_spans(text)
+            if self._pii_enabled:
+                raw = mask_pii_windows(text, spans, **self._pii_kwargs)
+            else:
+                raw = [text[a:b] for a, b in spans]
+            windows = [self._normalize(w) for w in raw]
+        else:
+            windows = [self._clean(text) if cleaned is None else cleaned]
+        return {"text": " ".join(windows), "lang": lang_code, "lang_conf": lang_conf, "windows": windows}
+
+    def _merge_content(self, outs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Combine content-filter outputs of one message's windows: strictest age, any flag.
+        """
+        if len(outs) == 1:
+            return outs[0]
+        order = {a: i for i, a in enumerate(self.models_cfg.get("content_filter", {}).get("age_classes", []))}
+        return {
+            "suggested_min_age": max((o["suggested_min_age"] for o in outs), key=lambda a: order.get(a, -1)),
+            "rule_flags": {k: any(o["rule_flags"][k] for o in outs) for k in outs[0]["rule_flags"]},
+        }
+
+    def _match_near_duplicates(
+        self, texts: List[str], rows: List[int]
+    ) -> Tuple[List[int], Dict[int, Tuple[str, NearDuplicateMatch]], Dict[int, str], Dict[int, Dict[str, Any]]]:
+        """
+        Split fully scored rows into leaders, which are scored and indexed, and
+        near-duplicates of a recent (or earlier in-batch) leader, which reuse its
+        scores and skip language detection and the model heads. Long inputs always
+        take the windowed path and are neither matched nor indexed.
+
+        Returns:
+            (leader rows, {row: (cleaned text, match)}, {leader row: cleaned text},
+            {leader row: index payload to fill once scored})
+        """
+        index = self.near_duplicates
+        leaders: List[int] = []
+        dups: Dict[int, Tuple[str, NearDuplicateMatch]] = {}
+        cleaned: Dict[int, str] = {}
+        payloads: Dict[int, Dict[str, Any]] = {}
+        pending = set()
+        now = time.time()
+        for i in rows:
+            if self._long_mode(texts[i]):
+                leaders.append(i)
+                continue
+            clean = self._clean(texts[i])
+            sig = index.signature(clean)
+            match = index.query(sig, now)
+            # A payload that is still empty belongs to a leader being scored by another batch
+            if match is not None and (match.payload or id(match.payload) in pending):
+                dups[i] = (clean, match)
+                continue
+            leaders.append(i)
+            cleaned[i] = clean
+            payload: Dict[str, Any] = {}
+            if index.add(sig, payload, now) is not None:
+                payloads[i] = payload
+                pending.add(id(payload))
+        return leaders, dups, cleaned, payloads
+
+    def _near_duplicate_scores(
+        self, dups: Dict[int, Tuple[str, NearDuplicateMatch]]
+    ) -> Tuple[List[Dict[str, Any]], np.ndarray, np.ndarray, List[Dict[str, Any]]]:
+        """
+        Pooled scores of near-duplicates, copied from their leaders.
+
+        Scores are raised by `boost_per_repeat` for every repeat of the same leader
+        (capped at `max_boost`), so floods escalate instead of being re-scored.
+        Keyword-based flags are recomputed on each message's own text.
+
+        Returns:
+            (preprocessed inputs, abuse probabilities, crisis probabilities, content outputs)
+        """
+        step = float(self.near_dup_cfg.get("boost_per_repeat", 0.0))
+        cap = float(self.near_dup_cfg.get("max_boost", 0.0))
+        pres, abuse_rows, crisis_rows, content_outs = [], [], [], []
+        for clean, match in dups.values():
+            p = match.payload
+            boost = min(cap, step * match.hits)
+            pres.append({"text": clean, "lang": p["lang"], "lang_conf": p["lang_conf"], "windows": [clean]})
+            abuse_rows.append(np.minimum(p["abuse"] + boost, 1.0))
+            crisis_rows.append(min(p["crisis"] + boost, 1.0))
+            content_outs.append({
+                "suggested_min_age": p["content"]["suggested_min_age"],
+                "rule_flags": self.content_filter.rule_flags(clean),
+            })
+        return pres, np.vstack(abuse_rows), np.asarray(crisis_rows), content_outs
+
+    def _submit_shadow(
+        self,
+        rows: List[int],
+        pres: List[Dict[str, Any]],
+        abuse_pooled: np.ndarray,
+        crisis_pooled: np.ndarray,
+        ages: List[str],
+        batch: ResultBatch,
+    ):
+        """
+        Hand a sample of fully scored messages to the shadow evaluator (non-blocking).
+        """
+        picks = self.shadow.sample(len(rows))
+        if self.router is not None:
+            # The candidate replaces the primary (default-language) models only
+            picks = [k for k in picks if pres[k].get("model_lang") == self.router.default]
+        if picks:
+            self.shadow.submit(
+                [pres[k]["text"] for k in picks],
+                [pres[k]["windows"] for k in picks],
+                [ages[rows[k]] for k in picks],
+                np.column_stack([abuse_pooled[picks], crisis_pooled[picks]]),
+                [batch[rows[k]] for k in picks],
+            )
+
+    def infer(
+        self,
+        text: str,
+        age: str,
+        session_id: str | None = None,
+        timestamp: float | None = None,
+        explain: bool | None = None,
+        budget_ms: float | None = None,
+    ) -> Dict[str, Any]:
+        return self.infer_batch([text], [age], [session_id], [timestamp], explain=explain, budget_ms=budget_ms)[0]
+
+    def infer_compact(
+        self,
+        texts: List[str],
+        ages: List[str],
+        session_ids: List[str | None] | None = None,
+        timestamps: List[float | None] | None = None,
+        explain: bool | None = None,
+        budget_ms: float | None = None,
+    ) -> ResultBatch:
+        """
+        Same as `infer_batch`, returning the array-backed ResultBatch instead of
+        result dicts (see ResultBatch.to_dict / to_jsonl for rendering on demand).
+        """
+        budget = LatencyBudget(
+            self.budget_cfg["default_ms"] if budget_ms is None else budget_ms, self.budget_cfg["order"]
+        )
+        if self.profiler is None:
+            return self._infer_batch(texts, ages, session_ids, timestamps, explain, budget)
+        with self.profiler.request():
+            return self._infer_batch(texts, ages, session_ids, timestamps, explain, budget)
+
+    def infer_batch(
+        self,
+        texts: List[str],
+        ages: List[str],
+        session_ids: List[str | None] | None = None,
+        timestamps: List[float | None] | None = None,
+        explain: bool | None = None,
+        budget_ms: float | None = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Run inference over a batch of messages.
+
+        Each model head is scored once for the whole batch; escalation and policy
+        are then applied message by message in input order, so per-session order
+        and escalation continuity are preserved.
+
+        With a latency budget, optional stages whose estimated cost no longer fits
+        are skipped in `latency_budget.degrade_order` (runtime.yaml); skipped stages
+        are listed under "degraded" in every result of the batch. Model scoring,
+        including the crisis head, and policy always run.
+
+        Args:
+            texts: Raw messages
+            ages: User age group per message
+            session_ids: Optional conversation id per message
+            timestamps: Optional epoch seconds per message (used for time-decayed escalation)
+            explain: True to attach top features for every scored message, False to skip;
+                None (default) follows explainability.include_top_features for non-allow actions
+            budget_ms: Latency budget for the whole batch (default: latency_budget.default_ms, null = none)
+
+        Returns:
+            One result dict per message, in input order
+        """
+        return self.infer_compact(texts, ages, session_ids, timestamps, explain, budget_ms).to_dicts()
+
+    def head_scores(self, texts: List[str], chunk_size: int = 4096) -> np.ndarray:
+        """
+        Pooled head scores of messages as served: preprocessing (PII masking,
+        normalization, language routing), long-input windowing and pooling,
+        with no latency budget. These are the scores the drift monitor observes,
+        so score references must be built from them.
+
+        Returns:
+            Array of shape (n, abuse labels + 1), crisis in the last column
+        """
         if not self._trained:
             self.load_models_from_disk()
+        out = np.zeros((len(texts), len(self.abuse.labels) + 1))
+        for start in range(0, len(texts), chunk_size):
+            pres = [self.preprocess(t) for t in texts[start:start + chunk_size]]
+            abuse, crisis, _ = self._score_units(pres, LatencyBudget(None, self.budget_cfg["order"]), {})
+            out[start:start + len(pres), :-1] = abuse
+            out[start:start + len(pres), -1] = crisis
+        return out
 
-        pre = self.preprocess(text)
-        texts = [pre["text"]]
+    def _score_units(
+        self, pres: List[Dict[str, Any]], budget: LatencyBudget, pending: Dict[str, float]
+    ) -> Tuple[np.ndarray, np.ndarray, List[Dict[str, Any]]]:
+        """
+        Score every window of every message in one call per head and pool per message.
 
-        abuse_thr = self.policy_cfg["thresholds"]["abuse"]
-        abuse_out = self.abuse.predict(texts, thresholds=abuse_thr)[0]
+        Messages are grouped by the model set their language routes to (each
+        group is scored in one call per head), and the chosen set is recorded as
+        "model_lang" in each preprocessed input when a language router is configured.
 
-        crisis_thr = self.policy_cfg["thresholds"]["crisis"]
-        crisis_out = self.crisis.predict(texts, threshold=crisis_thr)[0]
+        Under budget pressure, abuse and content heads see only `degraded_max_windows`
+        evenly spaced windows of long inputs, and the content classifier may be
+        replaced by rule flags; the crisis head always scores every window.
 
-        content_out = self.content_filter.predict(texts)[0]
+        Returns:
+            (pooled abuse probabilities, pooled crisis probabilities, content outputs)
+        """
+        costs = self.stage_costs
+        units = [w for p in pres for w in p["windows"]]
+        counts = [len(p["windows"]) for p in pres]
+        sel = np.arange(len(units))
+        sel_counts = counts
+        max_w = self.budget_cfg["degraded_max_windows"]
+        if max(counts) > max_w and not budget.keep("long_input_windows", pending):
+            picks, sel_counts, start = [], [], 0
+            for c in counts:
+                keep = np.unique(np.linspace(0, c - 1, min(c, max_w)).round().astype(int)) if c > max_w else np.arange(c)
+                picks.append(start + keep)
+                sel_counts.append(keep.size)
+                start += c
+            sel = np.concatenate(picks)
+        pending.pop("long_input_windows", None)
+        sel_units = [units[j] for j in sel]
 
-        max_risk = max([crisis_out["score"], *abuse_out["scores"].values()])
-        esc = self.escalation.update(max_risk)
+        pooling, temp = self.long_input["pooling"], self.long_input["temperature"]
+        offsets = np.cumsum([0] + counts)
+        sel_offsets = np.cumsum([0] + list(sel_counts))
 
-        decision = self.policy.decide(
-            age=age,
-            abuse=abuse_out["scores"],
-            crisis=crisis_out["score"],
-            escalation={"ewma": esc["ewma"], "slope": esc["slope"]},
-            content_flags=content_out["rule_flags"],
-            crisis_labels=crisis_out["labels"]
-        )
+        model_sets: Dict[str | None, Tuple[Any, Any]] = {}
+        resolved: Dict[str, str | None] = {}
+        msg_group = []
+        for p in pres:
+            if p["lang"] not in resolved:
+                key, abuse, crisis = self._models_for(p["lang"])
+                resolved[p["lang"]] = key
+                model_sets[key] = (abuse, crisis)
+            msg_group.append(resolved[p["lang"]])
+            if self.router is not None:
+                p["model_lang"] = resolved[p["lang"]]
+        keys = list(model_sets)
+        unit_group = np.repeat([keys.index(g) for g in msg_group], counts)
+        sel_group = unit_group[sel]
 
+        abuse_p = np.empty((len(sel_units), len(self.abuse.labels)))
+        crisis_p = np.empty((len(units), 1))
+        with costs.timed("abuse", len(sel_units)):
+            for g, (abuse, _) in enumerate(model_sets.values()):
+                rows = np.flatnonzero(sel_group == g)
+                abuse_p[rows] = abuse.predict_proba([sel_units[j] for j in rows])
+        pending.pop("abuse", None)
+        with costs.timed("crisis", len(units)):
+            for g, (_, crisis) in enumerate(model_sets.values()):
+                rows = np.flatnonzero(unit_group == g)
+                crisis_p[rows, 0] = crisis.predict_proba([units[j] for j in rows])
+        pending.pop("crisis", None)
+        if budget.keep("content_classifier", pending):
+            with costs.timed("content_classifier", len(sel_units)):
+                content_units = self.content_filter.predict(sel_units)
+        else:
+            content_units = [{"suggested_min_age": None, "rule_flags": self.content_filter.rule_flags(u)} for u in sel_units]
+        pending.pop("content_classifier", None)
+
+        abuse_pooled = np.vstack([
+            pool_scores(abuse_p[a:b], pooling, temp) for a, b in zip(sel_offsets[:-1], sel_offsets[1:])
+        ])
+        crisis_pooled = np.concatenate([
+            pool_scores(crisis_p[a:b], pooling, temp) for a, b in zip(offsets[:-1], offsets[1:])
+        ])
+        content_outs = [self._merge_content(content_units[a:b]) for a, b in zip(sel_offsets[:-1], sel_offsets[1:])]
+        return abuse_pooled, crisis_pooled, content_outs
+
+    def _stage_plan(self, texts: List[str], rows: List[int], n: int, n_explain: int) -> Dict[str, float]:
+        """
+        Estimated seconds of each remaining stage for a batch (see LatencyBudget.keep).
+        """
+        est = self.stage_costs.estimate
+        max_w = self.budget_cfg["degraded_max_windows"]
+        win_kwargs = {k: self.long_input[k] for k in ("window_chars", "overlap_chars", "max_windows")}
+        counts = [len(window_spans(len(texts[i]), **win_kwargs)) if self._long_mode(texts[i]) else 1 for i in rows]
+        units = sum(counts)
+        cut = sum(min(c, max_w) for c in counts)
         return {
-            "input": {"raw": text, "preprocessed": pre["text"], "lang": pre["lang"]},
-            "abuse": abuse_out,
-            "crisis": crisis_out,
-            "escalation": esc,
-            "content": content_out,
-            "decision": decision,
+            "language_detection": est("language_detection", len(rows)),
+            "preprocess": est("preprocess", len(rows)),
+            "long_input_windows": est("abuse", units - cut) + est("content_classifier", units - cut),
+            "abuse": est("abuse", cut),
+            "crisis": est("crisis", units),
+            "content_classifier": est("content_classifier", cut),
+            "policy": est("policy", n),
+            "explanations": est("explanations", n_explain),
         }
+
+    def _infer_batch(
+        self,
+        texts: List[str],
+        ages: List[str],
+        session_ids: List[str | None] | None,
+        timestamps: List[float | None] | None,
+        explain: bool | None,
+        budget: LatencyBudget,
+    ) -> ResultBatch:
+        if not self._trained:
+            self.load_models_from_disk()
+
+        n = len(texts)
+        session_ids = session_ids or [None] * n
+        timestamps = timestamps or [None] * n
+
+        exited = np.zeros(n, dtype=bool)
+        bounds = np.zeros(n)
+        if self.cascade is not None and n:
+            exited, bounds = self._cascade_exits(texts, session_ids)
+
+        full_idx = np.flatnonzero(~exited).tolist()
+        dups: Dict[int, Tuple[str, NearDuplicateMatch]] = {}
+        cleaned: Dict[int, str] = {}
+        payloads: Dict[int, Dict[str, Any]] = {}
+        if self.near_duplicates is not None:
+            full_idx, dups, cleaned, payloads = self._match_near_duplicates(texts, full_idx)
+
+        if explain is None:
+            may_explain = self.explain_cfg.get("include_top_features", False)
+        else:
+            may_explain = bool(explain)
+        pending: Dict[str, float] = {}
+        if budget.deadline is not None:
+            pending = self._stage_plan(texts, full_idx, n, len(full_idx) + len(dups) if may_explain else 0)
+        detect_lang = budget.keep("language_detection", pending)
+        pending.pop("language_detection", None)
+        t0 = time.perf_counter()
+        pres = [self.preprocess(texts[i], cleaned.get(i), detect_lang) for i in full_idx]
+        elapsed = time.perf_counter() - t0
+        if detect_lang:
+            lang_s = elapsed - self.stage_costs.estimate("preprocess", len(full_idx))
+            self.stage_costs.observe("language_detection", max(lang_s, 0.0), len(full_idx))
+        else:
+            self.stage_costs.observe("preprocess", elapsed, len(full_idx))
+        pending.pop("preprocess", None)
+
+        abuse_pooled = np.zeros((0, len(self.abuse.labels)))
+        crisis_pooled = np.zeros(0)
+        content_outs: List[Dict[str, Any]] = []
+        if full_idx:
+            abuse_pooled, crisis_pooled, content_outs = self._score_units(pres, budget, pending)
+            for k, i in enumerate(full_idx):
+                if i in payloads:
+                    payloads[i].update(
+                        abuse=abuse_pooled[k], crisis=float(crisis_pooled[k]), content=content_outs[k],
+                        lang=pres[k]["lang"], lang_conf=pres[k]["lang_conf"],
+                    )
+        if dups:
+            dup_pres, dup_abuse, dup_crisis, dup_content = self._near_duplicate_scores(dups)
+            full_idx = full_idx + list(dups)
+            pres += dup_pres
+            abuse_pooled = np.vstack([abuse_pooled, dup_abuse])
+            crisis_pooled = np.concatenate([crisis_pooled, dup_crisis])
+            content_outs += dup_content
+        batch = ResultBatch(self.abuse.labels, CRISIS_FLAGS, list(texts), cascade=self.cascade is not None)
+        batch.exited[:] = exited
+        batch.scores[exited, -1] = bounds[exited]
+        if full_idx:
+            thresholds = self.policy_cfg["thresholds"]
+            batch.scores[full_idx, :-1] = abuse_pooled
+            batch.scores[full_idx, -1] = crisis_pooled
+            batch.abuse_mask[full_idx] = self.abuse.label_masks(abuse_pooled, thresholds["abuse"])
+            batch.crisis_mask[full_idx] = self.crisis.flag_masks(
+                crisis_pooled, [p["text"] for p in pres], thresholds["crisis"]
+            )
+        if payloads and ({"language_detection", "content_classifier"} & set(budget.degraded)):
+            for payload in payloads.values():
+                payload.clear()  # degraded outputs must not be reused by later near-duplicates
+
+        t0 = time.perf_counter()
+        labels = self.abuse.labels
+        scores = batch.scores.tolist()
+        crisis_masks = batch.crisis_mask.tolist()
+        position = {i: k for k, i in enumerate(full_idx)}
+        # Identity terms are matched on the scored windows of long inputs, not the whole paste
+        fair_texts = [self._bounded_text(t) for t in texts] if self.fairness is not None else texts
+        escalation = []
+        for i in range(n):
+            if exited[i]:
+                esc, batch.content[i], batch.decisions[i] = self._early_exit_result(
+                    texts[i], ages[i], session_ids[i], timestamps[i], float(bounds[i])
+                )
+                escalation.append(esc[:2])
+                batch.history[i] = esc[2]
+                continue
+            k = position[i]
+            pre, row = pres[k], scores[i]
+            ewma, slope, batch.history[i] = self._update_escalation(session_ids[i], max(row), timestamps[i])
+            escalation.append((ewma, slope))
+
+            batch.decisions[i] = self.policy.decide(
+                age=ages[i],
+                abuse=dict(zip(labels, row[:-1])),
+                crisis=row[-1],
+                escalation={"ewma": ewma, "slope": slope},
+                content_flags=content_outs[k]["rule_flags"],
+                crisis_labels=[f for j, f in enumerate(CRISIS_FLAGS) if crisis_masks[i] >> j & 1],
+                fairness_flags=self._fairness_flags(fair_texts[i]),
+            )
+            batch.preprocessed[i], batch.lang[i], batch.content[i] = pre["text"], pre["lang"], content_outs[k]
+            if len(pre["windows"]) > 1 or "model_lang" in pre:
+                batch.input_extras[i] = {
+                    **({"windows": len(pre["windows"])} if len(pre["windows"]) > 1 else {}),
+                    **({"model_lang": pre["model_lang"]} if "model_lang" in pre else {}),
+                }
+            if i in dups:
+                match = dups[i][1]
+                batch.set_extra(
+                    i, "near_duplicate", {"of": match.entry_id, "similarity": match.similarity, "repeats": match.hits}
+                )
+        if n:
+            batch.escalation[:] = escalation
+        self.stage_costs.observe("policy", time.perf_counter() - t0, n)
+        pending.pop("policy", None)
+        if self.shadow is not None and full_idx:
+            self._submit_shadow(full_idx, pres, abuse_pooled, crisis_pooled, ages, batch)
+
+        if self.fairness is not None:
+            self.fairness.observe_batch(fair_texts, batch.decisions)
+        if self.drift is not None:
+            head_scores = np.where(batch.exited[:, None], np.nan, batch.scores)
+            self.drift.observe_batch([*labels, "crisis"], head_scores, batch.actions)
+        audit = self._audit_sink()
+        if audit is not None:
+            audit.submit(list(batch), ages, session_ids, timestamps)
+
+        if explain is None:
+            explain_rows = [
+                i for i in full_idx if batch.decisions[i]["action"] != "allow"
+            ] if self.explain_cfg.get("include_top_features", False) else []
+        else:
+            explain_rows = full_idx if explain else []
+        explain_failed = False
+        if explain_rows and budget.keep(
+            "explanations", {**pending, "explanations": self.stage_costs.estimate("explanations", len(explain_rows))}
+        ):
+            try:
+                with self.stage_costs.timed("explanations", len(explain_rows)):
+                    self._attach_explanations(batch, explain_rows)
+            except Exception as e:
+                # Explanations are optional: return the decisions without them
+                logger.warning(f"⚠️ Explanations failed, results returned without them: {e}")
+                explain_failed = True
+
+        if self.memory is not None and self.memory.due():
+            self.memory.enforce_in_background()
+        if budget.deadline is not None:
+            stats = self._budget_stats
+            stats["requests"] += 1
+            stats["overruns"] += int(budget.overrun())
+            for stage in budget.degraded:
+                stats["degraded"][stage] = stats["degraded"].get(stage, 0) + 1
+            batch.degraded = list(budget.degraded)
+        if explain_failed and "explanations" not in batch.degraded:
+            batch.degraded.append("explanations")
+        return batch
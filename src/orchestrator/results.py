@@ -0,0 +1,336 @@
+from __future__ import annotations
+import json
+from json.encoder import encode_basestring_ascii as _quote
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+
+SECTIONS = ("input", "abuse", "crisis", "escalation", "content", "decision")
+
+_encode = json.JSONEncoder(separators=(",", ":")).encode
+
+def _mask_names(mask: int, names: Sequence[str]) -> List[str]:
+    return [name for j, name in enumerate(names) if mask >> j & 1]
+
+def _list_json(values: List[str], cache: Dict[Any, str]) -> str:
+    key = ("list", *values)
+    out = cache.get(key)
+    if out is None:
+        out = cache[key] = _encode(values)
+    return out
+
+def _content_json(content: Dict[str, Any], cache: Dict[Any, str]) -> str:
+    """
+    Content outputs repeat a handful of (age, flags) combinations; each is encoded once per batch.
+    """
+    if len(content) != 2:
+        return _encode(content)
+    key = ("content", content["suggested_min_age"], *content["rule_flags"].items())
+    out = cache.get(key)
+    if out is None:
+        out = cache[key] = _encode(content)
+    return out
+
+def _decision_json(d: Dict[str, Any], cache: Dict[Any, str]) -> str:
+    if len(d) != 5:
+        return _encode(d)
+    return '{"action":%s,"route_to_human":%s,"max_risk":%s,"rationale":%s,"redact":%s}' % (
+        _quote(d["action"]), "true" if d["route_to_human"] else "false", float.__repr__(d["max_risk"]),
+        _list_json(d["rationale"], cache), _list_json(d["redact"], cache),
+    )
+
+class ResultBatch:
+    """
+    Array-backed inference results of one batch.
+
+    Head scores are one float row per message (abuse labels, then crisis),
+    thresholded abuse labels and crisis flags are bitmasks, and escalation is an
+    (ewma, slope) row plus the history tuple; only the policy decision and the
+    content output stay per-message dicts. The nested result dict of a message
+    is built only when asked for (`to_dict`, or section access on a
+    MessageResult), and `to_jsonl` serializes without building it.
+
+    Rows exited by the cascade have NaN abuse scores and report the gate bound
+    as crisis score.
+    """
+
+    __slots__ = (
+        "abuse_labels", "crisis_flags", "raw", "preprocessed", "lang", "scores", "abuse_mask",
+        "crisis_mask", "escalation", "history", "content", "decisions", "exited", "cascade",
+        "input_extras", "extras", "degraded",
+    )
+
+    def __init__(
+        self,
+        abuse_labels: Sequence[str],
+        crisis_flags: Sequence[str],
+        raw: List[str],
+        cascade: bool = False,
+    ):
+        n = len(raw)
+        self.abuse_labels = tuple(abuse_labels)
+        self.crisis_flags = tuple(crisis_flags)
+        self.raw = raw
+        self.preprocessed: List[Optional[str]] = [None] * n
+        self.lang: List[Optional[str]] = [None] * n
+        self.scores = np.full((n, len(self.abuse_labels) + 1), np.nan)
+        self.abuse_mask = np.zeros(n, dtype=np.uint64)
+        self.crisis_mask = np.zeros(n, dtype=np.uint64)
+        self.escalation = np.zeros((n, 2))
+        self.history: List[tuple] = [()] * n
+        self.content: List[Optional[Dict[str, Any]]] = [None] * n
+        self.decisions: List[Optional[Dict[str, Any]]] = [None] * n
+        self.exited = np.zeros(n, dtype=bool)
+        self.cascade = cascade
+        self.input_extras: List[Optional[Dict[str, Any]]] = [None] * n
+        self.extras: List[Optional[Dict[str, Any]]] = [None] * n
+        self.degraded: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.raw)
+
+    def __getitem__(self, i: int) -> "MessageResult":
+        if not -len(self) <= i < len(self):
+            raise IndexError(i)
+        return MessageResult(self, i % len(self))
+
+    def __iter__(self) -> Iterator["MessageResult"]:
+        return (MessageResult(self, i) for i in range(len(self)))
+
+    def set_extra(self, i: int, key: str, value: Any):
+        """
+        Attach an optional top-level section (e.g. "explanations") to one message.
+        """
+        if self.extras[i] is None:
+            self.extras[i] = {}
+        self.extras[i][key] = value
+
+    @property
+    def actions(self) -> List[str]:
+        return [d["action"] for d in self.decisions]
+
+    def section(self, i: int, key: str) -> Any:
+        """
+        Build one section of the legacy result dict of message i.
+        """
+        if key == "input":
+            out = {"raw": self.raw[i], "preprocessed": self.preprocessed[i], "lang": self.lang[i]}
+            if self.input_extras[i]:
+                out.update(self.input_extras[i])
+            return out
+        if key == "abuse":
+            if self.exited[i]:
+                return {"scores": {}, "labels": []}
+            return {
+                "scores": dict(zip(self.abuse_labels, self.scores[i, :-1].tolist())),
+                "labels": _mask_names(int(self.abuse_mask[i]), self.abuse_labels),
+            }
+        if key == "crisis":
+            score = float(self.scores[i, -1])
+            if self.exited[i]:
+                return {"score": score, "label": "non-crisis", "flags": {}, "labels": []}
+            mask = int(self.crisis_mask[i])
+            return {
+                "score": score,
+                "label": "crisis" if mask & 1 else "non-crisis",
+                "flags": {name: bool(mask >> j & 1) for j, name in enumerate(self.crisis_flags)},
+                "labels": _mask_names(mask, self.crisis_flags),
+            }
+        if key == "escalation":
+            ewma, slope = self.escalation[i].tolist()
+            return {"ewma": ewma, "slope": slope, "history": list(self.history[i])}
+        if key == "content":
+            return self.content[i]
+        if key == "decision":
+            return self.decisions[i]
+        if key == "cascade" and self.cascade:
+            return {"exited": True, "score": float(self.scores[i, -1])} if self.exited[i] else {"exited": False}
+        if key == "degraded" and self.degraded:
+            return list(self.degraded)
+        if self.extras[i] and key in self.extras[i]:
+            return self.extras[i][key]
+        raise KeyError(key)
+
+    def keys(self, i: int) -> List[str]:
+        keys = list(SECTIONS)
+        if self.cascade:
+            keys.append("cascade")
+        keys += list(self.extras[i] or ())
+        if self.degraded:
+            keys.append("degraded")
+        return keys
+
+    def _columns(self, rows: List[int]) -> Tuple[list, ...]:
+        """
+        Array columns of `rows` as Python lists (one conversion per batch, not per value).
+        """
+        return (
+            self.scores[rows].tolist(), self.abuse_mask[rows].tolist(), self.crisis_mask[rows].tolist(),
+            self.escalation[rows].tolist(), self.exited[rows].tolist(),
+        )
+
+    def _dicts(self, rows: List[int]) -> List[Dict[str, Any]]:
+        scores, abuse_masks, crisis_masks, escalation, exited = self._columns(rows)
+        labels, flags = self.abuse_labels, self.crisis_flags
+        names: Dict[Tuple[tuple, int], tuple] = {}
+        out = []
+        for k, i in enumerate(rows):
+            row = scores[k]
+            inp = {"raw": self.raw[i], "preprocessed": self.preprocessed[i], "lang": self.lang[i]}
+            if self.input_extras[i]:
+                inp.update(self.input_extras[i])
+            if exited[k]:
+                abuse = {"scores": {}, "labels": []}
+                crisis = {"score": row[-1], "label": "non-crisis", "flags": {}, "labels": []}
+            else:
+                a_key, c_key = (labels, abuse_masks[k]), (flags, crisis_masks[k])
+                if a_key not in names:
+                    names[a_key] = tuple(_mask_names(a_key[1], labels))
+                if c_key not in names:
+                    names[c_key] = tuple(_mask_names(c_key[1], flags))
+                mask = c_key[1]
+                abuse = {"scores": dict(zip(labels, row[:-1])), "labels": list(names[a_key])}
+                crisis = {
+                    "score": row[-1],
+                    "label": "crisis" if mask & 1 else "non-crisis",
+                    "flags": {name: bool(mask >> j & 1) for j, name in enumerate(flags)},
+                    "labels": list(names[c_key]),
+                }
+            ewma, slope = escalation[k]
+            result = {
+                "input": inp,
+                "abuse": abuse,
+                "crisis": crisis,
+                "escalation": {"ewma": ewma, "slope": slope, "history": list(self.history[i])},
+                "content": self.content[i],
+                "decision": self.decisions[i],
+            }
+            if self.cascade:
+                result["cascade"] = {"exited": True, "score": row[-1]} if exited[k] else {"exited": False}
+            if self.extras[i]:
+                result.update(self.extras[i])
+            if self.degraded:
+                result["degraded"] = list(self.degraded)
+            out.append(result)
+        return out
+
+    def to_dict(self, i: int) -> Dict[str, Any]:
+        return self._dicts([i])[0]
+
+    def to_dicts(self, rows: Optional[Sequence[int]] = None) -> List[Dict[str, Any]]:
+        """
+        Legacy result dicts of every message (or of `rows`), in order.
+        """
+        return self._dicts(list(range(len(self))) if rows is None else list(rows))
+
+    def to_jsonl(self) -> str:
+        """
+        Compact JSON of every message, one line each; parses to the same
+        objects as `json.dumps` of the `to_dict` output.
+        """
+        return "\n".join(self._json_lines(list(range(len(self)))))
+
+    def to_json(self, i: int) -> str:
+        return self._json_lines([i])[0]
+
+    def _json_lines(self, rows: List[int]) -> List[str]:
+        scores, abuse_masks, crisis_masks, escalation, exited = self._columns(rows)
+        labels, flags = self.abuse_labels, self.crisis_flags
+        row_tpl = (
+            '{"input":{"raw":%s,"preprocessed":%s,"lang":%s%s},"abuse":{"scores":{'
+            + ",".join(f"{_quote(lbl)}:%r" for lbl in labels)
+            + '},"labels":%s},"crisis":{"score":%r,"label":%s,"flags":%s,"labels":%s},'
+            '"escalation":{"ewma":%r,"slope":%r,"history":[%s]},"content":%s,"decision":%s%s%s}'
+        )
+        exit_tpl = (
+            '{"input":{"raw":%s,"preprocessed":%s,"lang":%s%s},"abuse":{"scores":{},"labels":[]},'
+            '"crisis":{"score":%r,"label":"non-crisis","flags":{},"labels":[]},'
+            '"escalation":{"ewma":%r,"slope":%r,"history":[%s]},"content":%s,"decision":%s%s%s}'
+        )
+        tail = ',"degraded":' + _encode(self.degraded) if self.degraded else ""
+        cache: Dict[Any, str] = {}
+        lines = []
+        for k, i in enumerate(rows):
+            row = scores[k]
+            inp = self.input_extras[i]
+            head = (
+                _quote(self.raw[i]),
+                "null" if self.preprocessed[i] is None else _quote(self.preprocessed[i]),
+                "null" if self.lang[i] is None else _quote(self.lang[i]),
+                "," + _encode(inp)[1:-1] if inp else "",
+            )
+            extra = "," + _encode(self.extras[i])[1:-1] if self.extras[i] else ""
+            if self.cascade:
+                extra = (',"cascade":{"exited":true,"score":%r}' % row[-1] if exited[k] else ',"cascade":{"exited":false}') + extra
+            ewma, slope = escalation[k]
+            rest = (
+                ewma, slope, ",".join(map(float.__repr__, self.history[i])),
+                _content_json(self.content[i], cache), _decision_json(self.decisions[i], cache), extra, tail,
+            )
+            if exited[k]:
+                lines.append(exit_tpl % (*head, row[-1], *rest))
+                continue
+            a_key, c_key = ("abuse", abuse_masks[k]), ("crisis", crisis_masks[k])
+            if a_key not in cache:
+                cache[a_key] = _encode(_mask_names(a_key[1], labels))
+            if c_key not in cache:
+                mask = c_key[1]
+                cache[c_key] = (
+                    '"crisis"' if mask & 1 else '"non-crisis"',
+                    _encode({name: bool(mask >> j & 1) for j, name in enumerate(flags)}),
+                    _encode(_mask_names(mask, flags)),
+                )
+            lines.append(row_tpl % (*head, *row[:-1], cache[a_key], row[-1], *cache[c_key], *rest))
+        return lines
+
+class MessageResult:
+    """
+    View of one message in a ResultBatch.
+
+    Supports read access like the legacy result dict (`r["decision"]["action"]`,
+    `r.get("cascade", {})`); sections are built on each access, so edits to a
+    returned section are not kept. Assigning a top-level key attaches it to the
+    message.
+    """
+
+    __slots__ = ("batch", "index")
+
+    def __init__(self, batch: ResultBatch, index: int):
+        self.batch = batch
+        self.index = index
+
+    def __getitem__(self, key: str) -> Any:
+        return self.batch.section(self.index, key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key in SECTIONS:
+            raise KeyError(f"Section '{key}' is read-only on compact results")
+        self.batch.set_extra(self.index, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.batch.keys(self.index)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self) -> List[str]:
+        return self.batch.keys(self.index)
+
+    @property
+    def action(self) -> str:
+        return self.batch.decisions[self.index]["action"]
+
+    @property
+    def scores(self) -> np.ndarray:
+        """
+        Head scores (abuse labels, then crisis).
+        """
+        return self.batch.scores[self.index]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.batch.to_dict(self.index)
+
+    def to_json(self) -> str:
+        return self.batch.to_json(self.index)
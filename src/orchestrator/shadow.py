@@ -0,0 +1,296 @@
+from __future__ import annotations
+import os
+import time
+import queue
+import random
+import multiprocessing as mp
+from typing import Dict, Any, List, Optional
+import joblib
+import numpy as np
+from src.preprocessing.long_input import pool_scores
+from src.policy_engine.policy_decision import PolicyEngine
+from src.utils.audit_log import ACTIONS
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Candidate latency histogram: log-spaced milliseconds per message
+_LATENCY_EDGES_MS = np.logspace(-3, 4, 71)
+
+class ShadowStats:
+    """
+    Candidate-vs-primary comparison accumulated by the shadow worker.
+
+    Tracks the action confusion matrix, per-head label flips and score-delta
+    histograms (candidate minus primary, over [-1, 1]) and the candidate's
+    amortized scoring latency per message.
+    """
+
+    def __init__(self, heads: List[str], delta_bins: int = 40):
+        self.heads = list(heads)
+        self.edges = np.linspace(-1.0, 1.0, int(delta_bins) + 1)
+        self.messages = 0
+        self.batches = 0
+        self.actions = np.zeros((len(ACTIONS), len(ACTIONS)), dtype=np.int64)
+        self.route_changed = 0
+        self.label_flips = np.zeros(len(self.heads), dtype=np.int64)
+        self.delta_hist = np.zeros((len(self.heads), len(self.edges) - 1), dtype=np.int64)
+        self.abs_delta_sum = np.zeros(len(self.heads))
+        self.latency_hist = np.zeros(len(_LATENCY_EDGES_MS) + 1, dtype=np.int64)
+
+    def update(
+        self,
+        primary: np.ndarray,
+        candidate: np.ndarray,
+        thresholds: np.ndarray,
+        primary_actions: List[str],
+        candidate_actions: List[str],
+        route_changed: int,
+        latency_ms_per_msg: float,
+    ):
+        """
+        Args:
+            primary, candidate: Scores of shape (n, n_heads)
+            thresholds: Label threshold per head
+        """
+        n = primary.shape[0]
+        delta = np.clip(candidate - primary, -1.0, 1.0)
+        for j in range(len(self.heads)):
+            self.delta_hist[j] += np.histogram(delta[:, j], bins=self.edges)[0]
+        self.abs_delta_sum += np.abs(delta).sum(axis=0)
+        self.label_flips += ((primary >= thresholds) != (candidate >= thresholds)).sum(axis=0)
+        np.add.at(
+            self.actions,
+            ([ACTIONS.index(a) for a in primary_actions], [ACTIONS.index(a) for a in candidate_actions]),
+            1,
+        )
+        self.route_changed += int(route_changed)
+        self.latency_hist[np.searchsorted(_LATENCY_EDGES_MS, latency_ms_per_msg)] += n
+        self.messages += n
+        self.batches += 1
+
+    def _latency_quantile(self, q: float) -> Optional[float]:
+        if not self.messages:
+            return None
+        k = int(np.searchsorted(np.cumsum(self.latency_hist), q * self.messages))
+        return float(_LATENCY_EDGES_MS[min(k, len(_LATENCY_EDGES_MS) - 1)])
+
+    def snapshot(self) -> Dict[str, Any]:
+        n = max(self.messages, 1)
+        return {
+            "messages": self.messages,
+            "batches": self.batches,
+            "action_agreement": float(np.trace(self.actions) / n) if self.messages else None,
+            "actions": {
+                f"{a}->{b}": int(self.actions[i, j])
+                for i, a in enumerate(ACTIONS) for j, b in enumerate(ACTIONS) if self.actions[i, j]
+            },
+            "route_to_human_changed": self.route_changed,
+            "heads": {
+                head: {
+                    "label_flip_rate": float(self.label_flips[j] / n),
+                    "mean_abs_delta": float(self.abs_delta_sum[j] / n),
+                    "delta_hist": self.delta_hist[j].tolist(),
+                }
+                for j, head in enumerate(self.heads)
+            },
+            "delta_edges": [round(float(e), 4) for e in self.edges],
+            "latency_ms_per_msg": {"p50": self._latency_quantile(0.5), "p99": self._latency_quantile(0.99)},
+        }
+
+def _score_candidate(abuse, crisis, policy, settings, items):
+    """
+    Score a group of submitted batches with the candidate and compare against the primary.
+    """
+    windows = [w for item in items for w in item["windows"]]
+    texts = [t for item in items for t in item["texts"]]
+    units = [u for ws in windows for u in ws]
+    offsets = np.cumsum([0] + [len(ws) for ws in windows])
+    spans = list(zip(offsets[:-1], offsets[1:]))
+    pooling, temp = settings["pooling"], settings["temperature"]
+
+    start = time.perf_counter()
+    abuse_p = abuse.predict_proba(units)
+    crisis_p = crisis.predict_proba(units).reshape(-1, 1)
+    abuse_pooled = np.vstack([pool_scores(abuse_p[a:b], pooling, temp) for a, b in spans])
+    crisis_pooled = np.concatenate([pool_scores(crisis_p[a:b], pooling, temp) for a, b in spans])
+    elapsed_ms = (time.perf_counter() - start) * 1000.0
+
+    thresholds = policy.cfg["thresholds"]
+    crisis_outs = crisis.predict_from_proba(crisis_pooled, texts, thresholds["crisis"])
+    ages = [a for item in items for a in item["ages"]]
+    esc = [e for item in items for e in item["escalation"]]
+    flags = [f for item in items for f in item["rule_flags"]]
+    primary_routes = [r for item in items for r in item["route_to_human"]]
+    cand_actions, route_changed = [], 0
+    for k in range(len(texts)):
+        decision = policy.decide(
+            age=ages[k],
+            abuse=dict(zip(abuse.labels, map(float, abuse_pooled[k]))),
+            crisis=float(crisis_pooled[k]),
+            escalation=esc[k],
+            content_flags=flags[k],
+            crisis_labels=crisis_outs[k]["labels"],
+        )
+        cand_actions.append(decision["action"])
+        route_changed += decision["route_to_human"] != primary_routes[k]
+
+    primary = np.vstack([item["scores"] for item in items])
+    candidate = np.column_stack([abuse_pooled, crisis_pooled])
+    head_thr = np.array([thresholds["abuse"].get(lbl, 0.5) for lbl in abuse.labels] + [thresholds["crisis"]])
+    primary_actions = [a for item in items for a in item["actions"]]
+    return primary, candidate, head_thr, primary_actions, cand_actions, route_changed, elapsed_ms / len(texts)
+
+def _shadow_worker(model_dir: str, policy_cfg: Dict[str, Any], settings: Dict[str, Any], inbox, outbox):
+    """
+    Shadow process: load the candidate models, then score queued batches until a None sentinel.
+    Snapshots are sent on `outbox` every report_interval_s and once at exit.
+    """
+    if settings["niceness"] and hasattr(os, "nice"):
+        os.nice(settings["niceness"])  # yield the CPU to the serving process
+    try:
+        abuse = joblib.load(os.path.join(model_dir, "abuse_detector.joblib"))
+        crisis = joblib.load(os.path.join(model_dir, "crisis_detector.joblib"))
+    except Exception as e:
+        outbox.put({"error": f"candidate models unavailable: {e}"})
+        return
+    policy = PolicyEngine(policy_cfg)
+    stats = ShadowStats([*abuse.labels, "crisis"], settings["delta_bins"])
+    last_report = time.monotonic()
+    done = False
+    while not done:
+        items = []
+        try:
+            items.append(inbox.get(timeout=settings["report_interval_s"]))
+            while items[-1] is not None and sum(len(i["texts"]) for i in items) < settings["batch_size"]:
+                items.append(inbox.get_nowait())
+        except queue.Empty:
+            pass
+        if items and items[-1] is None:
+            done = True
+            items.pop()
+        if items:
+            stats.update(*_score_candidate(abuse, crisis, policy, settings, items))
+        if done or time.monotonic() - last_report >= settings["report_interval_s"]:
+            outbox.put(stats.snapshot())
+            last_report = time.monotonic()
+
+class ShadowEvaluator:
+    """
+    Shadow-mode evaluation of a candidate model set on live traffic.
+
+    A sampled fraction of fully scored messages is handed (one item per request
+    batch) to a separate process through a bounded queue; the process scores
+    them with the candidate models, applies the same policy with the primary's
+    escalation state, and accumulates agreement statistics (see ShadowStats).
+    The request path only samples and enqueues without blocking: when the queue
+    is full the batch is dropped and counted, and the candidate never runs in
+    the serving process, so primary latency is unaffected.
+    Config keys: runtime.yaml -> shadow
+    """
+
+    def __init__(self, config: Dict[str, Any], policy_cfg: Dict[str, Any], long_input: Dict[str, Any]):
+        self.model_dir = config.get("model_dir", "models/candidate/")
+        self.sample_rate = float(config.get("sample_rate", 0.05))
+        settings = {
+            "batch_size": int(config.get("batch_size", 256)),
+            "delta_bins": int(config.get("delta_bins", 40)),
+            "report_interval_s": float(config.get("report_interval_s", 5.0)),
+            "niceness": int(config.get("niceness", 10)),
+            "pooling": long_input["pooling"],
+            "temperature": long_input["temperature"],
+        }
+        ctx = mp.get_context("spawn")
+        self._inbox = ctx.Queue(maxsize=int(config.get("max_queue", 256)))
+        self._outbox = ctx.Queue()
+        self._proc = ctx.Process(
+            target=_shadow_worker,
+            args=(self.model_dir, policy_cfg, settings, self._inbox, self._outbox),
+            name="shadow-evaluator",
+            daemon=True,
+        )
+        self._proc.start()
+        self._latest: Dict[str, Any] = {}
+        self._submitted = 0
+        self._dropped = 0
+
+    def sample(self, n: int) -> List[int]:
+        """
+        Positions (out of n) selected for shadow evaluation.
+        """
+        return [k for k in range(n) if random.random() < self.sample_rate]
+
+    def submit(
+        self,
+        texts: List[str],
+        windows: List[List[str]],
+        ages: List[str],
+        scores: np.ndarray,
+        results: List[Dict[str, Any]],
+    ) -> bool:
+        """
+        Enqueue sampled messages without blocking.
+
+        Args:
+            texts: Preprocessed texts
+            windows: Preprocessed windows per message
+            ages: User age group per message
+            scores: Primary pooled scores, (n, n_abuse_labels + 1) with crisis last
+            results: Primary results of the same messages
+
+        Returns:
+            False if the queue was full and the batch was dropped
+        """
+        item = {
+            "texts": texts,
+            "windows": windows,
+            "ages": ages,
+            "scores": scores,
+            "actions": [r["decision"]["action"] for r in results],
+            "route_to_human": [r["decision"]["route_to_human"] for r in results],
+            "escalation": [{"ewma": r["escalation"]["ewma"], "slope": r["escalation"]["slope"]} for r in results],
+            "rule_flags": [r["content"]["rule_flags"] for r in results],
+        }
+        try:
+            self._inbox.put_nowait(item)
+        except queue.Full:
+            self._dropped += len(texts)
+            return False
+        self._submitted += len(texts)
+        return True
+
+    def _drain(self):
+        while True:
+            try:
+                self._latest = self._outbox.get_nowait()
+            except queue.Empty:
+                return
+            if "error" in self._latest:
+                logger.warning(f"⚠️ Shadow evaluation stopped: {self._latest['error']}")
+
+    def stats(self) -> Dict[str, Any]:
+        self._drain()
+        return {
+            "model_dir": self.model_dir,
+            "submitted": self._submitted,
+            "dropped": self._dropped,
+            "alive": self._proc.is_alive(),
+            **self._latest,
+        }
+
+    def close(self, timeout: float = 30.0):
+        """
+        Let the worker finish the queued batches and collect its final snapshot.
+        """
+        if self._proc.is_alive():
+            try:
+                self._inbox.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+        deadline = time.monotonic() + timeout
+        while self._proc.is_alive() and time.monotonic() < deadline:
+            self._drain()  # keep the result pipe flowing so the worker can exit
+            self._proc.join(0.05)
+        if self._proc.is_alive():
+            self._proc.terminate()
+        self._drain()
@@ -0,0 +1,495 @@
+from __future__ import annotations
+import time
+import queue
+import bisect
+import hashlib
+import itertools
+import threading
+import multiprocessing as mp
+from concurrent.futures import Future
+from typing import Dict, Any, List, Optional, Tuple
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Messages without a session share one escalation tracker; they are pinned to
+# the owner of this key so the tracker lives on exactly one shard.
+_UNSESSIONED = ""
+_LIVENESS_S = 0.5  # how often the collector checks that the shard processes are alive
+
+def _point(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+class ConsistentHashRing:
+    """
+    Consistent-hash ring mapping session ids to worker names.
+
+    Each worker owns `vnodes` points on a 64-bit ring and a key belongs to the
+    first point at or after its hash. Adding a worker only moves the keys it
+    takes over (about 1/n of them) and removing one only moves its own keys.
+    Picklable, so workers can evaluate a new ring themselves during hand-over.
+    """
+
+    def __init__(self, workers: Optional[List[str]] = None, vnodes: int = 64):
+        self.vnodes = int(vnodes)
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        for w in workers or []:
+            self.add(w)
+
+    @property
+    def workers(self) -> List[str]:
+        return sorted(set(self._owners))
+
+    def add(self, worker: str):
+        if worker in self._owners:
+            return
+        for i in range(self.vnodes):
+            p = _point(f"{worker}#{i}")
+            k = bisect.bisect_left(self._points, p)
+            self._points.insert(k, p)
+            self._owners.insert(k, worker)
+
+    def remove(self, worker: str):
+        keep = [(p, w) for p, w in zip(self._points, self._owners) if w != worker]
+        self._points = [p for p, _ in keep]
+        self._owners = [w for _, w in keep]
+
+    def copy(self) -> "ConsistentHashRing":
+        ring = ConsistentHashRing(vnodes=self.vnodes)
+        ring._points, ring._owners = list(self._points), list(self._owners)
+        return ring
+
+    def owner(self, session_id: Optional[str]) -> str:
+        if not self._points:
+            raise ValueError("hash ring has no workers")
+        k = bisect.bisect_left(self._points, _point(session_id or _UNSESSIONED))
+        return self._owners[k % len(self._owners)]
+
+def _handover(orch, name: str, ring: ConsistentHashRing) -> Dict[Optional[str], Dict[str, Any]]:
+    """
+    Release the escalation state this shard no longer owns under `ring`.
+    """
+    states: Dict[Optional[str], Dict[str, Any]] = {}
+    for sid in orch.sessions.session_ids():
+        if ring.owner(sid) != name:
+            state = orch.sessions.pop_state(sid)
+            if state is not None:
+                states[sid] = state
+    if ring.owner(None) != name and orch.escalation.history:
+        states[None] = orch.escalation.to_state()
+        orch.escalation.load_state({})
+    return states
+
+def _shard_worker(name: str, configs: Dict[str, Any], model_dir: Optional[str], max_batch_size: int, inbox, outbox):
+    """
+    Shard process: one orchestrator serving the sessions the ring assigns to `name`.
+
+    Queued request batches are coalesced (FIFO, up to max_batch_size messages)
+    into one scoring call; commands are executed in queue order, so a hand-over
+    only runs after every batch dispatched before it.
+    """
+    from src.orchestrator.inference_pipeline import InferenceOrchestrator
+
+    try:
+        orch = InferenceOrchestrator(configs)
+        if model_dir:
+            orch.load_models_from_disk(model_dir)
+        else:
+            orch.load_or_fit_minimal()
+    except Exception as e:
+        outbox.put(("error", name, [0], f"shard failed to start: {e}"))
+        return
+    outbox.put(("ok", name, [0], None))
+    held = None
+    while True:
+        msg = held if held is not None else inbox.get()
+        held = None
+        kind = msg[0]
+        if kind == "batch":
+            items = [msg]
+            while sum(len(i[2]) for i in items) < max_batch_size:
+                try:
+                    nxt = inbox.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt[0] != "batch":
+                    held = nxt
+                    break
+                items.append(nxt)
+            req_ids = [i[1] for i in items]
+            try:
+                batch = orch.infer_compact(
+                    [t for i in items for t in i[2]],
+                    [a for i in items for a in i[3]],
+                    session_ids=[s for i in items for s in i[4]],
+                    timestamps=[ts for i in items for ts in i[5]],
+                )
+                outbox.put(("batch", name, req_ids, batch))
+            except Exception as e:
+                outbox.put(("error", name, req_ids, f"{type(e).__name__}: {e}"))
+            continue
+        req_id = msg[1]
+        try:
+            if kind == "handover":
+                outbox.put(("ok", name, [req_id], _handover(orch, name, msg[2])))
+            elif kind == "import":
+                for sid, state in msg[2].items():
+                    if sid is None:
+                        orch.escalation.load_state(state)
+                    else:
+                        orch.sessions.import_state(sid, state)
+                outbox.put(("ok", name, [req_id], len(msg[2])))
+            elif kind == "stats":
+                outbox.put(("ok", name, [req_id], {"sessions": len(orch.sessions.session_ids())}))
+            elif kind == "metrics":
+                outbox.put(("ok", name, [req_id], orch.metrics_snapshot()))
+            elif kind == "close":
+                orch.close()
+                outbox.put(("ok", name, [req_id], None))
+                return
+        except Exception as e:
+            outbox.put(("error", name, [req_id], f"{type(e).__name__}: {e}"))
+
+class ShardedInference:
+    """
+    Session-affine sharding of inference traffic across worker processes.
+
+    Each shard is a process with its own InferenceOrchestrator. Session ids
+    are mapped to shards with a consistent-hash ring, so a session's
+    escalation state lives on exactly one shard and its messages are scored
+    there in the order they were dispatched; messages without a session are
+    pinned to one shard (they share a tracker). `infer_batch` splits a request
+    by owner, sends every shard its part through that shard's FIFO queue and
+    reassembles the results in input order, so it is a drop-in for the
+    orchestrator in bulk scoring (iter_bulk) and streaming serving. Shards
+    coalesce queued parts of concurrent requests into one scoring call of up
+    to max_batch_size messages, which keeps batches large when a request is
+    split n ways.
+
+    Adding or removing a shard moves only the sessions whose owner changes;
+    their state is handed over from the old owner after the work already
+    queued for it, and installed on the new owner before any new traffic.
+    A shard whose process dies fails its pending requests at once and is
+    dropped from the ring; its sessions are re-homed to their new owners,
+    where their escalation state starts over unless sessions are persisted.
+    Near-duplicate caches and monitors are per shard.
+    Config keys: runtime.yaml -> sharding
+    """
+
+    def __init__(self, configs: Dict[str, Any], model_dir: Optional[str] = None, workers: Optional[int] = None):
+        cfg = configs.get("runtime", {}).get("sharding", {})
+        self.configs = configs
+        self.model_dir = model_dir if model_dir is not None else cfg.get("model_dir")
+        self.max_batch_size = int(cfg.get("max_batch_size", 256))
+        self.timeout_s = float(cfg.get("timeout_s", 120.0))
+        self.ring = ConsistentHashRing(vnodes=int(cfg.get("vnodes", 64)))
+        self._ctx = mp.get_context("spawn")
+        self._outbox = self._ctx.Queue()
+        self._inboxes: Dict[str, Any] = {}
+        self._procs: Dict[str, Any] = {}
+        self._futures: Dict[Tuple[int, str], Future] = {}
+        self._futures_lock = threading.Lock()
+        self._dead: set = set()
+        self._dispatch_lock = threading.Lock()
+        self._req_ids = itertools.count(1)
+        self._names = itertools.count()
+        self._load: Dict[str, Dict[str, int]] = {}
+        self.sessions_moved = 0
+        self._closed = False
+        self._collector = threading.Thread(target=self._collect, name="shard-collector", daemon=True)
+        self._collector.start()
+        for _ in range(int(workers if workers is not None else cfg.get("workers", 2))):
+            self.add_worker()
+
+    def _collect(self):
+        checked = time.monotonic()
+        while True:
+            try:
+                msg = self._outbox.get(timeout=_LIVENESS_S)
+            except queue.Empty:
+                msg = None
+            if msg is not None:
+                if msg[0] == "stop":
+                    return
+                self._deliver(*msg)
+            if time.monotonic() - checked < _LIVENESS_S:
+                continue
+            checked = time.monotonic()
+            dead = [(n, p.exitcode) for n, p in list(self._procs.items()) if p.exitcode is not None and n not in self._dead]
+            if not dead:
+                continue
+            # A shard flushes its replies before it exits: deliver them before failing the rest
+            while True:
+                try:
+                    msg = self._outbox.get_nowait()
+                except queue.Empty:
+                    break
+                if msg[0] == "stop":
+                    return
+                self._deliver(*msg)
+            for name, exitcode in dead:
+                self._retire(name, exitcode)
+
+    def _deliver(self, kind: str, name: str, req_ids: List[int], payload: Any):
+        if kind == "batch" and name in self._load:
+            self._load[name]["worker_batches"] += 1
+        offset = 0
+        for req_id in req_ids:
+            with self._futures_lock:
+                fut = self._futures.pop((req_id, name), None)
+            if fut is None:
+                continue
+            if kind == "error":
+                fut.set_exception(RuntimeError(f"{name}: {payload}"))
+            elif kind == "batch":
+                n = fut.size
+                fut.set_result((payload, offset, offset + n))
+                offset += n
+            else:
+                fut.set_result(payload)
+
+    def _retire(self, name: str, exitcode: int):
+        """
+        Fail everything pending on a dead shard and drop it from the ring.
+        """
+        error = RuntimeError(f"{name}: shard process died (exit code {exitcode})")
+        with self._futures_lock:
+            self._dead.add(name)
+            pending = [self._futures.pop(k) for k in [k for k in self._futures if k[1] == name]]
+        for fut in pending:
+            fut.set_exception(error)
+        logger.warning(f"⚠️ Shard {name} died (exit code {exitcode}); failed {len(pending)} pending requests")
+        # Off the collector thread: dispatchers holding the lock may be waiting on replies it delivers
+        threading.Thread(target=self._drop, args=(name,), name="shard-drop", daemon=True).start()
+
+    def _drop(self, name: str):
+        with self._dispatch_lock:
+            if self._closed or self._procs.pop(name, None) is None:
+                return
+            self._inboxes.pop(name, None)
+            self._load.pop(name, None)
+            ring = self.ring.copy()
+            ring.remove(name)
+            self.ring = ring
+            if ring.workers:
+                logger.warning(f"⚠️ Sessions of shard {name} re-homed to {len(ring.workers)} remaining shards")
+            else:
+                logger.error(f"❌ Shard {name} was the last shard; add_worker() before scoring again")
+
+    def _send(self, name: str, msg: tuple, size: int = 0) -> Future:
+        fut: Future = Future()
+        fut.size = size
+        with self._futures_lock:
+            if name in self._dead:
+                fut.set_exception(RuntimeError(f"{name}: shard process died"))
+                return fut
+            self._futures[(msg[1], name)] = fut
+        self._inboxes[name].put(msg)
+        return fut
+
+    def _call(self, name: str, kind: str, payload: Any = None) -> Any:
+        return self._send(name, (kind, next(self._req_ids), payload)).result(self.timeout_s)
+
+    def _start(self, name: str):
+        inbox = self._ctx.Queue()
+        self._inboxes[name] = inbox
+        self._load[name] = {"messages": 0, "requests": 0, "worker_batches": 0, "in_flight": 0}
+        fut: Future = Future()
+        with self._futures_lock:
+            self._futures[(0, name)] = fut
+        proc = self._ctx.Process(
+            target=_shard_worker,
+            args=(name, self.configs, self.model_dir, self.max_batch_size, inbox, self._outbox),
+            name=name,
+            daemon=True,
+        )
+        proc.start()
+        self._procs[name] = proc
+        try:
+            fut.result(self.timeout_s)
+        except Exception:
+            self._stop(name)
+            raise
+
+    def _stop(self, name: str):
+        proc = self._procs.pop(name, None)
+        if proc is not None and proc.is_alive():
+            try:
+                self._call(name, "close")
+            except Exception as e:
+                logger.warning(f"⚠️ Shard {name} did not close cleanly: {e}")
+            proc.join(self.timeout_s)
+            if proc.is_alive():
+                proc.terminate()
+        self._inboxes.pop(name, None)
+        self._load.pop(name, None)
+
+    def _rebalance(self, ring: ConsistentHashRing, sources: List[str]):
+        """
+        Move escalation state from `sources` to its owners under `ring`, then switch to it.
+        """
+        moved: Dict[str, Dict[Optional[str], Dict[str, Any]]] = {}
+        for name in sources:
+            for sid, state in self._call(name, "handover", ring).items():
+                moved.setdefault(ring.owner(sid), {})[sid] = state
+        for name, states in moved.items():
+            self._call(name, "import", states)
+            self.sessions_moved += len(states)
+        self.ring = ring
+
+    def _live_workers(self) -> List[str]:
+        return [w for w in self.ring.workers if w not in self._dead]
+
+    def add_worker(self) -> str:
+        """
+        Start a shard and move the sessions it now owns onto it.
+
+        Returns:
+            Name of the new shard
+        """
+        with self._dispatch_lock:
+            name = f"shard-{next(self._names)}"
+            self._start(name)
+            ring = self.ring.copy()
+            for dead in self._dead:
+                ring.remove(dead)
+            ring.add(name)
+            self._rebalance(ring, [w for w in self.ring.workers if w not in self._dead])
+            logger.info(f"✅ Shard {name} added ({len(ring.workers)} shards)")
+            return name
+
+    def remove_worker(self, name: str):
+        """
+        Hand the sessions of a shard over to their new owners and stop it.
+        """
+        with self._dispatch_lock:
+            if name not in self._procs or name not in self.ring.workers:
+                raise KeyError(name)
+            if len(self._procs) == 1:
+                raise ValueError("cannot remove the last shard")
+            ring = self.ring.copy()
+            ring.remove(name)
+            self._rebalance(ring, [name])
+            self._stop(name)
+            logger.info(f"✅ Shard {name} removed ({len(ring.workers)} shards)")
+
+    def infer(self, text: str, age_group: str = "13+", session_id: Optional[str] = None, timestamp: Optional[float] = None) -> Dict[str, Any]:
+        return self.infer_batch([text], [age_group], [session_id], [timestamp])[0]
+
+    def infer_batch(
+        self,
+        texts: List[str],
+        age_groups: List[str],
+        session_ids: Optional[List[Optional[str]]] = None,
+        timestamps: Optional[List[Optional[float]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Score a batch on the shards owning its sessions.
+
+        Thread-safe; concurrent callers' parts are coalesced on each shard.
+
+        Returns:
+            Result dicts in input order, as from InferenceOrchestrator.infer_batch
+        """
+        n = len(texts)
+        session_ids = list(session_ids) if session_ids is not None else [None] * n
+        timestamps = list(timestamps) if timestamps is not None else [None] * n
+        parts: Dict[str, List[int]] = {}
+        with self._dispatch_lock:
+            if self._closed:
+                raise RuntimeError("sharded inference is closed")
+            for i, sid in enumerate(session_ids):
+                parts.setdefault(self.ring.owner(sid), []).append(i)
+            req_id = next(self._req_ids)
+            futures = {}
+            for name, idx in parts.items():
+                load = self._load[name]
+                load["messages"] += len(idx)
+                load["requests"] += 1
+                load["in_flight"] += len(idx)
+                futures[name] = self._send(
+                    name,
+                    ("batch", req_id, [texts[i] for i in idx], [age_groups[i] for i in idx],
+                     [session_ids[i] for i in idx], [timestamps[i] for i in idx]),
+                    size=len(idx),
+                )
+        results: List[Optional[Dict[str, Any]]] = [None] * n
+        try:
+            for name, idx in parts.items():
+                batch, start, stop = futures[name].result(self.timeout_s)
+                for i, r in zip(idx, batch.to_dicts(range(start, stop))):
+                    results[i] = r
+        finally:
+            for name, idx in parts.items():
+                if name in self._load:
+                    self._load[name]["in_flight"] -= len(idx)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Load per shard: messages and requests dispatched, coalesced scoring calls,
+        messages queued or in flight, and resident sessions.
+        """
+        with self._dispatch_lock:
+            shards = {}
+            for name in self._live_workers():
+                load = dict(self._load[name])
+                load["mean_batch"] = load["messages"] / load["worker_batches"] if load["worker_batches"] else None
+                load["sessions"] = self._call(name, "stats")["sessions"]
+                shards[name] = load
+        total = sum(s["messages"] for s in shards.values())
+        mean = total / len(shards) if shards else 0
+        return {
+            "shards": shards,
+            "messages": total,
+            "imbalance": max(s["messages"] for s in shards.values()) / mean if mean else None,
+            "sessions_moved": self.sessions_moved,
+        }
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        """
+        Monitor metrics of every shard, keyed by shard name.
+        """
+        with self._dispatch_lock:
+            return {name: self._call(name, "metrics") for name in self._live_workers()}
+
+    def close(self):
+        """
+        Drain the shard queues, close every shard (flushing persisted sessions) and stop.
+        """
+        with self._dispatch_lock:
+            if self._closed:
+                return
+            self._closed = True
+            for name in list(self._procs):
+                self._stop(name)
+            self._outbox.put(("stop", "", [], None))
+            self._collector.join(self.timeout_s)
+
+    def __enter__(self) -> "ShardedInference":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def build_inference(configs: Dict[str, Any], shards: Optional[int] = None):
+    """
+    Orchestrator for the configured deployment: ShardedInference when sharding
+    is enabled (or `shards` > 0), otherwise an in-process InferenceOrchestrator.
+
+    Args:
+        configs: Loaded configs
+        shards: Worker processes; overrides runtime.yaml -> sharding (0 = in-process)
+
+    Returns:
+        Object with the orchestrator's infer / infer_batch / metrics_snapshot / close
+    """
+    cfg = configs.get("runtime", {}).get("sharding", {})
+    if shards is None:
+        shards = int(cfg.get("workers", 2)) if cfg.get("enabled", False) else 0
+    if shards > 0:
+        return ShardedInference(configs, workers=shards)
+    from src.orchestrator.inference_pipeline import InferenceOrchestrator
+
+    return InferenceOrchestrator(configs)
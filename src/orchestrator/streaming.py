@@ -0,0 +1,220 @@
+from __future__ import annotations
+import asyncio
+import queue
+import threading
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, NamedTuple, Optional
+from src.orchestrator.inference_pipeline import InferenceOrchestrator
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class StreamEvent(NamedTuple):
+    session_id: str
+    text: str
+    age: str
+    timestamp: Optional[float] = None
+
+_END = object()
+_POLL_S = 0.05  # how often a blocked consumer or reader re-checks for cancellation
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+class StreamingInference:
+    """
+    Incremental decisions over a stream of (session_id, text, age, timestamp) events.
+
+    Events are buffered in a bounded queue and scored in opportunistic batches:
+    a batch is whatever is already waiting (up to `max_batch_size`), so an idle
+    stream is scored one event at a time and a busy one in large batches.
+    Batches are processed one after another in arrival order, which keeps
+    per-session order and escalation continuity.
+    """
+
+    def __init__(
+        self,
+        orchestrator: InferenceOrchestrator,
+        *,
+        max_batch_size: int = 64,
+        max_buffer: int = 1024,
+        max_wait_ms: float = 0.0,
+    ):
+        self.orch = orchestrator
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_buffer = max(1, int(max_buffer))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        # One stop event per running stream, so streams sharing this instance end independently
+        self._active: set = set()
+        self._lock = threading.Lock()
+        self._cancel_requested = False
+
+    def cancel(self):
+        """
+        Stop consuming input on every stream currently running on this instance;
+        each one finishes and emits its current batch. Streams started later are
+        not affected.
+        """
+        with self._lock:
+            self._cancel_requested = True
+            for stop in self._active:
+                stop.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """
+        True once `cancel()` has been called on this instance.
+        """
+        return self._cancel_requested
+
+    def _open(self) -> threading.Event:
+        stop = threading.Event()
+        with self._lock:
+            self._active.add(stop)
+        return stop
+
+    def _close(self, stop: threading.Event):
+        stop.set()
+        with self._lock:
+            self._active.discard(stop)
+
+    def _score(self, events: List[StreamEvent]) -> List[Dict[str, Any]]:
+        results = self.orch.infer_batch(
+            [e.text for e in events],
+            [e.age for e in events],
+            [e.session_id for e in events],
+            [e.timestamp for e in events],
+        )
+        for e, r in zip(events, results):
+            r["event"] = {"session_id": e.session_id, "timestamp": e.timestamp}
+        return results
+
+    def stream(self, events: Iterable[Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Score a synchronous event iterator, yielding one result per event in order.
+        A reader thread fills the bounded buffer so batching never waits on the source.
+        """
+        stop = self._open()
+        buf: queue.Queue = queue.Queue(maxsize=self.max_buffer)
+
+        def put(item) -> bool:
+            # Never block past the consumer: give up once the stream is closed or cancelled
+            while not stop.is_set():
+                try:
+                    buf.put(item, timeout=_POLL_S)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for ev in events:
+                    if stop.is_set() or not put(StreamEvent(*ev)):
+                        return
+            except BaseException as e:
+                put(_Failure(e))
+            put(_END)
+
+        reader = threading.Thread(target=produce, name="stream-reader", daemon=True)
+        reader.start()
+        try:
+            done = False
+            while not done:
+                try:
+                    item = buf.get(timeout=_POLL_S)
+                except queue.Empty:
+                    if stop.is_set():
+                        return
+                    continue
+                batch: List[StreamEvent] = []
+                while True:
+                    if item is _END:
+                        done = True
+                        break
+                    if isinstance(item, _Failure):
+                        raise item.error
+                    batch.append(item)
+                    if len(batch) >= self.max_batch_size:
+                        break
+                    try:
+                        item = buf.get(timeout=self.max_wait_s) if self.max_wait_s else buf.get_nowait()
+                    except queue.Empty:
+                        break
+                if batch:
+                    yield from self._score(batch)
+                if stop.is_set():
+                    return
+        finally:
+            self._close(stop)
+            # Drop what the reader buffered; it sees the stop event within one poll and exits
+            while not buf.empty():
+                buf.get_nowait()
+
+    async def astream(self, events: AsyncIterable[Any] | Iterable[Any]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Score a sync or async event iterator, yielding one result per event in order.
+        Scoring runs in the default executor so the event loop stays responsive.
+        Closing the generator (or cancelling its task) stops the producer.
+        """
+        stop = self._open()
+        loop = asyncio.get_running_loop()
+        buf: asyncio.Queue = asyncio.Queue(maxsize=self.max_buffer)
+
+        async def produce():
+            try:
+                if hasattr(events, "__aiter__"):
+                    async for ev in events:
+                        if stop.is_set():
+                            return
+                        await buf.put(StreamEvent(*ev))
+                else:
+                    for ev in events:
+                        if stop.is_set():
+                            return
+                        await buf.put(StreamEvent(*ev))
+            except asyncio.CancelledError:
+                raise
+            except BaseException as e:
+                await buf.put(_Failure(e))
+            await buf.put(_END)
+
+        producer = asyncio.create_task(produce())
+        try:
+            done = False
+            while not done:
+                try:
+                    item = await asyncio.wait_for(buf.get(), timeout=_POLL_S)
+                except asyncio.TimeoutError:
+                    if stop.is_set():
+                        return
+                    continue
+                batch: List[StreamEvent] = []
+                while True:
+                    if item is _END:
+                        done = True
+                        break
+                    if isinstance(item, _Failure):
+                        raise item.error
+                    batch.append(item)
+                    if len(batch) >= self.max_batch_size:
+                        break
+                    try:
+                        if self.max_wait_s:
+                            item = await asyncio.wait_for(buf.get(), timeout=self.max_wait_s)
+                        else:
+                            item = buf.get_nowait()
+                    except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                        break
+                if batch:
+                    for r in await loop.run_in_executor(None, self._score, batch):
+                        yield r
+                if stop.is_set():
+                    return
+        finally:
+            self._close(stop)
+            producer.cancel()
+            try:
+                await producer
+            except (asyncio.CancelledError, Exception):
+                pass
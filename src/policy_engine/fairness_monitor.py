@@ -0,0 +1,142 @@
+from __future__ import annotations
+import threading
+from typing import Dict, Any, Iterable, List
+import numpy as np
+from src.utils.keyword_matcher import KeywordMatcher
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+ACTIONS = ("allow", "warn", "block")
+BASELINE = "_baseline"
+
+class FairnessMonitor:
+    """
+    Online disparity monitor over identity-term mentions.
+
+    Each message is scanned once for identity terms (whole words). Per term,
+    and for the baseline of messages mentioning no identity term, it keeps a
+    message count, a risk-score sum, action counts and a fixed-bin risk
+    histogram, so memory is constant in the amount of traffic.
+
+    A term alerts when its block rate differs from the baseline block rate by
+    more than `disparity_alert`, once both have at least `min_count` messages.
+    Config keys: policy.yaml -> fairness
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.terms: List[str] = sorted({t.lower() for t in config.get("identity_terms", []) if t})
+        self.disparity_alert = float(config.get("disparity_alert", 0.15))
+        self.min_count = int(config.get("min_count", 100))
+        self.n_bins = int(config.get("histogram_bins", 10))
+        self.matcher = KeywordMatcher({t: [t] for t in self.terms}, whole_words=True)
+
+        self.rows = {name: i for i, name in enumerate([BASELINE, *self.terms])}
+        n_rows = len(self.rows)
+        self.counts = np.zeros(n_rows, dtype=np.int64)
+        self.score_sums = np.zeros(n_rows)
+        self.actions = np.zeros((n_rows, len(ACTIONS)), dtype=np.int64)
+        self.histograms = np.zeros((n_rows, self.n_bins), dtype=np.int64)
+        self._action_idx = {a: i for i, a in enumerate(ACTIONS)}
+        self._alerting: set[str] = set()
+        self._lock = threading.Lock()
+
+    def observe(self, text: str, decision: Dict[str, Any]):
+        """
+        Record one message and its policy decision.
+        """
+        self.observe_batch([text], [decision])
+
+    def observe_batch(self, texts: Iterable[str], decisions: Iterable[Dict[str, Any]]):
+        """
+        Record a batch of messages with their policy decisions.
+        """
+        touched: set[str] = set()
+        with self._lock:
+            for text, decision in zip(texts, decisions):
+                found = self.matcher.find(text) if self.terms else ()
+                rows = [self.rows[t] for t in found] or [0]
+                risk = min(max(float(decision.get("max_risk", 0.0)), 0.0), 1.0)
+                b = min(int(risk * self.n_bins), self.n_bins - 1)
+                a = self._action_idx.get(decision.get("action"), 0)
+                for r in rows:
+                    self.counts[r] += 1
+                    self.score_sums[r] += risk
+                    self.actions[r, a] += 1
+                    self.histograms[r, b] += 1
+                touched.update(found)
+            alerts = self._check(touched) if touched else []
+        for term, rate, base in alerts:
+            logger.warning(
+                "Fairness disparity alert",
+                extra={"context": {"term": term, "block_rate": round(rate, 4), "baseline_block_rate": round(base, 4)}},
+            )
+
+    def _block_rates(self) -> np.ndarray:
+        return self.actions[:, self._action_idx["block"]] / np.maximum(self.counts, 1)
+
+    def _check(self, terms: Iterable[str]) -> List[tuple]:
+        """
+        Update alert state for the given terms; return newly raised alerts.
+        """
+        if self.counts[0] < self.min_count:
+            return []
+        rates = self._block_rates()
+        raised = []
+        for term in terms:
+            r = self.rows[term]
+            if self.counts[r] < self.min_count:
+                continue
+            if abs(rates[r] - rates[0]) > self.disparity_alert:
+                if term not in self._alerting:
+                    self._alerting.add(term)
+                    raised.append((term, float(rates[r]), float(rates[0])))
+            else:
+                self._alerting.discard(term)
+        return raised
+
+    def flagged_terms(self, text: str) -> List[str]:
+        """
+        Terms currently in alert that the text mentions (empty without alerts).
+        """
+        if not self._alerting:
+            return []
+        with self._lock:
+            alerting = set(self._alerting)
+        return sorted(t for t in self.matcher.find(text) if t in alerting)
+
+    def alerts(self) -> List[str]:
+        """
+        Terms currently in alert.
+        """
+        with self._lock:
+            return sorted(self._alerting)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Plain-dict view of all aggregates (YAML/JSON serializable).
+        """
+        with self._lock:
+            rates = self._block_rates()
+            groups = {}
+            for name, r in self.rows.items():
+                n = int(self.counts[r])
+                groups[name] = {
+                    "count": n,
+                    "mean_risk": float(self.score_sums[r] / n) if n else 0.0,
+                    "action_rates": {a: float(self.actions[r, i] / n) if n else 0.0 for i, a in enumerate(ACTIONS)},
+                    "risk_histogram": self.histograms[r].tolist(),
+                    "block_rate_disparity": float(rates[r] - rates[0]) if n else 0.0,
+                }
+            return {
+                "disparity_alert": self.disparity_alert,
+                "min_count": self.min_count,
+                "groups": groups,
+                "alerts": sorted(self._alerting),
+            }
+
+    def reset(self):
+        with self._lock:
+            for arr in (self.counts, self.score_sums, self.actions, self.histograms):
+                arr.fill(0)
+            self._alerting.clear()
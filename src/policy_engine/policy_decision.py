@@ -20,8 +20,14 @@ class PolicyEngine:
         crisis: float,
         escalation: dict[str, float],
         content_flags: dict[str, bool],
-        crisis_labels: list[str] = None
+        crisis_labels: list[str] = None,
+        fairness_flags: list[str] = None
     ) -> dict[str, any]:
+        """
+        `fairness_flags` are the identity terms the message mentions that the
+        fairness monitor currently flags for a block-rate disparity; only then
+        is a fairness note added to the rationale.
+        """
         crisis_labels = crisis_labels or []
 
         max_risk = max([crisis, *abuse.values(), escalation["ewma"]])
@@ -38,8 +44,8 @@ class PolicyEngine:
             rationale.append("Moderate risk")
 
         # Fairness guardrails
-        if self.cfg.get("fairness", {}).get("identity_terms"):
-            rationale.append(f"Fairness guardrails active on: {self.cfg['fairness']['identity_terms']}")
+        if fairness_flags:
+            rationale.append(f"Fairness review: block-rate disparity flagged for {', '.join(fairness_flags)}")
 
         # Redaction logic
         redact = []
@@ -0,0 +1,203 @@
+from __future__ import annotations
+import os
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from scipy.signal import lfilter
+from src.models.escalation_tracker import EscalationTracker
+from src.utils.audit_log import ACTIONS, read_audit_log
+
+def load_decision_records(path: str) -> Tuple[Dict[str, Any], np.ndarray]:
+    """
+    Load stored decision records: an audit log directory or a `.npy` dump of the same layout.
+
+    Returns:
+        (meta, records) with records ordered by (ts, seq)
+    """
+    if os.path.isdir(path):
+        meta, records = read_audit_log(path)
+    else:
+        records = np.load(path, allow_pickle=False)
+        names = records.dtype.names or ()
+        meta = {
+            "abuse_labels": [n[len("abuse_"):] for n in names if n.startswith("abuse_")],
+            "content_flags": [n[len("content_"):] for n in names if n.startswith("content_")],
+            "crisis_flags": [n[len("crisis_"):] for n in names if n.startswith("crisis_") and n != "crisis_score"],
+            "actions": list(ACTIONS),
+        }
+    if len(records):
+        records = records[np.lexsort((records["seq"], records["ts"]))]
+    return meta, records
+
+def model_risk(records: np.ndarray, abuse_labels: List[str]) -> np.ndarray:
+    """
+    Per-message model risk fed to escalation: max of crisis and abuse scores.
+    """
+    risk = records["crisis_score"].astype(np.float64)
+    for lbl in abuse_labels:
+        risk = np.maximum(risk, records[f"abuse_{lbl}"])
+    return risk
+
+def replay_escalation(records: np.ndarray, risk: np.ndarray, escalation_cfg: Dict[str, Any]) -> np.ndarray:
+    """
+    Recompute the escalation EWMA per session for a candidate escalation config.
+
+    Sessions start from a fresh tracker at the beginning of the records; messages
+    without a session id share one tracker, as in the orchestrator. In per-message
+    mode the EWMA of all sessions is computed with one linear filter over the
+    session-sorted scores, removing the carry-over across session boundaries;
+    time-decayed mode (half_life_s) replays each session with an EscalationTracker.
+
+    Returns:
+        EWMA after each message, in record order
+    """
+    cfg = {k: v for k, v in escalation_cfg.items() if k != "persistence"}
+    alpha = float(cfg.get("ewma_alpha", 0.3))
+    r = np.maximum(risk, float(cfg.get("risk_floor", 0.05)))
+    order = np.argsort(records["session_id"], kind="stable")
+    sids = records["session_id"][order]
+    starts = np.flatnonzero(np.r_[True, sids[1:] != sids[:-1]])
+    out = np.empty(len(records))
+
+    if cfg.get("half_life_s") is not None:
+        ts = records["ts"][order]
+        bounds = np.r_[starts, len(order)]
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            tracker = EscalationTracker(**cfg)
+            out[order[a:b]] = [tracker.update(x, t)["ewma"] for x, t in zip(r[order[a:b]], ts[a:b])]
+        return out
+
+    y = lfilter([alpha], [1.0, -(1.0 - alpha)], r[order])
+    # y_t includes (1-alpha)^(t-start+1) * y_{start-1} carried over from the previous session
+    group = np.repeat(np.arange(starts.size), np.diff(np.r_[starts, len(order)]))
+    pos = np.arange(len(order)) - starts[group]
+    carry = np.where(starts > 0, y[np.maximum(starts - 1, 0)], 0.0)
+    out[order] = y - carry[group] * (1.0 - alpha) ** (pos + 1)
+    return out
+
+def replay_policy(
+    records: np.ndarray,
+    meta: Dict[str, Any],
+    policy_cfg: Dict[str, Any],
+    ewma: Optional[np.ndarray] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Vectorized equivalent of `PolicyEngine.decide` over stored records.
+
+    Args:
+        records: Decision records (audit layout)
+        meta: Record metadata (label and flag names)
+        policy_cfg: Policy config to apply
+        ewma: Optional replayed escalation EWMA (defaults to the stored values)
+
+    Returns:
+        Dict of arrays: action (codes into ACTIONS), route_to_human, max_risk, redact (n, n_redact_labels)
+    """
+    abuse_labels = meta["abuse_labels"]
+    exited = records["cascade_exited"]
+    ewma = records["escalation_ewma"].astype(np.float64) if ewma is None else ewma
+    max_risk = np.maximum(model_risk(records, abuse_labels), ewma)
+
+    actions = policy_cfg["actions"]
+    action = np.zeros(len(records), dtype=np.uint8)
+    action[max_risk >= actions["allow_max_risk"]] = ACTIONS.index("warn")
+    action[max_risk >= actions["warn_max_risk"]] = ACTIONS.index("block")
+
+    # Crisis label: classifier score against the (candidate) threshold; early exits carry no crisis labels
+    crisis_thr = float(policy_cfg.get("thresholds", {}).get("crisis", 0.5))
+    crisis_label = (records["crisis_score"] >= crisis_thr) & ~exited
+
+    def crisis_flag(name: str) -> np.ndarray:
+        if name == "crisis":
+            return crisis_label
+        if name in meta["crisis_flags"]:
+            return records[f"crisis_{name}"] & ~exited
+        return np.zeros(len(records), dtype=bool)
+
+    redact_labels = actions.get("redact_labels", [])
+    redact = np.zeros((len(records), len(redact_labels)), dtype=bool)
+    for j, label in enumerate(redact_labels):
+        hit = crisis_flag(label)
+        if label in abuse_labels:
+            hit = hit | ~exited  # abuse labels are present in every fully scored result
+        if label in meta["content_flags"]:
+            hit = hit | records[f"content_{label}"]
+        redact[:, j] = hit
+
+    routing = policy_cfg.get("routing", {})
+    route = np.zeros(len(records), dtype=bool)
+    if routing.get("route_to_human_if_crisis"):
+        route |= crisis_label
+    if routing.get("route_if_blocked"):
+        route |= action == ACTIONS.index("block")
+    return {"action": action, "route_to_human": route, "max_risk": max_risk, "redact": redact}
+
+def _distribution(action: np.ndarray) -> Dict[str, int]:
+    counts = np.bincount(action, minlength=len(ACTIONS))
+    return {a: int(counts[i]) for i, a in enumerate(ACTIONS)}
+
+def compare_policies(
+    records: np.ndarray,
+    meta: Dict[str, Any],
+    current: Dict[str, Any],
+    candidate: Dict[str, Any],
+    *,
+    current_escalation: Optional[Dict[str, Any]] = None,
+    candidate_escalation: Optional[Dict[str, Any]] = None,
+    max_changed: int = 100,
+) -> Tuple[Dict[str, Any], np.ndarray]:
+    """
+    Replay two policy configs over the same records and summarize the differences.
+
+    Escalation uses the stored EWMA unless an escalation config is given for that side.
+
+    Returns:
+        (report dict, indices of records whose action or routing changed)
+    """
+    risk = model_risk(records, meta["abuse_labels"])
+    ewma_cur = replay_escalation(records, risk, current_escalation) if current_escalation else None
+    ewma_new = replay_escalation(records, risk, candidate_escalation) if candidate_escalation else None
+    cur = replay_policy(records, meta, current, ewma_cur)
+    new = replay_policy(records, meta, candidate, ewma_new)
+
+    n = len(records)
+    changed = np.flatnonzero((cur["action"] != new["action"]) | (cur["route_to_human"] != new["route_to_human"]))
+    transitions = np.zeros((len(ACTIONS), len(ACTIONS)), dtype=np.int64)
+    np.add.at(transitions, (cur["action"], new["action"]), 1)
+    dist_cur, dist_new = _distribution(cur["action"]), _distribution(new["action"])
+    stored_action = records["action"]
+
+    report = {
+        "records": n,
+        "actions": {
+            "current": dist_cur,
+            "candidate": dist_new,
+            "delta": {a: dist_new[a] - dist_cur[a] for a in ACTIONS},
+            "candidate_rate": {a: dist_new[a] / n if n else 0.0 for a in ACTIONS},
+        },
+        "route_to_human": {
+            "current": int(cur["route_to_human"].sum()),
+            "candidate": int(new["route_to_human"].sum()),
+            "delta": int(new["route_to_human"].sum() - cur["route_to_human"].sum()),
+        },
+        "transitions": {
+            f"{a}->{b}": int(transitions[i, j])
+            for i, a in enumerate(ACTIONS) for j, b in enumerate(ACTIONS) if i != j and transitions[i, j]
+        },
+        "changed": int(changed.size),
+        # Sanity check: replaying the current policy should reproduce what was logged
+        "current_vs_logged_mismatch": int((cur["action"] != stored_action).sum()) if current_escalation is None else None,
+        "changed_examples": [
+            {
+                "seq": int(records["seq"][i]),
+                "ts": float(records["ts"][i]),
+                "session_id": records["session_id"][i].decode("utf-8", "replace"),
+                "text_sha1": records["text_sha1"][i].tobytes().hex(),
+                "from": ACTIONS[cur["action"][i]],
+                "to": ACTIONS[new["action"][i]],
+                "route_to_human": [bool(cur["route_to_human"][i]), bool(new["route_to_human"][i])],
+                "max_risk": [round(float(cur["max_risk"][i]), 4), round(float(new["max_risk"][i]), 4)],
+            }
+            for i in changed[:max_changed]
+        ],
+    }
+    return report, changed
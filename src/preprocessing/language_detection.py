@@ -8,10 +8,13 @@ logger = get_logger(__name__)
 
 SUPPORTED_LANGUAGES = {"en", "hi"}
 
-def detect_language(text: str) -> Tuple[str, float]:
+def detect_language(text: str, keep_unsupported: bool = False) -> Tuple[str, float]:
     """
     Detect language of input text.
 
+    Unsupported languages are reported as "en" unless `keep_unsupported` is set
+    (e.g. when a router maps them to model sets through a fallback chain).
+
     Returns:
         (language_code, confidence_score)
         Confidence is approximated since langdetect doesn't expose it directly.
@@ -23,7 +26,7 @@ def detect_language(text: str) -> Tuple[str, float]:
     try:
         code = detect(text)
         confidence = 1.0 if code in SUPPORTED_LANGUAGES else 0.5
-        return (code if code in SUPPORTED_LANGUAGES else "en", confidence)
+        return (code if code in SUPPORTED_LANGUAGES or keep_unsupported else "en", confidence)
     except Exception as e:
         logger.warning("Language detection failed", extra={"context": {"error": str(e), "text": text}})
         return ("en", 0.0)
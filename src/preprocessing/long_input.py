@@ -0,0 +1,89 @@
+from __future__ import annotations
+from typing import Dict, Any, List, Tuple
+import numpy as np
+
+def window_spans(
+    n_chars: int,
+    *,
+    window_chars: int = 1000,
+    overlap_chars: int = 200,
+    max_windows: int = 16
+) -> List[Tuple[int, int]]:
+    """
+    Compute overlapping (start, end) character windows covering a text.
+
+    When more than `max_windows` windows would be needed, an evenly spaced
+    subset is kept (always including the first and last window), so the work
+    per message is bounded by max_windows * window_chars characters.
+
+    Args:
+        n_chars: Length of the text
+        window_chars: Window length in characters
+        overlap_chars: Overlap between consecutive windows
+        max_windows: Hard cap on the number of windows
+
+    Returns:
+        List of (start, end) spans in text order
+    """
+    window_chars = max(1, int(window_chars))
+    step = max(1, window_chars - max(0, int(overlap_chars)))
+    if n_chars <= window_chars:
+        return [(0, n_chars)]
+    starts = list(range(0, n_chars - window_chars, step)) + [n_chars - window_chars]
+    if len(starts) > max_windows:
+        picks = np.unique(np.linspace(0, len(starts) - 1, max(1, int(max_windows))).round().astype(int))
+        starts = [starts[i] for i in picks]
+    return [(s, s + window_chars) for s in starts]
+
+def split_windows(text: str, **kwargs) -> List[str]:
+    """
+    Split text into the windows returned by `window_spans`.
+    """
+    return [text[s:e] for s, e in window_spans(len(text), **kwargs)]
+
+def language_sample(text: str, sample_chars: int = 500) -> str:
+    """
+    Take a bounded sample for language detection: the head and the middle of the text.
+    """
+    if len(text) <= sample_chars:
+        return text
+    half = max(1, sample_chars // 2)
+    mid = len(text) // 2
+    return f"{text[:half]} {text[mid:mid + half]}"
+
+def pool_scores(scores: np.ndarray, method: str = "max", temperature: float = 0.1) -> np.ndarray:
+    """
+    Aggregate per-window scores of shape (n_windows, n_labels) into one row.
+
+    Methods:
+        max: the riskiest window decides
+        lse: temperature-scaled log-mean-exp, a smooth maximum that lies between
+             the mean (high temperature) and the max (temperature -> 0)
+
+    Returns:
+        Pooled scores of shape (n_labels,)
+    """
+    s = np.atleast_2d(np.asarray(scores, dtype=np.float64))
+    if s.shape[0] == 1 or method == "max":
+        return s.max(axis=0)
+    if method == "lse":
+        t = max(float(temperature), 1e-6)
+        m = s.max(axis=0)
+        return m + t * np.log(np.exp((s - m) / t).mean(axis=0))
+    raise ValueError(f"Unknown pooling method: {method}")
+
+def long_input_settings(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Resolve long-input settings with defaults.
+    Config keys: preprocessing.yaml -> long_input
+    """
+    return {
+        "enabled": bool(config.get("enabled", True)),
+        "max_chars": int(config.get("max_chars", 2000)),
+        "window_chars": int(config.get("window_chars", 1000)),
+        "overlap_chars": int(config.get("overlap_chars", 200)),
+        "max_windows": int(config.get("max_windows", 16)),
+        "pooling": config.get("pooling", "max"),
+        "temperature": float(config.get("temperature", 0.1)),
+        "language_sample_chars": int(config.get("language_sample_chars", 500)),
+    }
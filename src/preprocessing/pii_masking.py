@@ -1,16 +1,269 @@
 import re
+import ipaddress
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
 
-# Regex patterns for PII
+# Legacy regex patterns, kept for compatibility and benchmarking (scripts/benchmark_pii.py).
+# PHONE_RE backtracks quadratically on long digit/separator runs.
 EMAIL_RE = re.compile(r"\b[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}\b")
 PHONE_RE = re.compile(r"\b(\+?\d{1,3}[-.\s]?)?(\(?\d{3,5}\)?[-.\s]?)?\d{3,5}[-.\s]?\d{3,5}\b")
 
+# Single-pass scanner. Every branch may only start at the beginning of a run of
+# the characters it consumes (negative lookbehind) and uses possessive quantifiers,
+# so each character is examined a bounded number of times: no catastrophic backtracking.
+PII_SCAN_RE = re.compile(
+    r"(?P<url>(?<![A-Za-z0-9+.\-])[A-Za-z][A-Za-z0-9+.\-]*+://[^\s/?#@]++@\S*+)"
+    r"|(?P<email>(?<![A-Za-z0-9._%+\-])[A-Za-z0-9._%+\-]++@[A-Za-z0-9\-]++(?:\.[A-Za-z0-9\-]++)++)"
+    r"|(?P<ipv6>(?<![0-9A-Fa-f:])(?:[0-9A-Fa-f]{0,4}+:){2,7}+[0-9A-Fa-f]{1,4}+(?![0-9A-Fa-f:]))"
+    r"|(?P<digits>(?<![\w+(])\+?+\(?+\d(?:[ .\-()]{0,2}+\d)*+\)?+)"
+)
+_TRIGGER_RE = re.compile(r"[\d@:]")  # every entity contains one of these
+_IPV4_SHAPE_RE = re.compile(r"\d{1,3}+(?:\.\d{1,3}+){3}+")
+_DATE_SHAPE_RE = re.compile(r"\d{4}([-./])\d{1,2}\1\d{1,2}|\d{1,2}([-./])\d{1,2}\2\d{2,4}")
+
+_URL_TRAILING = frozenset(".,;:!?)]}'\"")
+
+PII_KINDS = ("email", "phone", "credit_card", "ip", "url_userinfo")  # span kinds scan_pii reports
+PHONE_DIGITS = (7, 15)
+CARD_DIGITS = (13, 19)
+# Longest entity masked in full when it crosses the edge of a scanned region
+# (email addresses are at most 254 characters)
+PII_MAX_CHARS = 256
+
+class PIISpan(NamedTuple):
+    start: int
+    end: int
+    kind: str
+
+def luhn_valid(digits: str) -> bool:
+    """
+    Luhn checksum used by payment card numbers.
+    """
+    total = 0
+    for i, ch in enumerate(reversed(digits)):
+        d = ord(ch) - 48
+        if i % 2 == 1:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return total % 10 == 0
+
+def _digits_kind(chunk: str) -> str | None:
+    digits = "".join(ch for ch in chunk if ch.isdigit())
+    if CARD_DIGITS[0] <= len(digits) <= CARD_DIGITS[1] and luhn_valid(digits):
+        return "credit_card"
+    if PHONE_DIGITS[0] <= len(digits) <= PHONE_DIGITS[1]:
+        return "phone"
+    return None
+
+def _classify_digits(text: str, start: int, end: int) -> List[PIISpan]:
+    """
+    Classify a digit/separator run as an IPv4 address, card or phone number.
+    Runs too long for one entity are split at whitespace and re-grouped greedily.
+    """
+    chunk = text[start:end]
+    if _IPV4_SHAPE_RE.fullmatch(chunk):
+        try:
+            ipaddress.IPv4Address(chunk)
+            return [PIISpan(start, end, "ip")]
+        except ValueError:
+            return []
+    if _DATE_SHAPE_RE.fullmatch(chunk):
+        return []
+    kind = _digits_kind(chunk)
+    if kind:
+        return [PIISpan(start, end, kind)]
+
+    # Split into whitespace-separated groups and take the longest valid prefix from each group
+    groups = [(start + m.start(), start + m.end()) for m in re.finditer(r"\S++", chunk)]
+    counts = [sum(ch.isdigit() for ch in text[a:b]) for a, b in groups]
+    spans: List[PIISpan] = []
+    i = 0
+    while i < len(groups):
+        best = None
+        n_digits = 0
+        for j in range(i, len(groups)):
+            n_digits += counts[j]
+            if n_digits > CARD_DIGITS[1]:
+                break
+            if n_digits >= PHONE_DIGITS[0]:
+                kind = _digits_kind(text[groups[i][0]:groups[j][1]])
+                if kind:
+                    best = (j, kind)
+        if best is None:
+            i += 1
+            continue
+        j, kind = best
+        spans.append(PIISpan(groups[i][0], groups[j][1], kind))
+        i = j + 1
+    return spans
+
+def scan_pii(text: str, kinds: Optional[Iterable[str]] = None, start: int = 0, end: Optional[int] = None) -> List[PIISpan]:
+    """
+    Find PII entities in one pass over the text.
+
+    Detects emails, phone numbers, Luhn-valid credit card numbers, IPv4/IPv6
+    addresses and URLs carrying user info (user:password@host).
+
+    Args:
+        text: Input string
+        kinds: Kinds to report, from PII_KINDS (default: all)
+        start: Scan only from this offset (the characters before it still
+            decide where an entity may begin)
+        end: Scan only up to this offset (default: end of text)
+
+    Returns:
+        Non-overlapping spans in text order, with offsets into `text`
+    """
+    wanted = None if kinds is None else frozenset(kinds)
+    if wanted is not None and not wanted <= set(PII_KINDS):
+        raise ValueError(f"Unknown PII kinds {sorted(wanted - set(PII_KINDS))}; expected a subset of {list(PII_KINDS)}")
+    end = len(text) if end is None else end
+    if not text or wanted is not None and not wanted or not _TRIGGER_RE.search(text, start, end):
+        return []
+    spans: List[PIISpan] = []
+    for m in PII_SCAN_RE.finditer(text, start, end):
+        kind = m.lastgroup
+        if kind == "digits":
+            spans.extend(_classify_digits(text, m.start(), m.end()))
+        elif kind == "ipv6":
+            try:
+                ipaddress.IPv6Address(m.group())
+                spans.append(PIISpan(m.start(), m.end(), "ip"))
+            except ValueError:
+                pass
+        elif kind == "email":
+            tld = m.group().rsplit(".", 1)[-1]
+            if len(tld) >= 2 and tld.isalpha():
+                spans.append(PIISpan(m.start(), m.end(), "email"))
+        else:
+            end = m.end()
+            while text[end - 1] in _URL_TRAILING:
+                end -= 1
+            spans.append(PIISpan(m.start(), end, "url_userinfo"))
+    # Filtered after classification: a card number is never reported as a phone
+    return spans if wanted is None else [sp for sp in spans if sp.kind in wanted]
+
+def _apply_masks(text: str, spans: Iterable[PIISpan], tokens: Dict[str, str]) -> str:
+    out: List[str] = []
+    pos = 0
+    for sp in spans:
+        token = tokens.get(sp.kind)
+        if token is None:
+            continue
+        out.append(text[pos:sp.start])
+        out.append(token)
+        pos = sp.end
+    out.append(text[pos:])
+    return "".join(out)
+
+def mask_pii_spans(
+    text: str,
+    *,
+    mask_email: bool = True,
+    mask_phone: bool = True,
+    mask_credit_card: bool = True,
+    mask_ip: bool = True,
+    mask_url_userinfo: bool = True,
+    email_token: str = "<EMAIL>",
+    phone_token: str = "<PHONE>",
+    credit_card_token: str = "<CARD>",
+    ip_token: str = "<IP>",
+    url_token: str = "<URL>",
+    mask_name: bool = False,
+) -> Tuple[str, List[PIISpan]]:
+    """
+    Mask PII and return the masked text with the masked spans (offsets into the input).
+
+    `mask_name` is accepted for config compatibility; name masking needs an NER
+    model and is not performed.
+    """
+    if not text:
+        return "", []
+    tokens = _mask_tokens(
+        mask_email=mask_email, mask_phone=mask_phone, mask_credit_card=mask_credit_card, mask_ip=mask_ip,
+        mask_url_userinfo=mask_url_userinfo, email_token=email_token, phone_token=phone_token,
+        credit_card_token=credit_card_token, ip_token=ip_token, url_token=url_token,
+    )
+    spans = scan_pii(text, tokens)
+    return _apply_masks(text, spans, tokens), spans
+
+def _mask_tokens(
+    *,
+    mask_email: bool = True,
+    mask_phone: bool = True,
+    mask_credit_card: bool = True,
+    mask_ip: bool = True,
+    mask_url_userinfo: bool = True,
+    email_token: str = "<EMAIL>",
+    phone_token: str = "<PHONE>",
+    credit_card_token: str = "<CARD>",
+    ip_token: str = "<IP>",
+    url_token: str = "<URL>",
+    mask_name: bool = False,
+) -> Dict[str, str]:
+    tokens = {}
+    if mask_email:
+        tokens["email"] = email_token
+    if mask_phone:
+        tokens["phone"] = phone_token
+    if mask_credit_card:
+        tokens["credit_card"] = credit_card_token
+    if mask_ip:
+        tokens["ip"] = ip_token
+    if mask_url_userinfo:
+        tokens["url_userinfo"] = url_token
+    return tokens
+
+def mask_pii_windows(text: str, windows: List[Tuple[int, int]], *, margin: int = PII_MAX_CHARS, **kwargs) -> List[str]:
+    """
+    Masked text of each (start, end) window of a long text.
+
+    Only the windows, each widened by `margin` characters on both sides, are
+    scanned, so the work is bounded by the windows rather than the text length;
+    an entity of up to `margin` characters that crosses a window edge is still
+    found whole and its part inside the window is replaced by the token.
+
+    Args:
+        text: Input string
+        windows: (start, end) spans in text order, as from `window_spans`
+        margin: Context scanned around each window
+        **kwargs: Entity switches and tokens accepted by `mask_pii_spans`
+
+    Returns:
+        One masked string per window
+    """
+    tokens = _mask_tokens(**kwargs)
+    regions: List[List[int]] = []
+    for s, e in windows:
+        a, b = max(0, s - margin), min(len(text), e + margin)
+        if regions and a <= regions[-1][1]:
+            regions[-1][1] = max(regions[-1][1], b)
+        else:
+            regions.append([a, b])
+    spans = [sp for a, b in regions for sp in scan_pii(text, tokens, a, b)]
+    out: List[str] = []
+    for s, e in windows:
+        parts: List[str] = []
+        pos = s
+        for sp in spans:
+            if sp.end <= s or sp.start >= e:
+                continue
+            parts.append(text[pos:max(pos, sp.start)])
+            parts.append(tokens[sp.kind])
+            pos = min(sp.end, e)
+        parts.append(text[pos:e])
+        out.append("".join(parts))
+    return out
+
 def mask_pii(
     text: str,
     *,
     mask_email: bool = True,
     mask_phone: bool = True,
     email_token: str = "<EMAIL>",
-    phone_token: str = "<PHONE>"
+    phone_token: str = "<PHONE>",
+    **kwargs
 ) -> str:
     """
     Mask personally identifiable information (PII) in text.
@@ -21,17 +274,25 @@ def mask_pii(
         mask_phone: Whether to mask phone numbers
         email_token: Replacement token for emails
         phone_token: Replacement token for phone numbers
+        **kwargs: Further entity switches and tokens accepted by `mask_pii_spans`
+            (credit cards, IP addresses, URLs with user info)
 
     Returns:
         Text with PII masked
     """
     if not text:
         return ""
+    masked, _ = mask_pii_spans(
+        text, mask_email=mask_email, mask_phone=mask_phone, email_token=email_token, phone_token=phone_token, **kwargs
+    )
+    return masked
 
-    s = text
-    if mask_email:
-        s = EMAIL_RE.sub(email_token, s)
-    if mask_phone:
-        s = PHONE_RE.sub(phone_token, s)
+def mask_pii_batch(texts: List[str], *, with_spans: bool = False, **kwargs) -> List:
+    """
+    Mask a batch of texts with shared settings.
 
-    return s
+    Returns:
+        Masked texts, or (masked_text, spans) pairs when `with_spans` is True
+    """
+    out = [mask_pii_spans(t, **kwargs) for t in texts]
+    return out if with_spans else [m for m, _ in out]
@@ -0,0 +1,286 @@
+from __future__ import annotations
+import os
+import glob
+import json
+import time
+import hashlib
+import threading
+from collections import deque
+from typing import Dict, Any, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+ACTIONS = ("allow", "warn", "block")
+SESSION_ID_BYTES = 64
+
+def audit_dtype(abuse_labels: Sequence[str], content_flags: Sequence[str], crisis_flags: Sequence[str]) -> np.dtype:
+    """
+    Fixed-width record layout of one audited decision.
+    Per-label scores and flags get one column each so readers can load them as arrays.
+    """
+    fields = [
+        ("ts", "<f8"),
+        ("seq", "<i8"),
+        ("session_id", f"S{SESSION_ID_BYTES}"),
+        ("text_sha1", "u1", (20,)),
+        ("age", "S4"),
+        ("action", "u1"),
+        ("route_to_human", "?"),
+        ("max_risk", "<f4"),
+        ("crisis_score", "<f4"),
+        ("escalation_ewma", "<f4"),
+        ("escalation_slope", "<f4"),
+        ("cascade_exited", "?"),
+    ]
+    fields += [(f"abuse_{lbl}", "<f4") for lbl in abuse_labels]
+    fields += [(f"content_{f}", "?") for f in content_flags]
+    fields += [(f"crisis_{f}", "?") for f in crisis_flags]
+    return np.dtype(fields)
+
+class AuditLog:
+    """
+    Append-only decision audit sink.
+
+    `submit` only appends result references to a bounded in-memory queue; a
+    background thread turns queued results into fixed-width NumPy records and
+    appends them to the current segment file in one write per batch. Segments
+    rotate by size and age; each `<segment>.rec` has a `<segment>.json` sidecar
+    with the record dtype and the config/model versions, and can be read back
+    with `np.fromfile` / `read_audit_log`.
+
+    When the queue is full, records are dropped (`on_full: drop`, counted in
+    `stats()`) or the caller waits up to `block_timeout_s` (`on_full: block`).
+    Config keys: runtime.yaml -> audit
+    """
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        *,
+        abuse_labels: Sequence[str],
+        content_flags: Sequence[str],
+        crisis_flags: Sequence[str],
+        config_version: str = "",
+        model_version: str = ""
+    ):
+        self.dir = config.get("dir", "reports/audit")
+        self.flush_interval_s = float(config.get("flush_interval_s", 1.0))
+        self.max_queue = int(config.get("max_queue", 100000))
+        self.on_full = config.get("on_full", "drop")
+        if self.on_full not in ("drop", "block"):
+            raise ValueError(f"Unknown audit on_full policy: {self.on_full}")
+        self.block_timeout_s = float(config.get("block_timeout_s", 1.0))
+        self.rotate_bytes = int(config.get("rotate_bytes", 64 * 1024 * 1024))
+        self.rotate_interval_s = float(config.get("rotate_interval_s", 3600))
+        self.hash_text = bool(config.get("hash_text", True))
+
+        self.abuse_labels = list(abuse_labels)
+        self.content_flags = list(content_flags)
+        self.crisis_flags = list(crisis_flags)
+        self.dtype = audit_dtype(self.abuse_labels, self.content_flags, self.crisis_flags)
+        self.meta = {
+            "dtype": self.dtype.descr,
+            "abuse_labels": self.abuse_labels,
+            "content_flags": self.content_flags,
+            "crisis_flags": self.crisis_flags,
+            "actions": list(ACTIONS),
+            "config_version": config_version,
+            "model_version": model_version,
+        }
+        self._action_code = {a: i for i, a in enumerate(ACTIONS)}
+
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._written = 0
+        self._dropped = 0
+        self._segment: Optional[str] = None
+        self._segment_file = None
+        self._segment_bytes = 0
+        self._segment_opened = 0.0
+        self._n_segments = 0
+        self._io_lock = threading.Lock()
+        self._stop = threading.Event()
+        os.makedirs(self.dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="audit-flush", daemon=True)
+        self._thread.start()
+
+    def submit(
+        self,
+        results: List[Dict[str, Any]],
+        ages: Sequence[str],
+        session_ids: Optional[Sequence[Optional[str]]] = None,
+        timestamps: Optional[Sequence[Optional[float]]] = None,
+    ) -> int:
+        """
+        Queue a batch of inference results for auditing (no serialization or I/O here).
+
+        Returns:
+            Number of records accepted
+        """
+        n = len(results)
+        now = time.time()
+        session_ids = session_ids or [None] * n
+        timestamps = timestamps or [None] * n
+        with self._cond:
+            room = self.max_queue - len(self._queue)
+            if room < n and self.on_full == "block":
+                deadline = now + self.block_timeout_s
+                while room < n and not self._stop.is_set():
+                    self._cond.notify_all()
+                    remaining = deadline - time.time()
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        break
+                    room = self.max_queue - len(self._queue)
+            accepted = max(0, min(n, room))
+            for i in range(accepted):
+                self._queue.append((results[i], ages[i], session_ids[i], timestamps[i] or now, self._seq))
+                self._seq += 1
+            self._dropped += n - accepted
+            if len(self._queue) >= self.max_queue // 2:
+                self._cond.notify_all()
+        return accepted
+
+    def _to_records(self, batch: List[Tuple]) -> np.ndarray:
+        results = [b[0] for b in batch]
+        decisions = [r["decision"] for r in results]
+        rec = np.zeros(len(batch), dtype=self.dtype)
+        rec["ts"] = [b[3] for b in batch]
+        rec["seq"] = [b[4] for b in batch]
+        rec["session_id"] = [(b[2] or "").encode("utf-8")[:SESSION_ID_BYTES] for b in batch]
+        if self.hash_text:
+            digests = b"".join(hashlib.sha1(r["input"]["raw"].encode("utf-8")).digest() for r in results)
+            rec["text_sha1"] = np.frombuffer(digests, dtype=np.uint8).reshape(len(results), 20)
+        rec["age"] = [str(b[1]).encode("ascii", "replace")[:4] for b in batch]
+        rec["action"] = [self._action_code.get(d["action"], 0) for d in decisions]
+        rec["route_to_human"] = [d["route_to_human"] for d in decisions]
+        rec["max_risk"] = [d["max_risk"] for d in decisions]
+        rec["crisis_score"] = [r["crisis"]["score"] for r in results]
+        rec["escalation_ewma"] = [r["escalation"]["ewma"] for r in results]
+        rec["escalation_slope"] = [r["escalation"]["slope"] for r in results]
+        rec["cascade_exited"] = [r.get("cascade", {}).get("exited", False) for r in results]
+        # Early-exited messages carry no abuse scores; they stay 0 (below the gate's bound)
+        for lbl in self.abuse_labels:
+            rec[f"abuse_{lbl}"] = [r["abuse"]["scores"].get(lbl, 0.0) for r in results]
+        for f in self.content_flags:
+            rec[f"content_{f}"] = [r["content"]["rule_flags"].get(f, False) for r in results]
+        for f in self.crisis_flags:
+            rec[f"crisis_{f}"] = [r["crisis"].get("flags", {}).get(f, False) for r in results]
+        return rec
+
+    def _open_segment(self):
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self._segment = os.path.join(self.dir, f"audit-{stamp}-{os.getpid()}-{self._n_segments:04d}")
+        self._n_segments += 1
+        with open(self._segment + ".json", "w", encoding="utf-8") as f:
+            json.dump({**self.meta, "created": time.time()}, f)
+        self._segment_file = open(self._segment + ".rec", "ab")
+        self._segment_bytes = 0
+        self._segment_opened = time.time()
+
+    def _close_segment(self):
+        if self._segment_file is not None:
+            self._segment_file.close()
+            self._segment_file = None
+
+    def _write(self, rec: np.ndarray):
+        with self._io_lock:
+            if self._segment_file is not None and (
+                self._segment_bytes >= self.rotate_bytes
+                or time.time() - self._segment_opened >= self.rotate_interval_s
+            ):
+                self._close_segment()
+            if self._segment_file is None:
+                self._open_segment()
+            self._segment_file.write(rec.tobytes())
+            self._segment_file.flush()
+            self._segment_bytes += rec.nbytes
+            self._written += len(rec)
+
+    def flush(self) -> int:
+        """
+        Write everything queued so far.
+
+        Returns:
+            Number of records written
+        """
+        with self._cond:
+            batch = list(self._queue)
+            self._queue.clear()
+            self._cond.notify_all()
+        if not batch:
+            return 0
+        try:
+            self._write(self._to_records(batch))
+        except Exception as e:
+            with self._cond:
+                self._dropped += len(batch)
+            logger.error("Audit flush failed", extra={"context": {"error": str(e), "records": len(batch)}})
+            return 0
+        return len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._cond:
+                if len(self._queue) < self.max_queue // 2:
+                    self._cond.wait(self.flush_interval_s)
+            self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "queued": len(self._queue),
+                "written": self._written,
+                "dropped": self._dropped,
+                "segments": self._n_segments,
+                "segment": self._segment,
+            }
+
+    def close(self):
+        """
+        Stop the background writer, write remaining records and close the segment.
+        """
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        self._thread.join()
+        self.flush()
+        with self._io_lock:
+            self._close_segment()
+
+def iter_audit_segments(path: str, mmap: bool = True) -> Iterator[Tuple[Dict[str, Any], np.ndarray]]:
+    """
+    Yield (meta, records) for each audit segment under a directory, oldest first.
+    Records are memory-mapped by default, so segments larger than RAM can be scanned.
+    """
+    for rec_path in sorted(glob.glob(os.path.join(path, "audit-*.rec"))):
+        with open(rec_path[:-4] + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+        dtype = np.dtype([(f[0], f[1], tuple(f[2])) if len(f) == 3 else tuple(f) for f in meta["dtype"]])
+        size = os.path.getsize(rec_path) // dtype.itemsize
+        if size == 0:
+            continue
+        if mmap:
+            records = np.memmap(rec_path, dtype=dtype, mode="r", shape=(size,))
+        else:
+            records = np.fromfile(rec_path, dtype=dtype, count=size)
+        yield meta, records
+
+def read_audit_log(path: str) -> Tuple[Dict[str, Any], np.ndarray]:
+    """
+    Load all segments with a common layout into one record array.
+
+    Returns:
+        (meta of the first segment, concatenated records)
+    """
+    metas, parts = [], []
+    for meta, records in iter_audit_segments(path, mmap=False):
+        if metas and meta["dtype"] != metas[0]["dtype"]:
+            raise ValueError("Audit segments have different record layouts; read them with iter_audit_segments")
+        metas.append(meta)
+        parts.append(records)
+    if not parts:
+        return {}, np.zeros(0)
+    return metas[0], np.concatenate(parts)
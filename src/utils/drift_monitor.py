@@ -0,0 +1,214 @@
+from __future__ import annotations
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from src.utils.audit_log import ACTIONS
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+def bin_counts(scores: np.ndarray, n_bins: int) -> np.ndarray:
+    """
+    Fixed-width histograms over [0, 1] per column; non-finite scores are skipped.
+
+    Returns:
+        Counts of shape (n_heads, n_bins)
+    """
+    scores = np.atleast_2d(np.asarray(scores, dtype=np.float64))
+    counts = np.zeros((scores.shape[1], n_bins), dtype=np.int64)
+    rows, cols = np.nonzero(np.isfinite(scores))
+    bins = np.clip((scores[rows, cols] * n_bins).astype(np.int64), 0, n_bins - 1)
+    np.add.at(counts, (cols, bins), 1)
+    return counts
+
+def risk_actions(max_risk: np.ndarray, actions_cfg: Dict[str, Any]) -> np.ndarray:
+    """
+    Action codes (into ACTIONS) implied by the policy risk thresholds alone.
+    """
+    codes = np.zeros(len(max_risk), dtype=np.int64)
+    codes[max_risk >= actions_cfg["allow_max_risk"]] = ACTIONS.index("warn")
+    codes[max_risk >= actions_cfg["warn_max_risk"]] = ACTIONS.index("block")
+    return codes
+
+def build_reference(heads: List[str], scores: np.ndarray, actions_cfg: Dict[str, Any], n_bins: int = 20) -> Dict[str, Any]:
+    """
+    Reference score and action distributions exported next to trained models.
+
+    Actions are derived from the max head score and the policy thresholds (no
+    escalation, which needs conversation context).
+    `scores` must come from the serving path (InferenceOrchestrator.head_scores):
+    raw-text scores differ from the preprocessed, pooled ones live traffic is
+    compared against and would show drift where there is none.
+
+    Returns:
+        YAML-serializable reference: heads, bins, per-head counts and action counts
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    actions = np.bincount(risk_actions(scores.max(axis=1), actions_cfg), minlength=len(ACTIONS))
+    return {
+        "heads": list(heads),
+        "n_bins": int(n_bins),
+        "samples": int(scores.shape[0]),
+        "counts": {h: c.tolist() for h, c in zip(heads, bin_counts(scores, n_bins))},
+        "actions": {a: int(actions[i]) for i, a in enumerate(ACTIONS)},
+    }
+
+def psi_kl(observed: np.ndarray, expected: np.ndarray, eps: float = 1e-4) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Population stability index and KL(observed || expected) per row of count histograms.
+    Empty bins are smoothed with `eps` before normalizing.
+    """
+    p = np.atleast_2d(observed).astype(np.float64) + eps
+    q = np.atleast_2d(expected).astype(np.float64) + eps
+    p /= p.sum(axis=1, keepdims=True)
+    q /= q.sum(axis=1, keepdims=True)
+    log_ratio = np.log(p / q)
+    return ((p - q) * log_ratio).sum(axis=1), (p * log_ratio).sum(axis=1)
+
+class DriftMonitor:
+    """
+    Streaming score-drift monitor over time-aligned tumbling windows.
+
+    Each window holds fixed-bin histograms of every head's score plus action
+    counts; observing a batch is a vectorized bin increment (O(1) per message
+    and head). PSI and KL against the training-time reference are computed per
+    window on demand. Windows are keyed by epoch window index, so monitors
+    from several worker processes merge by adding counts (`merge_state`).
+    Messages without a head score (cascade early exits) count towards actions only.
+    Config keys: runtime.yaml -> drift
+    """
+
+    def __init__(self, config: Dict[str, Any], reference: Dict[str, Any]):
+        self.heads = list(reference["heads"])
+        self.n_bins = int(reference["n_bins"])
+        self.window_s = float(config.get("window_s", 3600))
+        self.history = int(config.get("history", 24))
+        self.min_count = int(config.get("min_count", 500))
+        self.psi_alert = float(config.get("psi_alert", 0.2))
+        self._ref_scores = np.array([reference["counts"][h] for h in self.heads], dtype=np.int64)
+        self._ref_actions = np.array([reference["actions"].get(a, 0) for a in ACTIONS], dtype=np.int64)
+        self._windows: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._alerted = set()
+        self._lock = threading.Lock()
+
+    def _window(self, wid: int) -> Dict[str, Any]:
+        window = self._windows.get(wid)
+        if window is None:
+            window = {
+                "n": 0,
+                "scores": np.zeros((len(self.heads), self.n_bins), dtype=np.int64),
+                "actions": np.zeros(len(ACTIONS), dtype=np.int64),
+            }
+            self._windows[wid] = window
+            # Windows arrive in time order except when merging; keep the newest `history`
+            for old in sorted(self._windows)[:-self.history]:
+                del self._windows[old]
+            self._check_closed(wid)
+        return window
+
+    def observe_batch(self, heads: List[str], scores: np.ndarray, actions: List[str], now: Optional[float] = None):
+        """
+        Args:
+            heads: Column names of `scores` (columns not in the reference are ignored)
+            scores: Scores of shape (n, len(heads)), NaN where a head did not run
+            actions: Decision action per message
+            now: Epoch seconds (default: current time)
+        """
+        cols = [heads.index(h) if h in heads else None for h in self.heads]
+        scores = np.asarray(scores, dtype=np.float64).reshape(len(actions), len(heads))
+        aligned = np.column_stack([scores[:, c] if c is not None else np.full(len(actions), np.nan) for c in cols])
+        counts = bin_counts(aligned, self.n_bins)
+        action_counts = np.bincount([ACTIONS.index(a) for a in actions], minlength=len(ACTIONS))
+        wid = int((time.time() if now is None else now) // self.window_s)
+        with self._lock:
+            window = self._window(wid)
+            window["scores"] += counts
+            window["actions"] += action_counts
+            window["n"] += len(actions)
+
+    def _window_drift(self, window: Dict[str, Any]) -> Dict[str, Any]:
+        psi, kl = psi_kl(window["scores"], self._ref_scores)
+        act_psi, act_kl = psi_kl(window["actions"], self._ref_actions)
+        scored = window["scores"].sum(axis=1)
+        heads = {
+            h: {
+                "psi": round(float(psi[j]), 6), "kl": round(float(kl[j]), 6), "n": int(scored[j]),
+                "drift": bool(scored[j] >= self.min_count and psi[j] >= self.psi_alert),
+            }
+            for j, h in enumerate(self.heads)
+        }
+        return {
+            "n": int(window["n"]),
+            "heads": heads,
+            "actions": {
+                "psi": round(float(act_psi[0]), 6), "kl": round(float(act_kl[0]), 6),
+                "counts": {a: int(window["actions"][i]) for i, a in enumerate(ACTIONS)},
+                "drift": bool(window["n"] >= self.min_count and act_psi[0] >= self.psi_alert),
+            },
+        }
+
+    def _check_closed(self, current: int):
+        """
+        Log drifting heads of windows that just closed (once per window).
+        """
+        for wid in list(self._windows):
+            if wid >= current or wid in self._alerted:
+                continue
+            self._alerted.add(wid)
+            drift = self._window_drift(self._windows[wid])
+            names = [h for h, d in drift["heads"].items() if d["drift"]] + (["actions"] if drift["actions"]["drift"] else [])
+            if names:
+                logger.warning(
+                    "⚠️ Score drift against training reference",
+                    extra={"context": {"window_start": wid * self.window_s, "heads": names, "n": drift["n"]}},
+                )
+        self._alerted = {w for w in self._alerted if w in self._windows}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Per-window PSI/KL per head and for the action distribution, newest window last.
+        """
+        with self._lock:
+            windows = {wid: self._window_drift(w) for wid, w in sorted(self._windows.items())}
+        drifting = sorted({
+            h for w in windows.values()
+            for h, d in [*w["heads"].items(), ("actions", w["actions"])] if d["drift"]
+        })
+        return {
+            "window_s": self.window_s,
+            "psi_alert": self.psi_alert,
+            "drifting": drifting,
+            "windows": {str(int(wid * self.window_s)): w for wid, w in windows.items()},
+        }
+
+    def state(self) -> Dict[str, Any]:
+        """
+        Raw window counts, for shipping to another process and `merge_state`.
+        """
+        with self._lock:
+            return {
+                "heads": self.heads,
+                "windows": {
+                    wid: {"n": w["n"], "scores": w["scores"].copy(), "actions": w["actions"].copy()}
+                    for wid, w in self._windows.items()
+                },
+            }
+
+    def merge_state(self, state: Dict[str, Any]) -> "DriftMonitor":
+        """
+        Add another monitor's window counts (same reference heads and bins).
+        """
+        if list(state["heads"]) != self.heads:
+            raise ValueError("Cannot merge drift monitors with different heads")
+        with self._lock:
+            for wid, w in sorted(state["windows"].items()):
+                window = self._window(int(wid))
+                window["n"] += int(w["n"])
+                window["scores"] += np.asarray(w["scores"], dtype=np.int64)
+                window["actions"] += np.asarray(w["actions"], dtype=np.int64)
+        return self
+
+    def merge(self, other: "DriftMonitor") -> "DriftMonitor":
+        return self.merge_state(other.state())
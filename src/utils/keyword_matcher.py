@@ -0,0 +1,79 @@
+from __future__ import annotations
+import re
+from typing import Dict, Iterable, List, Set
+
+class KeywordMatcher:
+    """
+    Single-pass, case-insensitive substring matcher over a fixed keyword set.
+
+    All keywords are compiled into one zero-width lookahead alternation so each
+    text is scanned once regardless of how many keywords or groups are configured.
+    Matching keeps the substring semantics of the original `k in text.lower()` checks
+    unless `whole_words` is set, in which case keywords only match as whole words
+    (so "man" does not match inside "woman").
+    """
+
+    def __init__(self, groups: Dict[str, Iterable[str]], whole_words: bool = False):
+        self.whole_words = whole_words
+        self.groups: Dict[str, List[str]] = {
+            name: sorted({k.lower() for k in kws if k}) for name, kws in groups.items()
+        }
+        self._owners: Dict[str, Set[str]] = {}
+        for name, kws in self.groups.items():
+            for k in kws:
+                self._owners.setdefault(k, set()).add(name)
+        bit = {name: 1 << i for i, name in enumerate(self.groups)}
+        self._owner_bits: Dict[str, int] = {k: sum(bit[g] for g in owners) for k, owners in self._owners.items()}
+        # Keywords bucketed by first character to resolve prefixes sharing a start offset
+        self._by_first: Dict[str, List[str]] = {}
+        for k in self._owners:
+            self._by_first.setdefault(k[0], []).append(k)
+        alternation = "|".join(re.escape(k) for k in sorted(self._owners, key=len, reverse=True))
+        if not alternation:
+            self._re = None
+        elif whole_words:
+            self._re = re.compile(f"(?<!\\w)(?=({alternation})(?!\\w))")
+        else:
+            self._re = re.compile(f"(?=({alternation}))")
+
+    def find(self, text: str) -> Set[str]:
+        """
+        Return the set of keywords occurring anywhere in the text.
+        """
+        if not self._re or not text:
+            return set()
+        s = text.lower()
+        found: Set[str] = set()
+        for m in self._re.finditer(s):
+            pos = m.start()
+            for k in self._by_first[s[pos]]:
+                if s.startswith(k, pos) and not (self.whole_words and self._word_char_at(s, pos + len(k))):
+                    found.add(k)
+        return found
+
+    @staticmethod
+    def _word_char_at(s: str, pos: int) -> bool:
+        return pos < len(s) and (s[pos].isalnum() or s[pos] == "_")
+
+    def any(self, text: str) -> bool:
+        """
+        Return True if any keyword occurs in the text (stops at the first hit).
+        """
+        return bool(self._re and text and self._re.search(text.lower()))
+
+    def group_flags(self, text: str) -> Dict[str, bool]:
+        """
+        Return one flag per keyword group, True if any of its keywords occurs.
+        """
+        found = self.find(text)
+        hit_groups = {g for k in found for g in self._owners[k]}
+        return {name: name in hit_groups for name in self.groups}
+
+    def group_mask(self, text: str) -> int:
+        """
+        Same as `group_flags` as a bitmask (bit i = i-th group in `groups` order).
+        """
+        mask = 0
+        for k in self.find(text):
+            mask |= self._owner_bits[k]
+        return mask
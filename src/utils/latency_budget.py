@@ -0,0 +1,94 @@
+from __future__ import annotations
+import math
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional
+
+DEFAULT_DEGRADE_ORDER = ["explanations", "language_detection", "content_classifier", "long_input_windows"]
+
+class StageCosts:
+    """
+    Online per-item cost estimates (seconds) of pipeline stages.
+
+    Each stage keeps an EWMA of measured wall time per item (message, window
+    or explained row), seeded from `initial_cost_ms`. Shared across requests.
+    """
+
+    def __init__(self, initial_ms: Optional[Dict[str, float]] = None, alpha: float = 0.2):
+        self.alpha = float(alpha)
+        self._per_item = {k: float(v) / 1000.0 for k, v in (initial_ms or {}).items()}
+
+    def estimate(self, stage: str, n: int) -> float:
+        return self._per_item.get(stage, 0.0) * n
+
+    def observe(self, stage: str, seconds: float, n: int):
+        if n <= 0:
+            return
+        per_item = seconds / n
+        prev = self._per_item.get(stage)
+        self._per_item[stage] = per_item if prev is None else prev + self.alpha * (per_item - prev)
+
+    @contextmanager
+    def timed(self, stage: str, n: int) -> Iterator[None]:
+        start = time.perf_counter()
+        yield
+        self.observe(stage, time.perf_counter() - start, n)
+
+    def snapshot(self) -> Dict[str, float]:
+        return {k: round(v * 1000.0, 4) for k, v in self._per_item.items()}
+
+class LatencyBudget:
+    """
+    Deadline for one request, deciding which optional stages still fit.
+
+    Optional stages are listed in `order`, first to be dropped first. Before an
+    optional stage runs, the caller passes the estimated cost of every stage
+    still to run; the stage is kept only if the time left covers it plus all
+    stages that must outlive it (mandatory stages, i.e. those not in `order`,
+    and optional stages dropped after it). Without a budget every stage is kept.
+    """
+
+    def __init__(self, budget_ms: Optional[float], order: List[str]):
+        self.start = time.perf_counter()
+        self.deadline = None if budget_ms is None else self.start + float(budget_ms) / 1000.0
+        self.rank = {stage: i for i, stage in enumerate(order)}
+        self.degraded: List[str] = []
+
+    def remaining(self) -> float:
+        return math.inf if self.deadline is None else self.deadline - time.perf_counter()
+
+    def keep(self, stage: str, plan: Dict[str, float]) -> bool:
+        """
+        Args:
+            stage: Optional stage about to run
+            plan: Estimated seconds of each stage still to run, including `stage`
+
+        Returns:
+            Whether to run the stage (dropped stages are recorded in `degraded`)
+        """
+        if self.deadline is None or stage not in self.rank:
+            return True
+        rank = self.rank[stage]
+        reserve = sum(cost for s, cost in plan.items() if s != stage and self.rank.get(s, math.inf) > rank)
+        if self.remaining() >= plan.get(stage, 0.0) + reserve:
+            return True
+        self.degraded.append(stage)
+        return False
+
+    def overrun(self) -> bool:
+        return self.deadline is not None and time.perf_counter() > self.deadline
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000.0
+
+def budget_settings(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize the runtime.yaml -> latency_budget section.
+    """
+    return {
+        "default_ms": config.get("default_ms"),
+        "order": list(config.get("degrade_order", DEFAULT_DEGRADE_ORDER)),
+        "degraded_max_windows": int(config.get("degraded_max_windows", 2)),
+        "initial_cost_ms": dict(config.get("initial_cost_ms", {})),
+        "cost_alpha": float(config.get("cost_alpha", 0.2)),
+    }
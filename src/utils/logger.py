@@ -40,7 +40,7 @@ def get_logger(
     name: str,
     level: Optional[str] = None,
     to_file: bool = True,
-    log_dir: str = "reports/logs",
+    log_dir: Optional[str] = None,
     json_file: bool = True,
     max_bytes: int = 5 * 1024 * 1024,
     backup_count: int = 3,
@@ -52,7 +52,7 @@ def get_logger(
         name: Logger name (usually __name__)
         level: Log level string (DEBUG, INFO, etc.)
         to_file: Whether to write logs to file
-        log_dir: Directory for log files
+        log_dir: Directory for log files (default: $AI_SAFETY_LOG_DIR, else reports/logs)
         json_file: Use JSON formatting for file logs
         max_bytes: Max size per log file before rotation
         backup_count: Number of rotated backups to keep
@@ -76,6 +76,7 @@ def get_logger(
 
     # File handler
     if to_file:
+        log_dir = log_dir or os.environ.get("AI_SAFETY_LOG_DIR") or "reports/logs"
         os.makedirs(log_dir, exist_ok=True)
         file_path = os.path.join(log_dir, "system.log")
         fh = RotatingFileHandler(file_path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
@@ -0,0 +1,248 @@
+from __future__ import annotations
+import os
+import sys
+import time
+import types
+import threading
+import tracemalloc
+from collections import deque
+from itertools import islice
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+import numpy as np
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Sized but not traversed: code, types and objects owned by other subsystems
+_OPAQUE = (
+    type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+    types.CodeType, types.FrameType, threading.Thread,
+)
+_ATOMIC = (str, bytes, bytearray, int, float, complex, bool, type(None), range)
+
+class MemoryBudgetExceeded(MemoryError):
+    """
+    A load was refused because it would push accounted memory over the budget.
+    """
+
+def deep_sizeof(obj: Any, seen: Optional[Set[int]] = None, sample: int = 1000) -> int:
+    """
+    Structural estimate of the bytes reachable from an object.
+
+    Containers, instance dicts and slots are followed; NumPy arrays count their
+    buffer once (views are charged to their base) and torch tensors their storage. Objects already in `seen` are
+    not counted again, so a shared `seen` attributes each object to the first
+    root that reaches it. Containers larger than `sample` items are estimated
+    from their first `sample` items. Each container is copied in one step before
+    its items are walked, so containers that serving threads modify concurrently
+    can be measured without locking them.
+    """
+    seen = set() if seen is None else seen
+
+    def size(o: Any) -> int:
+        if id(o) in seen:
+            return 0
+        seen.add(id(o))
+        if isinstance(o, _ATOMIC) or isinstance(o, _OPAQUE):
+            return sys.getsizeof(o)
+        if isinstance(o, np.ndarray):
+            total = sys.getsizeof(o) if o.base is None else sys.getsizeof(o) + size(o.base)
+            if o.dtype == object:
+                total += items(_head(o.flat, sample), o.size)
+            return total
+        if type(o).__module__.startswith("torch") and isinstance(getattr(o, "nbytes", None), int):
+            return sys.getsizeof(o) + o.nbytes  # tensor storage is invisible to getsizeof
+        if isinstance(o, dict):
+            return sys.getsizeof(o) + items([x for kv in _head(o.items(), sample) for x in kv], 2 * len(o))
+        if isinstance(o, (list, tuple, set, frozenset, deque)):
+            return sys.getsizeof(o) + items(_head(o, sample), len(o))
+        total = sys.getsizeof(o)
+        if hasattr(o, "__dict__"):
+            total += size(o.__dict__)
+        for cls in type(o).__mro__:
+            for slot in getattr(cls, "__slots__", ()):
+                if slot not in ("__dict__", "__weakref__") and hasattr(o, slot):
+                    total += size(getattr(o, slot))
+        return total
+
+    def items(values: List[Any], n: int) -> int:
+        measured = sum(size(v) for v in values)
+        return measured if len(values) >= n or not values else int(measured * n / len(values))
+
+    return size(obj)
+
+def _head(iterable: Any, n: int, attempts: int = 5) -> List[Any]:
+    # One C-level copy, so a request thread cannot resize the container between
+    # items; a collection triggered by the copy can still run Python code and
+    # switch threads, so a copy that hit a resize is retried
+    for _ in range(attempts - 1):
+        try:
+            return list(islice(iterable, n))
+        except RuntimeError:
+            continue
+    try:
+        return list(islice(iterable, n))
+    except RuntimeError:
+        return []  # still resizing: count the container itself only
+
+def process_rss_bytes() -> Optional[int]:
+    """
+    Resident set size of this process (Linux /proc; peak RSS elsewhere on POSIX).
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return None
+
+class MemoryAccountant:
+    """
+    Memory budget for the components of one serving process.
+
+    `measure` returns the accounted bytes of all components and `shrink(excess)`
+    releases caches, returning the estimated bytes freed; accounted memory after
+    a shrink is that estimate subtracted, so each check measures only once.
+    Periodic checks from the request path run on a background thread
+    (`enforce_in_background`). Loads are admitted
+    only if their expected size fits next to what is already accounted, after
+    shrinking caches if needed; otherwise MemoryBudgetExceeded is raised. The
+    expected size is the artifact size on disk times `load_factor` (pickled
+    vocabularies expand into Python strings), or times the ratio measured on
+    the last traced load of the same component. With `trace_loads`, tracemalloc
+    runs only for the duration of each load to record the bytes it allocated.
+    Without a budget, the accountant only reports.
+    Config keys: runtime.yaml -> memory
+    """
+
+    def __init__(self, config: Dict[str, Any], measure: Callable[[], int], shrink: Callable[[int], int]):
+        budget_mb = config.get("budget_mb")
+        self.budget_bytes = None if budget_mb is None else int(float(budget_mb) * 1024 * 1024)
+        self.shrink_to = float(config.get("shrink_to", 0.8))
+        self.check_interval_s = float(config.get("check_interval_s", 30.0))
+        self.trace_loads = bool(config.get("trace_loads", True))
+        self.load_factor = float(config.get("load_factor", 2.5))
+        self.measure = measure
+        self.shrink = shrink
+        self.load_bytes: Dict[str, int] = {}
+        self._disk_bytes: Dict[str, int] = {}
+        self._ratio: Dict[str, float] = {}
+        self.refused_loads = 0
+        self.shrinks = 0
+        self.freed_bytes = 0
+        self._last_check = time.monotonic()
+        self._lock = threading.RLock()
+        self._enforcer: Optional[threading.Thread] = None
+        self._enforcer_lock = threading.Lock()
+
+    def due(self) -> bool:
+        """
+        Whether a periodic budget check is due (rate-limited to check_interval_s).
+        """
+        if self.budget_bytes is None or time.monotonic() - self._last_check < self.check_interval_s:
+            return False
+        self._last_check = time.monotonic()
+        return True
+
+    def enforce(self, accounted: Optional[int] = None) -> int:
+        """
+        Shrink caches down to `shrink_to` of the budget if accounted memory exceeds it.
+
+        Returns:
+            Accounted bytes after enforcement
+        """
+        with self._lock:
+            accounted = self.measure() if accounted is None else accounted
+            if self.budget_bytes is None or accounted <= self.budget_bytes:
+                return accounted
+            freed = self.shrink(accounted - int(self.shrink_to * self.budget_bytes))
+            self.shrinks += 1
+            self.freed_bytes += freed
+            after = accounted - freed
+            logger.warning(
+                "⚠️ Memory budget exceeded, caches shrunk",
+                extra={"context": {"before": accounted, "after": after, "budget": self.budget_bytes}},
+            )
+            return after
+
+    def enforce_in_background(self) -> bool:
+        """
+        Run `enforce` on a daemon thread, unless a previous check is still running,
+        so measuring and shrinking stay off the request path.
+
+        Returns:
+            Whether a check was started
+        """
+        with self._enforcer_lock:
+            if self._enforcer is not None and self._enforcer.is_alive():
+                return False
+            self._enforcer = threading.Thread(target=self._enforce_logged, name="memory-enforce", daemon=True)
+            self._enforcer.start()
+            return True
+
+    def _enforce_logged(self):
+        try:
+            self.enforce()
+        except Exception as e:
+            logger.warning(f"⚠️ Memory budget check failed: {e}")
+
+    def admit(self, name: str, paths: List[str]):
+        """
+        Refuse a load whose on-disk size would not fit in the budget.
+
+        Raises:
+            MemoryBudgetExceeded: Budget exceeded even after shrinking caches
+        """
+        disk = sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+        self._disk_bytes[name] = disk
+        if self.budget_bytes is None:
+            return
+        needed = int(disk * self._ratio.get(name, self.load_factor))
+        with self._lock:
+            accounted = self.measure()
+            if accounted + needed > self.budget_bytes:
+                freed = self.shrink(accounted + needed - self.budget_bytes)
+                self.freed_bytes += freed
+                self.shrinks += 1
+                accounted -= freed
+            if accounted + needed > self.budget_bytes:
+                self.refused_loads += 1
+                raise MemoryBudgetExceeded(
+                    f"loading {name} (~{needed} bytes) would exceed the memory budget "
+                    f"({accounted} of {self.budget_bytes} bytes accounted)"
+                )
+
+    @contextmanager
+    def traced(self, name: str) -> Iterator[None]:
+        """
+        Record the net bytes allocated while loading a component.
+        """
+        if not self.trace_loads:
+            yield
+            return
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        try:
+            yield
+            self.load_bytes[name] = max(0, tracemalloc.get_traced_memory()[0] - before)
+            if self._disk_bytes.get(name):
+                self._ratio[name] = self.load_bytes[name] / self._disk_bytes[name]
+        finally:
+            if started:
+                tracemalloc.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "budget_bytes": self.budget_bytes,
+            "shrinks": self.shrinks,
+            "freed_bytes": self.freed_bytes,
+            "refused_loads": self.refused_loads,
+        }
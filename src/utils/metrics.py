@@ -179,3 +179,250 @@ def sweep_thresholds_binary(
         if m["f1"] > best["f1"]:
             best, best_t = m, t
     return best_t, best
+
+def cascade_recall_loss(
+    y_true: np.ndarray,
+    y_flagged: np.ndarray,
+    exited: np.ndarray,
+    *,
+    labels: Optional[List[str]] = None,
+    reported_recall: Optional[Dict[str, float]] = None
+) -> Dict[str, Any]:
+    """
+    Measure recall lost when early-exited messages skip full scoring.
+
+    A positive is lost if the full pipeline would have flagged it but the
+    cascade let it exit early.
+
+    Args:
+        y_true: Binary ground truth matrix of shape (n_samples, n_labels).
+        y_flagged: Binary full-pipeline decisions, same shape as y_true.
+        exited: Boolean early-exit mask of shape (n_samples,).
+        labels: Optional label names for per-label breakdown.
+        reported_recall: Optional full-pipeline recall per label (e.g. from metrics.yaml).
+
+    Returns:
+        Dict with observed exit rate and, per label, recall lost and cascaded recall.
+    """
+    Y_true = _ensure_2d(y_true).astype(bool)
+    Y_flag = _ensure_2d(y_flagged).astype(bool)
+    ex = np.asarray(exited, dtype=bool).reshape(-1, 1)
+    if labels is None:
+        labels = [f"label_{i}" for i in range(Y_true.shape[1])]
+
+    positives = Y_true.sum(axis=0)
+    caught = (Y_true & Y_flag).sum(axis=0)
+    lost = (Y_true & Y_flag & ex).sum(axis=0)
+    per_label: Dict[str, Dict[str, Optional[float]]] = {}
+    for i, name in enumerate(labels):
+        pos = max(int(positives[i]), 1)
+        recall_full = float(caught[i] / pos)
+        recall_lost = float(lost[i] / pos)
+        base = (reported_recall or {}).get(name, recall_full)
+        per_label[name] = {
+            "positives": int(positives[i]),
+            "recall_full": recall_full,
+            "recall_lost": recall_lost,
+            "recall_reported": None if reported_recall is None else float(base),
+            "recall_cascaded": float(base) - recall_lost,
+        }
+    return {"exit_rate": float(ex.mean()) if ex.size else 0.0, "per_label": per_label}
+
+def metric_deltas(new: Dict[str, Any], base: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Recursively diff two metric dicts (new - base) over their shared numeric leaves.
+
+    Args:
+        new: Metrics of the candidate model (same layout as metrics.yaml).
+        base: Reference metrics.
+
+    Returns:
+        Nested dict of deltas; non-numeric or missing leaves are skipped.
+    """
+    out: Dict[str, Any] = {}
+    for k, v in new.items():
+        b = base.get(k)
+        if isinstance(v, dict) and isinstance(b, dict):
+            sub = metric_deltas(v, b)
+            if sub:
+                out[k] = sub
+        elif isinstance(v, (int, float)) and isinstance(b, (int, float)) and not isinstance(v, bool):
+            out[k] = float(v) - float(b)
+    return out
+
+class MetricAccumulator:
+    """
+    Mergeable, fixed-memory accumulator for (multi)label evaluation.
+
+    Per label it keeps exact confusion counts at a fixed set of thresholds and
+    positive/negative histograms of the scores over `n_bins` equal-width bins
+    on [0, 1]. Chunks can be added with `update`, and accumulators built in
+    other processes combined with `merge`; memory is O(n_labels * (n_bins + n_thresholds)).
+
+    ROC-AUC and PR-AUC (average precision) are computed from the histograms,
+    treating scores within a bin as tied. The exact values differ only through
+    the unknown ordering of positives and negatives inside a bin, so:
+
+        |ROC-AUC - exact| <= 0.5 * sum_b pos_b * neg_b / (P * N)
+        |PR-AUC  - exact| <= sum_b (pos_b / P) * (p_max_b - p_min_b)
+
+    where p_min_b / p_max_b are the lowest and highest precision any positive
+    in bin b can reach under any ordering. Both bounds are reported and shrink
+    as n_bins grows (they are 0 when no bin holds both classes).
+    """
+
+    def __init__(
+        self,
+        n_labels: int = 1,
+        *,
+        labels: Optional[List[str]] = None,
+        thresholds: Optional[List[float]] = None,
+        n_bins: int = 1000
+    ):
+        self.n_labels = int(n_labels)
+        self.labels = labels or [f"label_{i}" for i in range(self.n_labels)]
+        self.thresholds = np.asarray(sorted(thresholds or [0.5]), dtype=np.float64)
+        self.n_bins = int(n_bins)
+        self.pos_hist = np.zeros((self.n_labels, self.n_bins), dtype=np.int64)
+        self.neg_hist = np.zeros((self.n_labels, self.n_bins), dtype=np.int64)
+        # Confusion counts (n_thresholds, n_labels): true/false positives
+        self.tp = np.zeros((self.thresholds.size, self.n_labels), dtype=np.int64)
+        self.fp = np.zeros((self.thresholds.size, self.n_labels), dtype=np.int64)
+        self.n = 0
+
+    def update(self, y_true: np.ndarray, y_prob: np.ndarray) -> "MetricAccumulator":
+        """
+        Add one chunk of ground truth (n, n_labels) and probabilities (n, n_labels).
+        """
+        Y_true = _ensure_2d(y_true).astype(bool)
+        Y_prob = _clip_probs(_ensure_2d(y_prob))
+        if Y_true.shape != Y_prob.shape or Y_true.shape[1] != self.n_labels:
+            raise ValueError(f"Expected arrays of shape (n, {self.n_labels}), got {Y_true.shape} and {Y_prob.shape}")
+        bins = np.minimum((Y_prob * self.n_bins).astype(np.int64), self.n_bins - 1)
+        for j in range(self.n_labels):
+            pos = Y_true[:, j]
+            self.pos_hist[j] += np.bincount(bins[pos, j], minlength=self.n_bins)
+            self.neg_hist[j] += np.bincount(bins[~pos, j], minlength=self.n_bins)
+            # Number of scores >= each threshold, via the sorted scores of each class
+            for counts, scores in ((self.tp, Y_prob[pos, j]), (self.fp, Y_prob[~pos, j])):
+                s = np.sort(scores)
+                counts[:, j] += s.size - np.searchsorted(s, self.thresholds, side="left")
+        self.n += Y_true.shape[0]
+        return self
+
+    def merge(self, other: "MetricAccumulator") -> "MetricAccumulator":
+        """
+        Add the counts of another accumulator with the same labels, thresholds and bins.
+        """
+        if (other.n_labels, other.n_bins) != (self.n_labels, self.n_bins) or not np.array_equal(
+            other.thresholds, self.thresholds
+        ):
+            raise ValueError("Cannot merge accumulators with different labels, thresholds or bins")
+        self.pos_hist += other.pos_hist
+        self.neg_hist += other.neg_hist
+        self.tp += other.tp
+        self.fp += other.fp
+        self.n += other.n
+        return self
+
+    def _threshold_index(self, threshold: float) -> int:
+        idx = np.flatnonzero(np.isclose(self.thresholds, float(threshold)))
+        if idx.size == 0:
+            raise ValueError(f"Threshold {threshold} was not tracked; tracked: {self.thresholds.tolist()}")
+        return int(idx[0])
+
+    @staticmethod
+    def _curve_aucs(pos: np.ndarray, neg: np.ndarray) -> Dict[str, Optional[float]]:
+        """
+        ROC-AUC and average precision (with error bounds) from one pair of histograms.
+        """
+        P, N = int(pos.sum()), int(neg.sum())
+        if P == 0 or N == 0:
+            return {"roc_auc": None, "roc_auc_error_bound": None, "pr_auc": None, "pr_auc_error_bound": None}
+        # Walk bins from the highest score down
+        pos_d, neg_d = pos[::-1].astype(np.float64), neg[::-1].astype(np.float64)
+        tp_before = np.cumsum(pos_d) - pos_d
+        fp_before = np.cumsum(neg_d) - neg_d
+        roc = float((neg_d * (tp_before + 0.5 * pos_d)).sum() / (P * N))
+        roc_err = float(0.5 * (pos_d * neg_d).sum() / (P * N))
+
+        has_pos = pos_d > 0
+        tp_end = tp_before + pos_d
+        prec_end = np.divide(tp_end, tp_end + fp_before + neg_d, out=np.zeros_like(tp_end), where=has_pos)
+        p_max = np.divide(tp_end, tp_end + fp_before, out=np.zeros_like(tp_end), where=has_pos)
+        p_min = np.divide(tp_before + 1, tp_before + fp_before + 1 + neg_d, out=np.zeros_like(tp_end), where=has_pos)
+        w = pos_d / P
+        return {
+            "roc_auc": roc,
+            "roc_auc_error_bound": roc_err,
+            "pr_auc": float((w * prec_end).sum()),
+            "pr_auc_error_bound": float((w * (p_max - p_min)).sum()),
+        }
+
+    def _label_counts(self, threshold: float) -> Dict[str, np.ndarray]:
+        t = self._threshold_index(threshold)
+        positives = self.pos_hist.sum(axis=1)
+        negatives = self.neg_hist.sum(axis=1)
+        tp, fp = self.tp[t], self.fp[t]
+        return {"tp": tp, "fp": fp, "fn": positives - tp, "tn": negatives - fp}
+
+    @staticmethod
+    def _prf(tp, fp, fn) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        tp, fp, fn = (np.asarray(x, dtype=np.float64) for x in (tp, fp, fn))
+        prec = np.divide(tp, tp + fp, out=np.zeros_like(tp), where=(tp + fp) > 0)
+        rec = np.divide(tp, tp + fn, out=np.zeros_like(tp), where=(tp + fn) > 0)
+        f1 = np.divide(2 * prec * rec, prec + rec, out=np.zeros_like(tp), where=(prec + rec) > 0)
+        return prec, rec, f1
+
+    def multilabel_metrics(self, threshold: float = 0.5) -> Dict[str, Any]:
+        """
+        Same structure as `multilabel_metrics`, plus AUC error bounds and PR-AUC.
+        """
+        c = self._label_counts(threshold)
+        prec, rec, f1 = self._prf(c["tp"], c["fp"], c["fn"])
+        prec_mi, rec_mi, f1_mi = self._prf(c["tp"].sum(), c["fp"].sum(), c["fn"].sum())
+        curves = [self._curve_aucs(self.pos_hist[j], self.neg_hist[j]) for j in range(self.n_labels)]
+        micro = self._curve_aucs(self.pos_hist.sum(axis=0), self.neg_hist.sum(axis=0))
+        defined = [cv["roc_auc"] for cv in curves if cv["roc_auc"] is not None]
+        roc_macro = float(np.mean(defined)) if len(defined) == self.n_labels and defined else None
+
+        per_label: Dict[str, Dict[str, Optional[float]]] = {}
+        for j, name in enumerate(self.labels):
+            per_label[name] = {
+                "precision": float(prec[j]),
+                "recall": float(rec[j]),
+                "f1": float(f1[j]),
+                **curves[j],
+            }
+        return {
+            "threshold": float(threshold),
+            "n_samples": int(self.n),
+            "precision_macro": float(prec.mean()),
+            "recall_macro": float(rec.mean()),
+            "f1_macro": float(f1.mean()),
+            "precision_micro": float(prec_mi),
+            "recall_micro": float(rec_mi),
+            "f1_micro": float(f1_mi),
+            "roc_auc_macro": roc_macro,
+            "roc_auc_micro": micro["roc_auc"],
+            "roc_auc_micro_error_bound": micro["roc_auc_error_bound"],
+            "per_label": per_label,
+            "f1": float(f1.mean()),
+        }
+
+    def binary_metrics(self, threshold: float = 0.5, label: int = 0) -> Dict[str, Any]:
+        """
+        Same structure as `binary_metrics` for one label, plus AUC error bounds and PR-AUC.
+        """
+        c = {k: int(v[label]) for k, v in self._label_counts(threshold).items()}
+        prec, rec, f1 = (float(x) for x in self._prf(c["tp"], c["fp"], c["fn"]))
+        total = max(sum(c.values()), 1)
+        return {
+            "threshold": float(threshold),
+            "precision": prec,
+            "recall": rec,
+            "f1": f1,
+            "accuracy": float((c["tp"] + c["tn"]) / total),
+            **self._curve_aucs(self.pos_hist[label], self.neg_hist[label]),
+            "confusion_matrix": {"tn": c["tn"], "fp": c["fp"], "fn": c["fn"], "tp": c["tp"]},
+        }
@@ -0,0 +1,152 @@
+from __future__ import annotations
+import os
+import sys
+import time
+import random
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional, Tuple
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class RequestProfiler:
+    """
+    Opt-in sampling profiler for inference requests.
+
+    Requests are wrapped with `request()`. A background thread periodically
+    captures the Python stack of request threads that are being profiled: a
+    random `sample_rate` fraction of requests from their start, and any request
+    once it has run longer than `slow_ms`. Stacks are aggregated in memory and
+    written every `flush_interval_s` as collapsed-stack files (one
+    `frame;frame;... count` line per stack) that flamegraph.pl or speedscope
+    can render directly.
+
+    The sampler's own CPU time is kept below `max_cpu_fraction` of wall time;
+    samples that would exceed the budget are skipped and counted.
+    Config keys: runtime.yaml -> profiling
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.sample_rate = float(config.get("sample_rate", 0.01))
+        self.slow_ms = config.get("slow_ms", 200)
+        self.interval_s = float(config.get("interval_ms", 5)) / 1000.0
+        self.max_cpu_fraction = float(config.get("max_cpu_fraction", 0.02))
+        self.flush_interval_s = float(config.get("flush_interval_s", 60))
+        self.max_depth = int(config.get("max_depth", 64))
+        self.out_dir = config.get("dir", "reports/profiles")
+        self._root = os.getcwd() + os.sep
+
+        self._active: Dict[int, Tuple[float, bool]] = {}
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._samples = 0
+        self._skipped = 0
+        self._files = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @contextmanager
+    def request(self) -> Iterator[None]:
+        """
+        Mark the current thread as serving a request for the duration of the block.
+        """
+        if self._thread is None:
+            self._start()
+        tid = threading.get_ident()
+        self._active[tid] = (time.perf_counter(), random.random() < self.sample_rate)
+        self._wake.set()
+        try:
+            yield
+        finally:
+            self._active.pop(tid, None)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def _frame_name(self, frame) -> str:
+        code = frame.f_code
+        path = code.co_filename
+        path = path[len(self._root):] if path.startswith(self._root) else os.path.basename(path)
+        return f"{path}:{code.co_name}"
+
+    def _collapse(self, frame) -> str:
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            names.append(self._frame_name(frame))
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _sample(self, now: float):
+        slow_s = None if self.slow_ms is None else float(self.slow_ms) / 1000.0
+        targets = [
+            tid for tid, (start, sampled) in list(self._active.items())
+            if sampled or (slow_s is not None and now - start >= slow_s)
+        ]
+        if not targets:
+            return
+        frames = sys._current_frames()
+        stacks = [self._collapse(frames[tid]) for tid in targets if tid in frames]
+        with self._lock:
+            self._counts.update(stacks)
+            self._samples += len(stacks)
+
+    def _run(self):
+        window_start = time.perf_counter()
+        cpu_used = 0.0
+        last_flush = window_start
+        while not self._stop.is_set():
+            if not self._active:
+                self._wake.clear()
+                self._wake.wait(self.flush_interval_s)
+            now = time.perf_counter()
+            if now - last_flush >= self.flush_interval_s:
+                self.flush()
+                last_flush = now
+                window_start, cpu_used = now, 0.0
+            if self._active:
+                if cpu_used > self.max_cpu_fraction * max(now - window_start, self.interval_s):
+                    self._skipped += 1
+                else:
+                    t0 = time.thread_time()
+                    self._sample(now)
+                    cpu_used += time.thread_time() - t0
+            self._stop.wait(self.interval_s)
+
+    def flush(self) -> Optional[str]:
+        """
+        Write aggregated stacks collected since the last flush.
+
+        Returns:
+            Path of the written collapsed-stack file, or None if nothing was sampled
+        """
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        if not counts:
+            return None
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = os.path.join(self.out_dir, f"profile-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._files:04d}.collapsed")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in counts.most_common():
+                f.write(f"{stack} {n}\n")
+        self._files += 1
+        logger.info("Profile written", extra={"context": {"path": path, "stacks": len(counts)}})
+        return path
+
+    def stats(self) -> Dict[str, Any]:
+        return {"samples": self._samples, "skipped_over_budget": self._skipped, "files": self._files}
+
+    def close(self):
+        """
+        Stop sampling and write any remaining stacks.
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
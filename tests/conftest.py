@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+def pytest_configure(config):
+    # Loggers are created at import time: route their files to a temporary directory
+    # before any test module imports src, so test runs never write reports/logs/
+    os.environ["AI_SAFETY_LOG_DIR"] = tempfile.mkdtemp(prefix="ai_safety_test_logs_")
@@ -1,5 +1,6 @@
 from src.models.abuse_detector import AbuseDetector
 from src.models.crisis_detector import CrisisDetector
+from src.models.content_filter import ContentFilter
 
 def test_abuse_detector_fit_predict():
     config = {
@@ -27,3 +28,248 @@ def test_crisis_detector_fit_predict():
     assert isinstance(out, list)
     assert "score" in out[0]
     assert out[0]["label"] in ("crisis", "non-crisis")
+
+def test_content_filter_rule_flags():
+    cf = ContentFilter({"rules": {"sexual_keywords": ["sex"], "violence_keywords": ["kill", "killer"]}})
+    flags = cf.rule_flags("The KILLER left")
+    assert flags == {"sexual": False, "violence": True, "substances": False}
+    assert cf.matcher.find("skills and killers") == {"kill", "killer"}
+
+def test_compact_pipeline_matches_original():
+    import numpy as np
+    from src.models.compact_head import compact_pipeline, linear_head_params
+
+    model = AbuseDetector({"labels": ["toxic", "threat"], "sklearn": {"vectorizer_max_features": 1000, "c": 1.0}})
+    texts = ["you are kind", "i will hurt you", "you are an idiot", "have a nice day"]
+    model.fit(texts, [[], ["threat"], ["toxic"], []])
+    base = model.predict_proba(texts)
+
+    exact = compact_pipeline(model.pipeline, tol=0.0, dtype="float32")
+    assert np.allclose(exact.predict_proba(texts), base, atol=1e-5)
+
+    _, coef, _ = linear_head_params(model.pipeline)
+    tol = float(np.median(np.abs(coef).max(axis=0)))
+    pruned = compact_pipeline(model.pipeline, tol=tol, dtype="int8")
+    assert len(pruned.named_steps["tfidf"].vocabulary_) < len(model.pipeline.named_steps["tfidf"].vocabulary_)
+    assert pruned.named_steps["clf"].coef.dtype == np.int8
+    assert np.abs(pruned.predict_proba(texts) - base).max() < 0.2
+
+def test_escalation_registry_persists_sessions(tmp_path):
+    from src.models.escalation_store import SQLiteEscalationStore, SessionEscalationRegistry
+
+    path = str(tmp_path / "escalation.sqlite")
+    kwargs = {"ewma_alpha": 0.3, "slope_window": 3, "risk_floor": 0.05}
+    reg = SessionEscalationRegistry(kwargs, SQLiteEscalationStore(path), flush_interval_s=0)
+    for r in (0.2, 0.6, 0.9):
+        last = reg.update("s1", r)
+    reg.update("s2", 0.1)
+    assert reg.flush() == 2
+    reg.close()
+
+    restored = SessionEscalationRegistry(kwargs, SQLiteEscalationStore(path), flush_interval_s=0)
+    tracker = restored.get("s1")  # loaded lazily from disk
+    assert tracker.ewma == last["ewma"]
+    assert list(tracker.history) == last["history"]
+    assert restored.compact(now=10**12) == 1
+    assert restored.store.load("s2") is None
+    restored.close()
+
+def test_escalation_registry_bounded_without_store_and_loads_unlocked(tmp_path):
+    import threading
+    from src.models.escalation_store import SQLiteEscalationStore, SessionEscalationRegistry
+
+    kwargs = {"ewma_alpha": 0.3, "slope_window": 3, "risk_floor": 0.05}
+    reg = SessionEscalationRegistry(kwargs, flush_interval_s=0, session_ttl_s=0, max_sessions=100)
+    for i in range(5000):
+        reg.step(f"s{i}", 0.5)
+    assert len(reg) <= 100 and reg.get("s4999").ewma > 0  # most recent sessions survive
+    assert reg.shrink(10) > 0 and len(reg) == 10
+    assert reg.compact(now=10**12) == 10 and len(reg) == 0
+
+    # A slow store read does not block updates of resident sessions
+    class SlowStore(SQLiteEscalationStore):
+        def load(self, session_id):
+            entered.set()
+            release.wait(5)
+            return super().load(session_id)
+
+    entered, release = threading.Event(), threading.Event()
+    slow = SessionEscalationRegistry(kwargs, SlowStore(str(tmp_path / "e.sqlite")), flush_interval_s=0)
+    slow.import_state("resident", {"ewma": 0.1, "history": [0.1], "times": []})
+    loader = threading.Thread(target=slow.step, args=("cold", 0.9))
+    loader.start()
+    assert entered.wait(5)
+    slow.step("resident", 0.5)  # would deadlock-wait behind the load if it held the lock
+    release.set()
+    loader.join(5)
+    assert {"resident", "cold"} <= set(slow.session_ids())
+    slow.close()
+
+def test_top_feature_explainer_matches_dense_contributions():
+    import numpy as np
+    from src.models.explain import TopFeatureExplainer
+
+    model = AbuseDetector({"labels": ["toxic", "threat"], "sklearn": {"vectorizer_max_features": 1000, "c": 10.0}})
+    texts = ["you are kind", "i will hurt you", "you are an idiot", "have a nice day"]
+    model.fit(texts, [[], ["threat"], ["toxic"], []])
+    explainer = TopFeatureExplainer(model.pipeline, model.labels)
+    out = explainer.explain(["i will hurt you idiot", "have a nice day"], k=2)
+
+    vec = model.pipeline.named_steps["tfidf"]
+    x = vec.transform(["i will hurt you idiot"]).toarray()[0]
+    coef = model.pipeline.named_steps["clf"].estimators_[1].coef_[0]
+    dense = x * coef
+    vocab = vec.vocabulary_
+    best = np.sort(dense[dense > 0])[::-1][:2]
+    assert np.allclose([w for _, w in out[0]["threat"]], best, atol=1e-5)
+    assert all(np.isclose(dense[vocab[t]], w, atol=1e-5) for t, w in out[0]["threat"])
+    assert set(out[1]) == {"toxic", "threat"}
+
+def test_metric_accumulator_matches_in_memory_metrics():
+    import numpy as np
+    from src.utils.metrics import MetricAccumulator, multilabel_metrics
+
+    rng = np.random.default_rng(0)
+    Y = (rng.random((4000, 2)) < [0.1, 0.3]).astype(int)
+    P = np.clip(Y * 0.3 + rng.random((4000, 2)) * 0.7, 0, 1)
+    left, right = MetricAccumulator(2, thresholds=[0.5]), MetricAccumulator(2, thresholds=[0.5])
+    for start in range(0, 2000, 500):
+        left.update(Y[start:start + 500], P[start:start + 500])
+    right.update(Y[2000:], P[2000:])
+    got = left.merge(right).multilabel_metrics(0.5)
+    ref = multilabel_metrics(Y, P, threshold=0.5)
+
+    assert got["n_samples"] == 4000
+    for key in ("precision_macro", "recall_macro", "f1_macro", "f1_micro"):
+        assert np.isclose(got[key], ref[key])
+    for name in ("label_0", "label_1"):
+        pl = got["per_label"][name]
+        assert abs(pl["roc_auc"] - ref["per_label"][name]["roc_auc"]) <= pl["roc_auc_error_bound"]
+
+def test_warm_start_keeps_vocabulary_and_updates_heads():
+    import numpy as np
+
+    cfg = {"labels": ["toxic", "threat"], "sklearn": {"vectorizer_max_features": 1000}}
+    texts = ["you are kind", "i will hurt you", "you are an idiot", "have a nice day"]
+    labels = [[], ["threat"], ["toxic"], []]
+    model = AbuseDetector(cfg).fit(texts, labels)
+    vocab = dict(model.pipeline.named_steps["tfidf"].vocabulary_)
+    before = model.predict_proba(["what an idiot"])[0, 0]
+
+    delta = ["total idiot", "idiot again", "such an idiot"]
+    summary = model.warm_start(texts + delta, labels + [["toxic"]] * 3, refresh_idf=True, max_iter=50)
+
+    assert summary["heads_updated"] == 2 and summary["idf_refreshed"]
+    assert model.pipeline.named_steps["tfidf"].vocabulary_ == vocab
+    assert model.predict_proba(["what an idiot"])[0, 0] > before
+    assert np.isfinite(model.predict_proba(["hello"])).all()
+
+def _tiny_checkpoint(path, id2label, problem_type):
+    # Randomly initialized one-layer BERT with a word-level vocabulary, built locally
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizer
+
+    path.mkdir()
+    words = "you are kind i will hurt you need help want to die let's watch a movie hello friend".split()
+    (path / "vocab.txt").write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", *dict.fromkeys(words)]))
+    BertTokenizer(str(path / "vocab.txt")).save_pretrained(str(path))
+    config = BertConfig(
+        vocab_size=64, hidden_size=16, num_hidden_layers=1, num_attention_heads=2, intermediate_size=32,
+        num_labels=len(id2label), id2label=id2label, label2id={v: k for k, v in id2label.items()},
+        problem_type=problem_type,
+    )
+    BertForSequenceClassification(config).save_pretrained(str(path))
+
+def test_transformers_backend_buckets_by_length(tmp_path):
+    import numpy as np
+    import pytest
+    pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+
+    # Checkpoint label order differs from the configured labels: columns are matched by name
+    _tiny_checkpoint(tmp_path / "abuse_transformer", {0: "threat", 1: "toxic"}, "multi_label_classification")
+    _tiny_checkpoint(tmp_path / "crisis_transformer", {0: "non-crisis", 1: "crisis"}, "single_label_classification")
+    texts = ["hello", "i will hurt you you you", "need help", "let's watch a movie hello friend", "you are kind"]
+
+    cfg = {"labels": ["toxic", "threat"], "backend": "transformers", "transformers": {"batch_size": 2, "num_threads": 1}}
+    abuse = AbuseDetector(cfg, model_dir=str(tmp_path))
+    probs = abuse.predict_proba(texts)
+    single = np.vstack([abuse.predict_proba([t]) for t in texts])  # unpadded
+    assert probs.shape == (5, 2) and np.allclose(probs, single, atol=1e-5)
+    raw = abuse.transformer.predict_proba(texts)
+    assert np.allclose(probs[:, 0], raw[:, 1]) and np.allclose(probs[:, 1], raw[:, 0])
+    lengths = [3, 9, 4, 10, 5]
+    assert abuse.transformer._batches(lengths) == [[0, 2], [4, 1], [3]]
+    with pytest.raises(RuntimeError):
+        abuse.fit(texts, [[]] * 5)
+
+    crisis = CrisisDetector({"backend": "transformers", "transformers": {"quantize": True}}, model_dir=str(tmp_path))
+    p = crisis.predict_proba(texts)
+    assert p.shape == (5,) and np.all((p >= 0) & (p <= 1))
+    assert crisis.predict(texts[:1])[0]["label"] in ("crisis", "non-crisis")
+
+def test_fast_tfidf_matches_saved_vectorizers():
+    import os
+    import joblib
+    import numpy as np
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from src.models.compact_head import compact_pipeline
+    from src.models.fast_tfidf import FastTfidf, fast_featurizer
+
+    model = AbuseDetector({"labels": ["toxic", "threat"], "sklearn": {"vectorizer_max_features": 1000, "c": 1.0}})
+    model.fit(["you are kind", "i will hurt you", "you are an idiot", "have a nice day"], [[], ["threat"], ["toxic"], []])
+    vectorizers = [
+        model.pipeline.named_steps["tfidf"],
+        compact_pipeline(model.pipeline, tol=0.0).named_steps["tfidf"],  # pruned, float32
+        TfidfVectorizer(ngram_range=(2, 2), sublinear_tf=True, norm="l1").fit(["you are kind", "are you kind you are"]),
+    ]
+    vectorizers += [
+        joblib.load(f"models/{name}_detector.joblib").pipeline.named_steps["tfidf"]
+        for name in ("abuse", "crisis") if os.path.exists(f"models/{name}_detector.joblib")
+    ]
+    texts = [
+        "You are KIND, you are kind!", "i will hurt you you you", "", "a", "unseen words only",
+        "have a nice day... you IDIOT", "are you kind? kind you are", "ÜBER naïve café",
+    ]
+    for vec in vectorizers:
+        expected, got = vec.transform(texts), FastTfidf(vec).transform(texts)
+        assert got.dtype == expected.dtype and got.has_sorted_indices
+        assert np.array_equal(got.indptr, expected.indptr) and np.array_equal(got.indices, expected.indices)
+        assert np.array_equal(got.data, expected.data)
+
+    vec = vectorizers[0]
+    assert fast_featurizer(vec) is fast_featurizer(vec)
+    assert fast_featurizer(TfidfVectorizer(analyzer="char").fit(["abc"])) is None  # falls back to sklearn
+    assert np.array_equal(model.predict_proba(texts), model.pipeline.predict_proba(texts))
+
+def test_chunked_parallel_evaluation_joins_labels_by_id(tmp_path):
+    import joblib
+    import numpy as np
+    import pandas as pd
+    from scripts.evaluate_models import evaluate
+    from src.utils.metrics import MetricAccumulator
+
+    labels = ["toxic", "threat"]
+    model = AbuseDetector({"labels": labels, "sklearn": {"vectorizer_max_features": 1000, "c": 1.0}})
+    model.fit(["you are kind", "i will hurt you", "you are stupid", "have a nice day"], [[], ["threat", "toxic"], ["toxic"], []])
+    joblib.dump(model, tmp_path / "abuse_detector.joblib")
+
+    rng = np.random.default_rng(0)
+    words = ["kind", "hurt", "stupid", "nice", "day", "you", "will", "are"]
+    texts = [" ".join(rng.choice(words, size=4)) for _ in range(60)]
+    Y = rng.integers(0, 2, size=(60, 2))
+    Y[::9] = -1  # unknown labels are skipped
+    ids = [f"{i:04x}" for i in range(60)]
+    pd.DataFrame({"id": ids, "comment_text": texts}).to_csv(tmp_path / "test.csv", index=False)
+    # Label rows shuffled and one id missing: rows must be matched on id, not position
+    order = rng.permutation(60)[1:]
+    pd.DataFrame({"id": np.array(ids)[order], "toxic": Y[order, 0], "threat": Y[order, 1]}).to_csv(tmp_path / "labels.csv", index=False)
+
+    keep = np.array([i in set(order) and (Y[i] != -1).all() for i in range(60)])
+    expected = MetricAccumulator(2, labels=labels, n_bins=50).update(
+        Y[keep], model.predict_proba([t for t, k in zip(texts, keep) if k])
+    ).multilabel_metrics()
+    args = (str(tmp_path / "test.csv"), str(tmp_path / "labels.csv"), labels, str(tmp_path))
+    single, n_single = evaluate(*args, chunk_size=1000, workers=1, n_bins=50)
+    chunked, n_chunked = evaluate(*args, chunk_size=7, workers=2, n_bins=50)
+    assert n_single == n_chunked == keep.sum()
+    assert single["abuse"].multilabel_metrics() == chunked["abuse"].multilabel_metrics() == expected
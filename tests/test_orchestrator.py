@@ -1,8 +1,10 @@
+import numpy as np
+from src.models.cascade_gate import CascadeGate
 from src.orchestrator.inference_pipeline import InferenceOrchestrator
 
-def test_orchestrator_infer_basic():
+def _configs():
     # Minimal config for testing
-    cfgs = {
+    return {
         "preprocessing": {
             "language_detection": {"enabled": True},
             "normalization": {"lower": True, "strip_urls": True, "strip_punctuation": True, "collapse_whitespace": True, "unicode_nfkc": True},
@@ -47,6 +49,8 @@ def test_orchestrator_infer_basic():
         "ui": {}
     }
 
+def test_orchestrator_infer_basic():
+    cfgs = _configs()
     orch = InferenceOrchestrator(cfgs)
     result = orch.infer("I will kill you", age="13+")
 
@@ -56,3 +60,574 @@ def test_orchestrator_infer_basic():
     assert isinstance(result["crisis"]["score"], float)
     assert isinstance(result["escalation"]["ewma"], float)
     assert isinstance(result["content"]["rule_flags"], dict)
+
+def test_orchestrator_cascade_early_exit():
+    cfgs = _configs()
+    cfgs["models"]["cascade"] = {"enabled": True, "n_features": 256, "c": 100.0, "exit_threshold": 0.3}
+    orch = InferenceOrchestrator(cfgs)
+    orch.load_or_fit_minimal()
+    gate = CascadeGate(cfgs["models"]["cascade"]).fit(
+        ["hello friend", "nice to meet you", "you are an idiot", "i hate you"], [0, 0, 1, 1]
+    )
+    orch.set_cascade_gate(gate)
+
+    benign = orch.infer("hello friend", age="13+")
+    assert benign["cascade"]["exited"] is True
+    assert benign["decision"]["action"] == "allow"
+    assert benign["input"]["preprocessed"] is None
+
+    # Keyword hits always take the full pipeline
+    flagged = orch.infer("I will kill you", age="13+")
+    assert flagged["cascade"]["exited"] is False
+    assert flagged["abuse"]["scores"]
+
+    # ... including keywords written in fullwidth or mixed-case compatibility forms
+    fullwidth = orch.infer("hello friend ＫＩＬＬ", age="13+")
+    assert fullwidth["cascade"]["exited"] is False
+    assert fullwidth["input"]["preprocessed"] is not None
+
+def test_orchestrator_escalation_is_per_session():
+    orch = InferenceOrchestrator(_configs())
+    orch.load_or_fit_minimal()
+    a1 = orch.infer("i will hurt you", age="13+", session_id="a")
+    orch.infer("i will hurt you", age="13+", session_id="a")
+    b1 = orch.infer("i will hurt you", age="13+", session_id="b")
+    assert b1["escalation"]["ewma"] == a1["escalation"]["ewma"]
+    assert len(orch.sessions.get("a").history) == 2
+    orch.close()
+
+def test_orchestrator_bounds_pathological_inputs():
+    import time
+    cfgs = _configs()
+    cfgs["preprocessing"]["long_input"] = {"max_chars": 2000, "window_chars": 1000, "overlap_chars": 100, "max_windows": 8}
+    orch = InferenceOrchestrator(cfgs)
+    orch.load_or_fit_minimal()
+
+    def timed(text):
+        t0 = time.perf_counter()
+        result = orch.infer(text, age="13+")
+        return time.perf_counter() - t0, result
+
+    adversarial = [
+        "12-",  # digit groups that make phone regexes backtrack
+        "1 ",   # one long run of digit groups for the PII scanner
+        "(1) ",
+        "a",    # one giant token
+        "x@",   # email-like noise
+    ]
+    for unit in adversarial:
+        # Work is bounded by the windows: 100x more input must not take notably longer
+        small = min(timed(unit * (20000 // len(unit)))[0] for _ in range(2))
+        large, result = timed(unit * (2000000 // len(unit)) + " i will hurt you")
+        assert large < 3 * small + 0.05, (unit, small, large)
+        assert result["input"]["windows"] <= 8
+        assert result["crisis"]["flags"]["harm"] is True  # the last window is always scored
+
+def test_long_input_masks_pii_across_window_boundaries():
+    cfgs = _configs()
+    cfgs["preprocessing"]["long_input"] = {"max_chars": 2000, "window_chars": 1000, "overlap_chars": 100, "max_windows": 8}
+    orch = InferenceOrchestrator(cfgs)
+    orch.load_or_fit_minimal()
+    # Both entities start just before the first window boundary (char 1000)
+    text = "x" * 975 + " mail johndoesecret@example.com or card 4111 1111 1111 1111 " + "y " * 800
+    pre = orch.preprocess(text, detect_lang=False)
+    assert len(pre["windows"]) > 1
+    assert not any(s in w for w in pre["windows"] for s in ("johndoe", "example", "4111"))
+    assert "email" in pre["windows"][0] or "email" in pre["windows"][1]
+
+def test_orchestrator_explanations_only_when_needed():
+    cfgs = _configs()
+    cfgs["policy"]["explainability"] = {"include_top_features": True, "top_k": 3}
+    orch = InferenceOrchestrator(cfgs)
+    orch.load_or_fit_minimal()
+
+    results = orch.infer_batch(["hello friend", "i will hurt you"], ["13+", "13+"])
+    for r in results:
+        assert ("explanations" in r) == (r["decision"]["action"] != "allow")
+
+    forced = orch.infer("hello friend", age="13+", explain=True)
+    assert set(forced["explanations"]["abuse"]) == {"toxic", "threat"}
+    assert isinstance(forced["explanations"]["crisis"], list)
+
+def test_explanations_with_minimal_models_and_constant_heads(monkeypatch):
+    # The shipped label set: minimal data has no positives for most labels (constant heads)
+    cfgs = _configs()
+    cfgs["models"]["abuse"]["labels"] = ["toxic", "severe_toxic", "obscene", "threat", "insult", "identity_hate"]
+    cfgs["policy"]["explainability"] = {"include_top_features": True, "top_k": 3}
+    orch = InferenceOrchestrator(cfgs)
+    orch.load_or_fit_minimal()
+    r = orch.infer("i will hurt you idiot", "13+", explain=True)
+    assert r["explanations"]["abuse"]["obscene"] == [] and "degraded" not in r
+
+    # A failing explainer degrades the result instead of failing the request
+    def boom(*args, **kwargs):
+        raise RuntimeError("explainer unavailable")
+    monkeypatch.setattr(orch, "_attach_explanations", boom)
+    r = orch.infer("i will hurt you idiot", "13+", explain=True)
+    assert "explanations" not in r and r["degraded"] == ["explanations"] and r["decision"]["action"]
+
+def test_bulk_mode_reads_and_scores_in_chunks():
+    from src.config_loader import config_version
+    from src.orchestrator.bulk import iter_bulk, read_messages
+
+    orch = InferenceOrchestrator(_configs())
+    orch.load_or_fit_minimal()
+    csv = b"text,age,session_id\nhello friend,7+,s1\ni will hurt you,,s1\nlet's watch a movie,18+,\n"
+    messages = read_messages(csv, "upload.csv", default_age="13+")
+    assert messages["age"].tolist() == ["7+", "13+", "18+"]
+    assert messages["session_id"].tolist() == ["s1", "s1", None]
+
+    seen = []
+    chunks = list(iter_bulk(orch, messages, chunk_size=2, progress=lambda d, t: seen.append((d, t))))
+    rows = [r for c in chunks for r in c]
+    assert [len(c) for c in chunks] == [2, 1] and seen == [(2, 3), (3, 3)]
+    assert [r["text"] for r in rows] == messages["text"].tolist()
+    assert {"action", "max_risk", "abuse_toxic"} <= set(rows[0])
+
+    jsonl = b'{"message": "hello"}\n{"message": "bye"}\n'
+    assert read_messages(jsonl, "upload.jsonl")["text"].tolist() == ["hello", "bye"]
+    # Integer session ids stay exact strings, also in a column with gaps
+    jsonl = b'{"text": "a", "session_id": 5}\n{"text": "b"}\n\n{"text": "c", "session_id": 12345678901234567890}\n'
+    assert read_messages(jsonl, "upload.jsonl")["session_id"].tolist() == ["5", None, "12345678901234567890"]
+    assert read_messages(b"text,session_id\na,5\nb,\nc,007\n", "upload.csv")["session_id"].tolist() == ["5", None, "007"]
+    assert config_version({"a": 1}) == config_version({"a": 1}) != config_version({"a": 2})
+
+def test_audit_log_roundtrip_rotation_and_drops(tmp_path):
+    from src.utils.audit_log import AuditLog, read_audit_log
+
+    cfgs = _configs()
+    cfgs["runtime"] = {"audit": {"enabled": True, "dir": str(tmp_path), "flush_interval_s": 60, "rotate_bytes": 1}}
+    orch = InferenceOrchestrator(cfgs)
+    orch.load_or_fit_minimal()
+    texts = ["hello friend", "i will hurt you", "need help i want to die"]
+    results = orch.infer_batch(texts, ["13+"] * 3, ["s1", "s1", None])
+    orch.audit.flush()
+    orch.infer("let's watch a movie", age="7+")
+    orch.close()
+
+    meta, rec = read_audit_log(str(tmp_path))
+    assert len(rec) == 4 and orch.audit.stats()["segments"] == 2
+    assert meta["model_version"] == "minimal" and meta["config_version"] == orch.config_version
+    assert [meta["actions"][a] for a in rec["action"][:3]] == [r["decision"]["action"] for r in results]
+    assert rec["session_id"].tolist()[:3] == [b"s1", b"s1", b""]
+    assert rec["abuse_threat"][1] == np.float32(results[1]["abuse"]["scores"]["threat"])
+
+    audit = AuditLog({"dir": str(tmp_path / "drops"), "max_queue": 2, "flush_interval_s": 60},
+                     abuse_labels=[], content_flags=[], crisis_flags=[])
+    assert audit.submit(results, ["13+"] * 3) == 2
+    assert audit.stats()["dropped"] == 1
+    audit.close()
+
+def test_request_profiler_writes_collapsed_stacks(tmp_path):
+    import time
+    from src.utils.profiler import RequestProfiler
+
+    def slow_handler():
+        time.sleep(0.15)
+
+    profiler = RequestProfiler({"dir": str(tmp_path), "sample_rate": 0.0, "slow_ms": 50,
+                                "interval_ms": 2, "max_cpu_fraction": 1.0, "flush_interval_s": 60})
+    with profiler.request():
+        time.sleep(0.01)  # fast request: never sampled
+    assert profiler.stats()["samples"] == 0
+    with profiler.request():
+        slow_handler()
+    profiler.close()
+
+    files = list(tmp_path.glob("*.collapsed"))
+    assert len(files) == 1
+    lines = files[0].read_text().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("slow_handler" in line for line in lines)
+
+def test_near_duplicates_reuse_leader_scores():
+    from src.models.near_duplicate import NearDuplicateIndex
+
+    index = NearDuplicateIndex({"threshold": 0.7})
+    sig = index.signature("join the raid on the server now")
+    index.add(sig, {"id": 1}, now=0.0)
+    assert index.query(index.signature("JOIN the raid on the server now!!! 🔥"), now=1.0).payload == {"id": 1}
+    assert index.query(index.signature("lets watch a movie tonight"), now=1.0) is None
+    assert index.query(sig, now=1000.0) is None and len(index) == 0  # expired
+
+    cfgs = _configs()
+    cfgs["models"]["near_duplicate"] = {"enabled": True, "boost_per_repeat": 0.1, "max_boost": 0.15}
+    orch = InferenceOrchestrator(cfgs)
+    orch.load_or_fit_minimal()
+    texts = ["i will hurt you", "hello friend", "i will hurt you!!", "I will hurt you 😡", "i will hurt you..."]
+    results = orch.infer_batch(texts, ["13+"] * 5)
+    assert "near_duplicate" not in results[0] and "near_duplicate" not in results[1]
+    assert [r["near_duplicate"]["repeats"] for r in results[2:]] == [1, 2, 3]
+    leader = results[0]["abuse"]["scores"]["threat"]
+    boosted = [r["abuse"]["scores"]["threat"] for r in results[2:]]
+    assert np.allclose(boosted, [leader + 0.1, leader + 0.15, leader + 0.15])
+    assert results[3]["crisis"]["flags"] == results[0]["crisis"]["flags"]
+    assert orch.metrics_snapshot()["near_duplicate"]["hits"] == 3
+
+def test_latency_budget_degrades_optional_stages_in_order():
+    from src.utils.latency_budget import LatencyBudget
+
+    budget = LatencyBudget(2500, ["explanations", "language_detection"])
+    plan = {"explanations": 1.0, "language_detection": 1.0, "crisis": 1.0}
+    assert budget.keep("explanations", plan) is False  # would leave too little for the stages that outrank it
+    assert budget.keep("language_detection", plan) is True
+    assert LatencyBudget(None, ["explanations"]).keep("explanations", plan) is True
+
+    cfgs = _configs()
+    cfgs["policy"]["explainability"] = {"include_top_features": True}
+    orch = InferenceOrchestrator(cfgs)
+    orch.load_or_fit_minimal()
+    relaxed = orch.infer("i want to die", age="13+", explain=True)
+    assert "degraded" not in relaxed and "explanations" in relaxed
+
+    tight = orch.infer("i want to die", age="13+", explain=True, budget_ms=0.001)
+    assert tight["degraded"] == ["language_detection", "content_classifier", "explanations"]
+    assert tight["crisis"]["score"] == relaxed["crisis"]["score"]
+    assert tight["content"]["suggested_min_age"] is None and "explanations" not in tight
+    stats = orch.metrics_snapshot()["latency_budget"]
+    assert stats["requests"] == 1 and stats["degraded"]["content_classifier"] == 1
+
+def test_shadow_mode_compares_candidate_off_the_request_path(tmp_path):
+    import joblib
+
+    primary = InferenceOrchestrator(_configs())
+    primary.load_or_fit_minimal()
+    joblib.dump(primary.abuse, tmp_path / "abuse_detector.joblib")
+    joblib.dump(primary.crisis, tmp_path / "crisis_detector.joblib")
+
+    cfgs = _configs()
+    cfgs["runtime"] = {"shadow": {"enabled": True, "model_dir": str(tmp_path), "sample_rate": 1.0, "report_interval_s": 0.2}}
+    orch = InferenceOrchestrator(cfgs)
+    orch.load_or_fit_minimal()
+    texts = ["hello friend", "i will hurt you", "need help i want to die", "let's watch a movie"]
+    orch.infer_batch(texts, ["13+"] * 4)
+    orch.infer("you are stupid", age="13+")
+    orch.close()
+
+    stats = orch.metrics_snapshot()["shadow"]
+    assert stats["submitted"] == 5 and stats["dropped"] == 0
+    assert stats["messages"] == 5 and stats["action_agreement"] == 1.0
+    # The candidate is the primary model set: every score delta is zero
+    assert all(h["mean_abs_delta"] < 1e-9 and h["label_flip_rate"] == 0.0 for h in stats["heads"].values())
+    assert stats["latency_ms_per_msg"]["p50"] is not None
+
+def test_drift_monitor_psi_windows_and_merge(tmp_path):
+    import joblib
+    import yaml
+    from src.utils.audit_log import ACTIONS
+    from src.utils.drift_monitor import DriftMonitor, build_reference, risk_actions
+
+    rng = np.random.default_rng(0)
+    actions_cfg = {"allow_max_risk": 0.4, "warn_max_risk": 0.7}
+    reference = build_reference(["toxic", "crisis"], rng.beta(1, 4, size=(5000, 2)), actions_cfg, n_bins=10)
+    cfg = {"window_s": 60, "min_count": 100, "psi_alert": 0.2}
+
+    stable, shifted = DriftMonitor(cfg, reference), DriftMonitor(cfg, reference)
+    live = rng.beta(1, 4, size=(2000, 2))
+    live_actions = [ACTIONS[c] for c in risk_actions(live.max(axis=1), actions_cfg)]
+    stable.observe_batch(["toxic", "crisis"], live, live_actions, now=0.0)
+    shifted.observe_batch(["crisis", "toxic"], rng.beta(4, 1, size=(2000, 2)), ["block"] * 2000, now=0.0)
+    assert stable.snapshot()["drifting"] == []
+    assert shifted.snapshot()["drifting"] == ["actions", "crisis", "toxic"]
+
+    # Windows from several workers merge by window start
+    stable.observe_batch(["toxic", "crisis"], np.full((10, 2), np.nan), ["warn"] * 10, now=61.0)
+    merged = DriftMonitor(cfg, reference).merge(stable).merge(shifted)
+    windows = merged.snapshot()["windows"]
+    assert list(windows) == ["0", "60"]
+    assert windows["0"]["n"] == 4000 and windows["60"]["heads"]["toxic"]["n"] == 0
+
+    # Orchestrator: reference exported next to the models enables monitoring
+    base = InferenceOrchestrator(_configs())
+    base.load_or_fit_minimal()
+    joblib.dump(base.abuse, tmp_path / "abuse_detector.joblib")
+    joblib.dump(base.crisis, tmp_path / "crisis_detector.joblib")
+    with open(tmp_path / "score_reference.yaml", "w", encoding="utf-8") as f:
+        yaml.safe_dump(build_reference(["toxic", "threat", "crisis"], rng.random((100, 3)), actions_cfg), f)
+    cfgs = _configs()
+    cfgs["runtime"] = {"drift": {"enabled": True, "min_count": 1}}
+    orch = InferenceOrchestrator(cfgs)
+    orch.load_models_from_disk(str(tmp_path))
+    orch.infer_batch(["hello friend", "i will hurt you"], ["13+", "13+"])
+    (window,) = orch.metrics_snapshot()["drift"]["windows"].values()
+    assert window["n"] == 2 and window["heads"]["crisis"]["n"] == 2
+
+    # The reference is scored on the serving path, so it matches what live traffic is compared with
+    cfgs = _configs()
+    cfgs["preprocessing"]["long_input"] = {"max_chars": 200, "window_chars": 100, "overlap_chars": 20}
+    orch = InferenceOrchestrator(cfgs)
+    orch.load_or_fit_minimal()
+    texts = ["Hello FRIEND!!! https://x.io", "i will hurt you, mail me at a@b.com", "help " * 30 + "i want to die " * 20]
+    served = orch.infer_compact(texts, ["13+"] * 3).scores
+    assert np.allclose(orch.head_scores(texts, chunk_size=2), served)
+    assert not np.allclose(orch.abuse.predict_proba(texts), served[:, :-1])
+
+def test_language_router_lazy_loads_and_falls_back(tmp_path, monkeypatch):
+    import joblib
+    import src.orchestrator.inference_pipeline as pipeline
+
+    base = InferenceOrchestrator(_configs())
+    base.load_or_fit_minimal()
+    for lang in ("hi", "ta"):
+        (tmp_path / lang).mkdir()
+        joblib.dump(base.abuse, tmp_path / lang / "abuse_detector.joblib")
+        joblib.dump(base.crisis, tmp_path / lang / "crisis_detector.joblib")
+
+    langs = {"namaste dost": "hi", "kasa kay mitra": "mr", "hallo freund": "de", "vanakkam nanba": "ta"}
+    monkeypatch.setattr(pipeline, "detect_language", lambda text, keep_unsupported=False: (langs.get(text, "en"), 1.0))
+    cfgs = _configs()
+    cfgs["models"]["languages"] = {
+        "model_sets": {"hi": str(tmp_path / "hi"), "ta": str(tmp_path / "ta"), "bn": str(tmp_path / "missing")},
+        "fallback": {"mr": "hi", "bn": "hi"},
+        "max_loaded": 1,
+    }
+    orch = InferenceOrchestrator(cfgs)
+    orch.load_or_fit_minimal()
+    assert orch.router.chain("mr") == ["mr", "hi", "en"]
+    assert orch.metrics_snapshot()["languages"]["loaded"] == []  # nothing loaded until traffic arrives
+
+    texts = ["namaste dost", "kasa kay mitra", "hallo freund", "i will kill you"]
+    results = orch.infer_batch(texts, ["13+"] * 4)
+    assert [r["input"]["model_lang"] for r in results] == ["hi", "hi", "en", "en"]
+    # Same weights under every language, so routing must not change the scores
+    alone = base.infer_batch(texts, ["13+"] * 4)
+    assert [r["abuse"]["scores"] for r in results] == [r["abuse"]["scores"] for r in alone]
+
+    # An unloadable set falls back along its chain; max_loaded=1 evicts the idle set
+    key, abuse, _ = orch.router.resolve("bn", (orch.abuse, orch.crisis))
+    assert key == "hi" and abuse is not orch.abuse
+    orch.infer("vanakkam nanba", age="13+")
+    stats = orch.metrics_snapshot()["languages"]
+    assert stats["loaded"] == ["ta"] and stats["loads"] == 2 and stats["evictions"] == 1
+
+def test_language_router_loads_outside_its_lock(tmp_path, monkeypatch):
+    import threading
+    import joblib
+    import src.models.language_router as language_router
+    from src.models.language_router import LanguageModelRouter
+
+    base = InferenceOrchestrator(_configs())
+    base.load_or_fit_minimal()
+    (tmp_path / "hi").mkdir()
+    joblib.dump(base.abuse, tmp_path / "hi" / "abuse_detector.joblib")
+    joblib.dump(base.crisis, tmp_path / "hi" / "crisis_detector.joblib")
+    router = LanguageModelRouter({"model_sets": {"hi": str(tmp_path / "hi")}})
+    primary = (base.abuse, base.crisis)
+
+    loading, release = threading.Event(), threading.Event()
+    real_load = joblib.load
+
+    def slow_load(path):
+        loading.set()
+        release.wait(5)
+        return real_load(path)
+
+    monkeypatch.setattr(language_router.joblib, "load", slow_load)
+    results = []
+    loaders = [threading.Thread(target=lambda: results.append(router.resolve("hi", primary))) for _ in range(2)]
+    for t in loaders:
+        t.start()
+    assert loading.wait(5)
+    # Traffic for the default language is routed while the load is still reading from disk
+    done = threading.Event()
+    threading.Thread(target=lambda: (router.resolve("en", primary), done.set())).start()
+    assert done.wait(2)
+    release.set()
+    for t in loaders:
+        t.join(5)
+    assert [r[0] for r in results] == ["hi", "hi"] and results[0][1] is results[1][1]
+    assert router.stats()["loads"] == 1
+
+def test_compact_results_render_like_result_dicts():
+    import json
+
+    cfgs = _configs()
+    cfgs["models"]["cascade"] = {"enabled": True, "n_features": 256, "c": 100.0, "exit_threshold": 0.3}
+    texts = ["hello friend", "I will kill you", "i want to die, i will hurt myself", "you are an idiot " * 200]
+    ages = ["13+"] * len(texts)
+    runs = []
+    for _ in range(2):
+        orch = InferenceOrchestrator(cfgs)
+        orch.load_or_fit_minimal()
+        orch.set_cascade_gate(CascadeGate(cfgs["models"]["cascade"]).fit(
+            ["hello friend", "nice to meet you", "you are an idiot", "i hate you"], [0, 0, 1, 1]
+        ))
+        runs.append(orch)
+    legacy = runs[0].infer_batch(texts, ages, ["s1"] * 4, explain=True)
+    batch = runs[1].infer_compact(texts, ages, ["s1"] * 4, explain=True)
+
+    assert len(batch) == 4 and batch.exited.tolist() == [True, False, False, False]
+    assert batch.to_dicts() == legacy
+    assert [json.loads(line) for line in batch.to_jsonl().split("\n")] == json.loads(json.dumps(legacy))
+    assert json.loads(batch[2].to_json()) == legacy[2]
+
+    # Label sets are bitmasks over the label order
+    assert [batch.abuse_labels[j] for j in range(2) if int(batch.abuse_mask[1]) >> j & 1] == legacy[1]["abuse"]["labels"]
+    assert int(batch.crisis_mask[2]) & 1 == (legacy[2]["crisis"]["label"] == "crisis")
+
+    # Views read like the legacy dicts; top-level assignments are kept
+    view = batch[-1]
+    assert view["decision"]["action"] == view.action == legacy[3]["decision"]["action"]
+    assert view["input"]["windows"] == legacy[3]["input"]["windows"]
+    assert view.get("near_duplicate") is None and "explanations" in view
+    view["event"] = {"session_id": "s1"}
+    assert batch.to_dict(3)["event"] == {"session_id": "s1"}
+
+def test_memory_report_shrinks_caches_and_refuses_loads(tmp_path):
+    import joblib
+    import pytest
+    from src.utils.memory_accounting import MemoryBudgetExceeded, deep_sizeof
+
+    assert deep_sizeof(np.zeros(1000)) >= 8000
+    shared = list(range(100))
+    seen = set()
+    assert deep_sizeof({"a": shared}, seen) > 0 and deep_sizeof(shared, seen) == 0  # counted once
+
+    base = InferenceOrchestrator(_configs())
+    base.load_or_fit_minimal()
+    joblib.dump(base.abuse, tmp_path / "abuse_detector.joblib")
+    joblib.dump(base.crisis, tmp_path / "crisis_detector.joblib")
+
+    cfgs = _configs()
+    cfgs["models"]["near_duplicate"] = {"enabled": True, "window_s": 3600}
+    cfgs["runtime"] = {"memory": {"enabled": True}}
+    orch = InferenceOrchestrator(cfgs)
+    orch.load_models_from_disk(str(tmp_path))
+    orch.infer_batch([f"message number {i} about topic {i * 7}" for i in range(200)], ["13+"] * 200)
+    report = orch.metrics_snapshot()["memory"]
+    abuse = report["components"]["abuse_model"]
+    assert set(abuse["parts"]) == {"tfidf", "clf"} and abuse["bytes"] >= sum(abuse["parts"].values())
+    entries = report["components"]["near_duplicate"]["entries"]
+    assert abuse["loaded_bytes"] > 0 and entries == len(orch.near_duplicates) > 100
+    assert report["accounted_bytes"] == sum(c["bytes"] for c in report["components"].values())
+
+    # Over budget: caches shrink in order, models stay
+    near_dup = report["components"]["near_duplicate"]["bytes"]
+    orch.memory.budget_bytes = report["accounted_bytes"] - near_dup // 2
+    after = orch.memory.enforce()
+    assert after <= orch.memory.budget_bytes and orch.memory.shrinks == 1
+    assert 0 < len(orch.near_duplicates) < entries and orch.abuse is not None
+
+    # Sessions are shrunk too without a persistent store; periodic checks run off the request thread
+    orch.infer_batch(["hello friend"] * 300, ["13+"] * 300, [f"s{i}" for i in range(300)])
+    report = orch.memory_report()
+    sizes = {k: report["components"][k]["bytes"] for k in ("near_duplicate", "sessions")}
+    orch.memory.budget_bytes = report["accounted_bytes"] - sizes["near_duplicate"] - sizes["sessions"] // 2
+    orch.memory.shrink_to, orch.memory.check_interval_s = 1.0, 0
+    orch.infer("hello", "13+")
+    orch.memory._enforcer.join(30)
+    assert orch.memory.shrinks == 2 and 0 < len(orch.sessions) < 300
+
+    # A load that cannot fit even after shrinking is refused, not silently replaced
+    orch.memory.budget_bytes = abuse["bytes"]
+    with pytest.raises(MemoryBudgetExceeded):
+        orch.load_models_from_disk(str(tmp_path))
+    assert orch.memory.refused_loads == 1 and orch.model_version != "minimal"
+
+def test_memory_budget_checks_run_safely_under_concurrent_requests():
+    import sys
+    import threading
+    import time
+
+    cfgs = _configs()
+    cfgs["preprocessing"]["language_detection"] = {"enabled": False}
+    cfgs["models"]["near_duplicate"] = {"enabled": True, "window_s": 3600}
+    cfgs["runtime"] = {"memory": {"enabled": True, "check_interval_s": 0}}
+    orch = InferenceOrchestrator(cfgs)
+    orch.load_or_fit_minimal()
+    # Checked every batch: each check walks the session registry and caches while other
+    # threads grow them, and shrinks them once they outgrow a small allowance
+    orch.memory.budget_bytes = orch.memory_report()["accounted_bytes"] + 2 * 2**20
+    errors, checks = [], []
+    enforce = orch.memory.enforce
+
+    def recording_enforce(*args):
+        try:
+            checks.append(enforce(*args))
+        except Exception as e:
+            errors.append(e)
+            raise
+
+    orch.memory.enforce = recording_enforce
+    stop = time.monotonic() + 4.0
+
+    def traffic(worker):
+        i = 0
+        while time.monotonic() < stop:
+            texts = [f"message {worker} {i} {j}" for j in range(64)]
+            orch.infer_batch(texts, ["13+"] * 64, [f"w{worker}-{i}-{j}" for j in range(64)])
+            i += 1
+
+    threads = [threading.Thread(target=traffic, args=(w,)) for w in range(4)]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)  # switch threads often, mid-traversal
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(interval)
+    if orch.memory._enforcer is not None:
+        orch.memory._enforcer.join(30)
+    assert errors == [] and len(checks) > 5 and orch.memory.shrinks > 0
+
+def test_sharded_inference_matches_single_process(tmp_path):
+    import joblib
+    from src.orchestrator.sharding import ConsistentHashRing, ShardedInference
+
+    ring = ConsistentHashRing([f"w{i}" for i in range(4)])
+    keys = [f"session-{i}" for i in range(2000)]
+    before = {k: ring.owner(k) for k in keys}
+    ring.add("w4")
+    moved = [k for k in keys if ring.owner(k) != before[k]]
+    assert all(ring.owner(k) == "w4" for k in moved) and 0.1 < len(moved) / len(keys) < 0.35
+    ring.remove("w4")
+    assert all(ring.owner(k) == before[k] for k in keys)
+
+    base = InferenceOrchestrator(_configs())
+    base.load_or_fit_minimal()
+    joblib.dump(base.abuse, tmp_path / "abuse_detector.joblib")
+    joblib.dump(base.crisis, tmp_path / "crisis_detector.joblib")
+    single = InferenceOrchestrator(_configs())
+    single.load_models_from_disk(str(tmp_path))
+
+    texts = ["hello friend", "i will hurt you", "you are stupid", "need help i want to die", "let's watch a movie"]
+    sessions = [f"s{i}" for i in range(8)] + [None]
+    batches = [
+        [(texts[(i + b) % len(texts)], sessions[(i * 3 + b) % len(sessions)], 1000.0 * b + i) for i in range(24)]
+        for b in range(4)
+    ]
+    with ShardedInference(_configs(), model_dir=str(tmp_path), workers=2) as sharded:
+        for b, batch in enumerate(batches):
+            if b == 1:
+                sharded.add_worker()
+            if b == 3:
+                sharded.remove_worker("shard-0")
+            args = ([t for t, _, _ in batch], ["13+"] * len(batch), [s for _, s, _ in batch], [ts for _, _, ts in batch])
+            assert sharded.infer_batch(*args) == single.infer_batch(*args)
+        stats = sharded.stats()
+    assert set(stats["shards"]) == {"shard-1", "shard-2"} and stats["sessions_moved"] > 0
+    assert sum(s["sessions"] for s in stats["shards"].values()) == 8  # each session resident on one shard
+    assert all(s["in_flight"] == 0 and s["mean_batch"] >= 1 for s in stats["shards"].values())
+
+def test_sharded_inference_survives_a_dead_shard():
+    import time
+    from src.orchestrator.sharding import ShardedInference, build_inference
+
+    assert isinstance(build_inference(_configs()), InferenceOrchestrator)
+    with ShardedInference(_configs(), workers=2) as sharded:
+        sessions = [f"s{i}" for i in range(8)]
+        victim = sharded.ring.owner(sessions[0])
+        proc = sharded._procs[victim]
+        proc.kill()
+        proc.join()
+        # Pending work on the dead shard fails at once, not after timeout_s
+        fut = sharded._send(victim, ("stats", next(sharded._req_ids), None))
+        assert isinstance(fut.exception(timeout=5), RuntimeError)
+        deadline = time.monotonic() + 10
+        while victim in sharded.ring.workers and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert sharded.ring.workers == [w for w in ("shard-0", "shard-1") if w != victim]
+        out = sharded.infer_batch(["i will hurt you"] * 8, ["13+"] * 8, sessions)
+        assert len(out) == 8 and set(sharded.stats()["shards"]) == set(sharded.ring.workers)
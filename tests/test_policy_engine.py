@@ -74,3 +74,64 @@ def test_policy_block_crisis():
     assert decision["action"] == "block"
     assert decision["route_to_human"] is True
     assert "crisis" in decision["rationale"][0].lower() or "high risk" in decision["rationale"][0].lower()
+    # Configured identity terms alone add no fairness note; a flag from the monitor does
+    assert not any("fairness" in r.lower() for r in decision["rationale"])
+    flagged = engine.decide("13+", {"toxic": 0.6}, 0.1, {"ewma": 0.1, "slope": 0.0}, {}, fairness_flags=["muslim"])
+    assert flagged["rationale"][-1] == "Fairness review: block-rate disparity flagged for muslim"
+
+def test_fairness_monitor_alerts_on_block_rate_disparity():
+    from src.policy_engine.fairness_monitor import FairnessMonitor
+
+    monitor = FairnessMonitor({"identity_terms": ["muslim", "man"], "disparity_alert": 0.15, "min_count": 10})
+    allow = {"action": "allow", "max_risk": 0.1}
+    block = {"action": "block", "max_risk": 0.9}
+    monitor.observe_batch(["hello there"] * 20, [allow] * 20)
+    # "woman" must not count as a mention of "man"
+    monitor.observe_batch(["a woman said hi"] * 10, [allow] * 10)
+    monitor.observe_batch(["i am muslim"] * 10, [block] * 5 + [allow] * 5)
+
+    snap = monitor.snapshot()
+    assert snap["groups"]["_baseline"]["count"] == 30
+    assert snap["groups"]["man"]["count"] == 0
+    assert snap["groups"]["muslim"]["action_rates"]["block"] == 0.5
+    assert sum(snap["groups"]["muslim"]["risk_histogram"]) == 10
+    assert snap["alerts"] == ["muslim"]
+    assert monitor.flagged_terms("I am Muslim") == ["muslim"] and monitor.flagged_terms("hello there") == []
+
+def test_policy_replay_reproduces_logged_decisions(tmp_path):
+    import copy
+    import numpy as np
+    from src.models.escalation_tracker import EscalationTracker
+    from src.orchestrator.inference_pipeline import InferenceOrchestrator
+    from src.policy_engine.replay import compare_policies, load_decision_records, model_risk, replay_escalation
+    from tests.test_orchestrator import _configs
+
+    cfgs = _configs()
+    cfgs["runtime"] = {"audit": {"enabled": True, "dir": str(tmp_path), "flush_interval_s": 60}}
+    orch = InferenceOrchestrator(cfgs)
+    orch.load_or_fit_minimal()
+    texts = ["hello friend", "i will hurt you", "need help i want to die", "let's watch a movie"] * 5
+    sessions = ["a", "b", None, "a"] * 5
+    orch.infer_batch(texts, ["13+"] * len(texts), sessions)
+    orch.close()
+
+    meta, records = load_decision_records(str(tmp_path))
+    policy = cfgs["policy"]
+    report, _ = compare_policies(records, meta, policy, policy)
+    assert report["changed"] == 0 and report["current_vs_logged_mismatch"] == 0
+
+    stricter = copy.deepcopy(policy)
+    stricter["actions"]["allow_max_risk"] = 0.0
+    report, changed = compare_policies(records, meta, policy, stricter)
+    assert report["actions"]["candidate"]["allow"] == 0
+    assert report["changed"] == report["actions"]["current"]["allow"] == len(changed)
+
+    # Vectorized escalation replay matches sequential trackers per session
+    esc = {"ewma_alpha": 0.3, "slope_window": 5, "risk_floor": 0.05}
+    ewma = replay_escalation(records, model_risk(records, meta["abuse_labels"]), esc)
+    trackers = {}
+    expected = [
+        trackers.setdefault(sid, EscalationTracker(**esc)).update(float(r))["ewma"]
+        for sid, r in zip(records["session_id"], model_risk(records, meta["abuse_labels"]))
+    ]
+    assert np.allclose(ewma, expected)
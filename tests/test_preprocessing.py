@@ -32,3 +32,46 @@ def test_pii_masking_phone():
     masked = mask_pii(text)
     assert "<PHONE>" in masked
     assert "9876" not in masked
+
+def test_long_input_windows_are_bounded():
+    import numpy as np
+    from src.preprocessing.long_input import window_spans, pool_scores
+
+    spans = window_spans(10**6, window_chars=1000, overlap_chars=200, max_windows=16)
+    assert len(spans) == 16
+    assert spans[0] == (0, 1000) and spans[-1] == (10**6 - 1000, 10**6)
+    assert window_spans(50, window_chars=1000) == [(0, 50)]
+
+    scores = np.array([[0.1, 0.2], [0.9, 0.3]])
+    assert np.allclose(pool_scores(scores, "max"), [0.9, 0.3])
+    lse = pool_scores(scores, "lse", temperature=0.1)
+    assert np.all(lse <= [0.9, 0.3]) and np.all(lse >= scores.mean(axis=0))
+
+def test_pii_scanner_entities_and_spans():
+    from src.preprocessing.pii_masking import mask_pii_spans, mask_pii_batch
+
+    text = "card 4111 1111 1111 1111, ip 10.0.0.7, login https://bob:pw@host.io/x, mail a.b@c.co.uk"
+    masked, spans = mask_pii_spans(text)
+    assert masked == "card <CARD>, ip <IP>, login <URL>, mail <EMAIL>"
+    assert [s.kind for s in spans] == ["credit_card", "ip", "url_userinfo", "email"]
+    assert text[spans[0].start:spans[0].end] == "4111 1111 1111 1111"
+
+    # Not Luhn-valid, so never reported as a card; dates are left alone
+    masked, spans = mask_pii_spans("order 1234 5678 9012 3456 on 2024-07-24")
+    assert "credit_card" not in {s.kind for s in spans}
+    assert masked.endswith("on 2024-07-24")
+    assert mask_pii_batch(["Call +91-9876543210", "", "hi"]) == ["Call <PHONE>", "", "hi"]
+
+    # Only the requested kinds are reported; unknown kinds are rejected
+    from src.preprocessing.pii_masking import scan_pii
+    assert [s.kind for s in scan_pii(text, kinds=["email", "ip"])] == ["ip", "email"]
+    assert mask_pii_spans(text, mask_credit_card=False)[0].startswith("card 4111 1111 1111 1111,")
+    with pytest.raises(ValueError):
+        scan_pii(text, kinds=["passport"])
+
+def test_pii_scanner_is_linear_on_adversarial_input():
+    import time
+    for text in ("12-" * 100000, "a." * 150000, "x@" * 150000):
+        t0 = time.perf_counter()
+        mask_pii(text)
+        assert time.perf_counter() - t0 < 1.0
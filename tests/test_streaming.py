@@ -0,0 +1,107 @@
+import asyncio
+import itertools
+import threading
+import time
+from src.orchestrator.inference_pipeline import InferenceOrchestrator
+from src.orchestrator.streaming import StreamingInference
+from tests.test_orchestrator import _configs
+
+def _events():
+    msgs = ["hello friend", "i will hurt you", "need help i want to die", "let's watch a movie"]
+    return [(f"s{i % 3}", msgs[i % 4], "13+", 1000.0 + i) for i in range(20)]
+
+def _per_message(events):
+    orch = InferenceOrchestrator(_configs())
+    orch.load_or_fit_minimal()
+    return [orch.infer(t, a, session_id=s, timestamp=ts) for s, t, a, ts in events]
+
+def test_stream_matches_per_message_inference():
+    events = _events()
+    expected = _per_message(events)
+    orch = InferenceOrchestrator(_configs())
+    orch.load_or_fit_minimal()
+    out = list(StreamingInference(orch, max_batch_size=4, max_buffer=8).stream(iter(events)))
+
+    assert [r["event"]["session_id"] for r in out] == [e[0] for e in events]
+    for got, exp in zip(out, expected):
+        assert got["decision"]["action"] == exp["decision"]["action"]
+        assert abs(got["escalation"]["ewma"] - exp["escalation"]["ewma"]) < 1e-9
+
+def test_astream_and_cancellation():
+    events = _events()
+    orch = InferenceOrchestrator(_configs())
+    orch.load_or_fit_minimal()
+    streamer = StreamingInference(orch, max_batch_size=2, max_buffer=2)
+
+    async def source():
+        for ev in events:
+            yield ev
+
+    async def consume():
+        got = []
+        async for r in streamer.astream(source()):
+            got.append(r)
+            if len(got) == 5:
+                streamer.cancel()
+        return got
+
+    got = asyncio.run(consume())
+    assert 5 <= len(got) < len(events)
+    assert [r["event"]["timestamp"] for r in got] == [e[3] for e in events[: len(got)]]
+
+def test_concurrent_streams_end_independently():
+    events = _events()
+    orch = InferenceOrchestrator(_configs())
+    orch.load_or_fit_minimal()
+    streamer = StreamingInference(orch, max_batch_size=2, max_buffer=2)
+
+    first = streamer.stream(iter(events))
+    head = [next(first) for _ in range(3)]
+    # A second stream finishing on the same instance must not stop the first
+    assert len(list(streamer.stream(iter(events[:4])))) == 4
+    assert len(head) + len(list(first)) == len(events)
+    assert not streamer.cancelled
+
+    a, b = streamer.stream(iter(events)), streamer.stream(iter(events))
+    next(a), next(b)
+    streamer.cancel()
+    assert len(list(a)) < len(events) and len(list(b)) < len(events)
+    # cancel() only stops streams already running
+    assert len(list(streamer.stream(iter(events[:4])))) == 4
+
+def test_reader_thread_exits_when_stream_ends_early():
+    orch = InferenceOrchestrator(_configs())
+    orch.load_or_fit_minimal()
+    streamer = StreamingInference(orch, max_batch_size=2, max_buffer=2)
+
+    def readers():
+        return {t for t in threading.enumerate() if t.name == "stream-reader"}
+
+    def start():
+        before = readers()
+        stream = streamer.stream(itertools.cycle(_events()))  # endless source keeps the buffer full
+        next(stream)
+        time.sleep(0.2)
+        (reader,) = readers() - before
+        return stream, reader
+
+    # Closed by the consumer
+    stream, reader = start()
+    stream.close()
+    reader.join(timeout=2)
+    assert not reader.is_alive()
+
+    # Cancelled while the consumer is paused, with the reader blocked on a full buffer
+    stream, reader = start()
+    streamer.cancel()
+    reader.join(timeout=2)
+    assert not reader.is_alive()
+    stream.close()
+
+def test_time_decayed_escalation():
+    from src.models.escalation_tracker import EscalationTracker
+    tracker = EscalationTracker(ewma_alpha=0.5, half_life_s=60.0)
+    tracker.update(0.9, timestamp=0.0)
+    quick = EscalationTracker(ewma_alpha=0.5, half_life_s=60.0)
+    quick.update(0.9, timestamp=0.0)
+    assert tracker.update(0.1, timestamp=600.0)["ewma"] < quick.update(0.1, timestamp=1.0)["ewma"]